@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from domain.parse import GameScore, Season, getGameFilename, readBoxscoreFile
+from domain.columnar import PlayerLineStore
+from domain.lineup import Roster, DEFAULT_ROSTER
+
+"""
+Compare the object model's season analysis against the columnar store's vectorized
+analysis, over a year's boxscores repeated several times as one long archive, with
+the default roster or the one given, described as for --roster.
+Usage: python benchmarks/columnar_benchmark.py [year] [copies] [roster]
+"""
+if __name__ == '__main__':
+	year = len(sys.argv) > 1 and sys.argv[1] or '2008'
+	copies = len(sys.argv) > 2 and int(sys.argv[2]) or 20
+	roster = len(sys.argv) > 3 and Roster(sys.argv[3]) or DEFAULT_ROSTER
+
+	# parse once up front, so we only time the analysis
+	parsed = []
+	for week in sorted([ int(week) for week in os.listdir(year) if week[0] != '.' ]):
+		for game in sorted([ int(game) for game in os.listdir(os.path.join(year, str(week))) if game[0] != '.' ]):
+			parsed.append((week, game, readBoxscoreFile(getGameFilename(year, week, game))))
+
+	# each copy gets its own run of weeks, as if it were the next season
+	weekOffset = max([ week for (week, game, teamRows) in parsed ])
+	archive = []
+	for copy in range(copies):
+		for (week, game, teamRows) in parsed:
+			archive.append((week + copy * weekOffset, game, teamRows))
+
+	start = time.time()
+	season = Season(year)
+	for (week, game, teamRows) in archive:
+		season.addGame(GameScore(year, week, game, teamRows=teamRows, roster=roster))
+	season.analyzePlayers()
+	highScoringBench = 0
+	lowScoringStarters = 0
+	for game in season.games:
+		for team in game.teams.values():
+			for line in team.players:
+				if line.slot == 'Bench' and line.points > 12:
+					highScoringBench += 1
+				elif line.slot != 'Bench' and line.slot != 'IR' and line.points < 10:
+					lowScoringStarters += 1
+	objectTime = time.time() - start
+
+	start = time.time()
+	store = PlayerLineStore(roster)
+	for (week, game, teamRows) in archive:
+		store.addTeamRows(week, game, teamRows)
+	store.freeze()
+	buildTime = time.time() - start
+
+	start = time.time()
+	(totals, counts) = store.getPlayerTotals()
+	averages = store.getPlayerAverages()
+	aboveAverage = store.getAboveAverageMask()
+	actualPoints = store.getActualPoints()
+	benchMask = store.getHighScoringBenchMask()
+	starterMask = store.getLowScoringStarterMask()
+	columnarTime = time.time() - start
+
+	# make sure the two agree
+	for (code, player) in enumerate(season.players):
+		if store.players.values[code] != player.playerId or totals[code] != player.totalPoints or averages[code] != player.averagePoints:
+			print "Player totals disagree for %s" % player.name
+			sys.exit(1)
+	teamWeek = 0
+	for game in season.games:
+		for teamName in game.teams:
+			if actualPoints[teamWeek] != game.teams[teamName].actualPoints:
+				print "Actual points disagree for %s in week %d" % (teamName, game.week)
+				sys.exit(1)
+			teamWeek += 1
+	linesAboveAverage = 0
+	for player in season.players:
+		linesAboveAverage += len(player.linesAboveAverage)
+	if aboveAverage.sum() != linesAboveAverage or benchMask.sum() != highScoringBench or starterMask.sum() != lowScoringStarters:
+		print "Line classifications disagree"
+		sys.exit(1)
+
+	print "player-week lines: %d; players: %d" % (store.getLineCount(), len(store.players))
+	print "object model: %.1f ms" % (objectTime * 1000)
+	print "columnar store: %.1f ms to build, %.1f ms to analyze" % (buildTime * 1000, columnarTime * 1000)
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import gzip
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from domain.parse import findGameFilename, readBoxscoreFile
+from domain.compact import compactBoxscoreFile
+
+"""
+Parse every game in a tree, returning the rows, the time it took, and the total
+size of the files that were read.
+"""
+def parseTree(year, weekGames, repeats):
+	start = time.time()
+	for i in range(repeats):
+		parsed = []
+		bytesRead = 0
+		for (week, game) in weekGames:
+			filename = findGameFilename(year, week, game)
+			parsed.append(readBoxscoreFile(filename))
+			bytesRead += os.path.getsize(filename)
+	return (parsed, (time.time() - start) / repeats, bytesRead)
+
+"""
+Compare parsing a year's raw boxscores against the same boxscores gzipped whole,
+and compacted with the compact command, after checking that all three parse the same.
+The page cache isn't dropped between runs, so the times are for warm reads; on a
+cold or network file system, the bytes read matter more.
+Usage: python benchmarks/compressed_benchmark.py [year] [repeats]
+"""
+if __name__ == '__main__':
+	year = len(sys.argv) > 1 and sys.argv[1] or '2008'
+	repeats = len(sys.argv) > 2 and int(sys.argv[2]) or 5
+
+	root = os.getcwd()
+	weekGames = []
+	for week in sorted([ int(week) for week in os.listdir(year) if week[0] != '.' ]):
+		for game in sorted([ int(game) for game in os.listdir(os.path.join(year, str(week))) if game[0] != '.' ]):
+			weekGames.append((week, game))
+
+	(expected, rawTime, rawBytes) = parseTree(year, weekGames, repeats)
+	print "raw: %d bytes, %.1f ms" % (rawBytes, rawTime * 1000)
+
+	directory = tempfile.mkdtemp()
+	os.chdir(directory)
+	try:
+		# gzip each file whole
+		for (week, game) in weekGames:
+			weekDirectory = os.path.join(year, str(week))
+			if not os.path.isdir(weekDirectory):
+				os.makedirs(weekDirectory)
+			original = open(os.path.join(root, year, str(week), str(game)), 'rb')
+			compressed = gzip.open(os.path.join(weekDirectory, '%d.gz' % game), 'wb')
+			try:
+				shutil.copyfileobj(original, compressed)
+			finally:
+				original.close()
+				compressed.close()
+
+		(parsed, gzipTime, gzipBytes) = parseTree(year, weekGames, repeats)
+		if parsed != expected:
+			print "Gzipped boxscores parse differently"
+			sys.exit(1)
+		print "gzip: %d bytes, %.1f ms" % (gzipBytes, gzipTime * 1000)
+
+		for (week, game) in weekGames:
+			compactBoxscoreFile(year, week, game)
+		(parsed, compactTime, compactBytes) = parseTree(year, weekGames, repeats)
+		if parsed != expected:
+			print "Compacted boxscores parse differently"
+			sys.exit(1)
+		print "compacted: %d bytes, %.1f ms" % (compactBytes, compactTime * 1000)
+	finally:
+		os.chdir(root)
+		shutil.rmtree(directory)
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import email.utils
+import BaseHTTPServer
+import SocketServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from domain.fetch import BoxscoreFetcher
+
+"""
+A stand-in for the boxscore site: serves the files under a directory as
+/YEAR/WEEK/GAME, over keep-alive connections, with ETag and Last-Modified headers,
+answering conditional requests with 304. Each response is held back by a fixed
+latency, like a real server on the other side of the internet.
+"""
+class BoxscoreRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+	protocol_version = 'HTTP/1.1'
+
+	# send each response in one go, rather than a packet per header
+	wbufsize = -1
+
+	def do_GET(self):
+		time.sleep(self.server.latency)
+		filename = os.path.join(self.server.root, *self.path.strip('/').split('/'))
+		if not os.path.isfile(filename):
+			self.sendResponse(404, {}, '')
+			return
+
+		stat = os.stat(filename)
+		etag = '"%d-%d"' % (stat.st_mtime, stat.st_size)
+		lastModified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+		headers = { 'ETag': etag, 'Last-Modified': lastModified }
+		if self.headers.getheader('If-None-Match') == etag:
+			self.sendResponse(304, headers, '')
+			return
+
+		boxscoreFile = open(filename, 'rb')
+		try:
+			body = boxscoreFile.read()
+		finally:
+			boxscoreFile.close()
+		self.sendResponse(200, headers, body)
+
+	def sendResponse(self, status, headers, body):
+		self.send_response(status)
+		for (name, value) in headers.items():
+			self.send_header(name, value)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+class BoxscoreServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+	daemon_threads = True
+
+"""
+Fetch a year's boxscores from a local stand-in server, first with a single thread and
+then with several, checking that the files match; then fetch them again, which should
+find every one of them not modified.
+Usage: python benchmarks/fetch_benchmark.py [year] [threads] [latency in ms]
+"""
+if __name__ == '__main__':
+	year = len(sys.argv) > 1 and sys.argv[1] or '2008'
+	threads = len(sys.argv) > 2 and int(sys.argv[2]) or 8
+	latency = len(sys.argv) > 3 and float(sys.argv[3]) / 1000 or 0.02
+
+	root = os.getcwd()
+	weekGames = []
+	for week in sorted([ int(week) for week in os.listdir(year) if week[0] != '.' ]):
+		for game in sorted([ int(game) for game in os.listdir(os.path.join(year, str(week))) if game[0] != '.' ]):
+			weekGames.append((week, game))
+
+	server = BoxscoreServer(('127.0.0.1', 0), BoxscoreRequestHandler)
+	server.root = root
+	server.latency = latency
+	serverThread = threading.Thread(target=server.serve_forever)
+	serverThread.daemon = True
+	serverThread.start()
+	baseUrl = 'http://127.0.0.1:%d' % server.server_address[1]
+
+	for fetchThreads in [ 1, threads ]:
+		directory = tempfile.mkdtemp()
+		os.chdir(directory)
+		try:
+			start = time.time()
+			fetcher = BoxscoreFetcher(baseUrl, fetchThreads)
+			fetcher.fetch(year, weekGames)
+			fetchTime = time.time() - start
+
+			for (week, game) in weekGames:
+				if open(os.path.join(directory, year, str(week), str(game)), 'rb').read() != open(os.path.join(root, year, str(week), str(game)), 'rb').read():
+					print "Boxscore %s/%s/%s differs" % (year, week, game)
+					sys.exit(1)
+			print "fetched %d boxscores with %d threads: %.1f ms" % (fetcher.downloaded, fetchThreads, fetchTime * 1000)
+
+			start = time.time()
+			fetcher = BoxscoreFetcher(baseUrl, fetchThreads)
+			fetcher.fetch(year, weekGames)
+			refetchTime = time.time() - start
+			if fetcher.notModified != len(weekGames):
+				print "Only %d of %d boxscores were not modified" % (fetcher.notModified, len(weekGames))
+				sys.exit(1)
+			print "refetched %d unmodified boxscores with %d threads: %.1f ms" % (fetcher.notModified, fetchThreads, refetchTime * 1000)
+		finally:
+			os.chdir(root)
+			shutil.rmtree(directory)
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from domain.parse import GameScore, Season
+from domain.aggregate import analyzeShards, shardByWeek
+
+"""
+Print the team and player reports for a season, and return them as a string.
+"""
+def captureReports(season):
+	output = StringIO.StringIO()
+	stdout = sys.stdout
+	sys.stdout = output
+	try:
+		season.printTeamRecordSummary()
+		season.printTeamPointsSummary()
+		season.printTeamAboveAverageOpposingPlayersSummary(True)
+		season.printPlayerScoreSummary()
+		season.printHighScoringBenchPlayersSummary()
+		season.printLowScoringStartersSummary()
+		season.printPlayerOpponentSummary()
+	finally:
+		sys.stdout = stdout
+	return output.getvalue()
+
+"""
+Compare analyzing a season in one process against the two phase map-reduce over
+shards of one week each, with one worker and with several, after checking that
+their reports agree.
+Usage: python benchmarks/mapreduce_benchmark.py [year] [jobs]
+"""
+if __name__ == '__main__':
+	year = len(sys.argv) > 1 and sys.argv[1] or '2008'
+	jobs = len(sys.argv) > 2 and int(sys.argv[2]) or 4
+
+	weekGames = []
+	for week in sorted([ int(week) for week in os.listdir(year) if week[0] != '.' ]):
+		for game in sorted([ int(game) for game in os.listdir(os.path.join(year, str(week))) if game[0] != '.' ]):
+			weekGames.append((week, game))
+	shards = shardByWeek(weekGames)
+
+	start = time.time()
+	season = Season(year)
+	for (week, game) in weekGames:
+		season.addGame(GameScore(year, week, game))
+	season.analyze()
+	singleTime = time.time() - start
+	expected = captureReports(season)
+
+	for shardJobs in [ 1, jobs ]:
+		start = time.time()
+		reports = captureReports(analyzeShards(year, shards, shardJobs))
+		shardTime = time.time() - start
+		if reports != expected:
+			print "Reports disagree with %d jobs" % shardJobs
+			sys.exit(1)
+		print "map-reduce over %d shards, %d jobs: %.1f ms" % (len(shards), shardJobs, shardTime * 1000)
+
+	print "single process: %.1f ms" % (singleTime * 1000)
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from domain.parse import GameScore, Season
+
+"""
+Get the peak resident set size of this process so far, in megabytes.
+"""
+def peak_rss():
+	# ru_maxrss is in kilobytes on Linux, and bytes on Mac OS X
+	maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == 'darwin':
+		return maxrss / (1024.0 * 1024.0)
+	return maxrss / 1024.0
+
+"""
+Load and analyze the given year's boxscores several times over, as if they were
+separate seasons, keeping every season in memory the way a multi-season report would.
+Usage: python benchmarks/memory_benchmark.py [year] [seasons]
+"""
+if __name__ == '__main__':
+	year = len(sys.argv) > 1 and sys.argv[1] or '2008'
+	seasons = len(sys.argv) > 2 and int(sys.argv[2]) or 10
+
+	weekGames = []
+	for week in sorted([ int(week) for week in os.listdir(year) if week[0] != '.' ]):
+		for game in sorted([ int(game) for game in os.listdir(os.path.join(year, str(week))) if game[0] != '.' ]):
+			weekGames.append((week, game))
+
+	startRss = peak_rss()
+	start = time.time()
+
+	loaded = []
+	for i in range(seasons):
+		season = Season(year)
+		for (week, game) in weekGames:
+			season.addGame(GameScore(year, week, game))
+		season.analyze()
+		loaded.append(season)
+
+	elapsed = time.time() - start
+
+	print "seasons: %d; games: %d" % (seasons, seasons * len(weekGames))
+	print "time: %.2f s" % elapsed
+	print "peak RSS: %.1f MB (%.1f MB before loading)" % (peak_rss(), startRss)
@@ -0,0 +1,185 @@
+import os
+import re
+import sys
+import glob
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from domain.parse import BoxscoreParser, readRosterLines
+
+class Error(Exception):
+	pass
+
+"""
+The original player score line, parsed from a row of the page one field at a time,
+with a regular expression search for each field.
+"""
+class LegacyPlayerScoreLine(object):
+	__slots__ = ('week', 'playerId', 'teamId', 'name', 'position', 'slot', 'points')
+
+	def __init__(self, week, line):
+		self.week = week
+		if self._parsePlayerId(line):
+			self.playerId = self._parsePlayerId(line)
+			self.teamId = self._parseTeamId(line)
+			( self.name, self.position ) = self._parseNameAndPosition(line)
+			self.slot = self._parseSlot(line)
+			self.points = self._parsePoints(line)
+		else:
+			raise Error("Cannot find player score")
+
+	def getFields(self):
+		return (self.playerId, self.teamId, self.name, self.position, self.slot, self.points)
+
+	def _parsePlayerId(self, line):
+		idSearch = re.search('id="plyr(\d+)"', line)
+		if idSearch:
+			return idSearch.group(1)
+		else:
+			raise Error("Cannot find playerId")
+
+	def _parseTeamId(self, line):
+		teamSearch = re.search('<div .* team_id="(\d+)"', line)
+		if teamSearch:
+			return teamSearch.group(1)
+		else:
+			raise Error("Cannot find team id")
+
+	def _parseNameAndPosition(self, line):
+		playerSearch = re.search('<div.+>([\w\s\.\/\'-]+)</div>\*?, \w+ ([\w\/]+)', line)
+		if playerSearch:
+			playerName = playerSearch.group(1)
+			playerPosition = playerSearch.group(2)
+			return (playerName, playerPosition)
+		else:
+			raise Error("Cannot find name and position")
+
+	def _parseSlot(self, line):
+		slotSearch = re.search('<td id="slot_\d+".*>([\w\/]+)</td><td', line)
+		if slotSearch:
+			return slotSearch.group(1)
+		else:
+			raise Error("Cannot find slot")
+
+	def _parsePoints(self, line):
+		pointsSearch = re.search('<td id="plscrg_\d+_totpts".*>(-?\d+)</td>', line)
+		if pointsSearch:
+			return int(pointsSearch.group(1))
+		else:
+			raise Error("Cannot find points")
+
+"""
+The original line-by-line parser: every line goes through the team name search
+and then through LegacyPlayerScoreLine, with the failures thrown away.
+"""
+def legacy_parse(week, lines):
+	teams = {}
+	teamName = ''
+
+	for line in lines:
+		teamNameSearch = re.search('<td.* class="tableHead">([\w\s\.]+)</td>', line)
+		if teamNameSearch:
+			teamName = teamNameSearch.group(1).replace(' BENCH', '')
+			try:
+				if not teams[teamName]:
+					teams[teamName] = []
+			except:
+				teams[teamName] = []
+			continue
+
+		try:
+			player = LegacyPlayerScoreLine(week, line)
+			teams[teamName].append(player.getFields())
+		except:
+			continue
+
+	teamRows = []
+	for teamName in teams:
+		teamRows.append((teamName, teams[teamName]))
+	return teamRows
+
+def current_parse(week, lines):
+	return BoxscoreParser().parse(lines)
+
+"""
+Time how long the given parse function takes over all the files, repeated a few times,
+returning the best total time.
+"""
+def time_parse(parse, files, repeat):
+	best = None
+	for i in range(repeat):
+		start = time.time()
+		for (week, lines) in files:
+			parse(week, lines)
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+"""
+Read and parse each file from disk, either the whole file or just the roster
+section, returning the total number of lines and bytes handed to the parser.
+"""
+def read_and_parse(filenames, rosterOnly):
+	lines = 0
+	bytes = 0
+	for filename in filenames:
+		boxscoreFile = open(filename, 'r')
+		try:
+			if rosterOnly:
+				fileLines = readRosterLines(boxscoreFile)
+			else:
+				fileLines = boxscoreFile.readlines()
+		finally:
+			boxscoreFile.close()
+		BoxscoreParser().parse(fileLines)
+		lines += len(fileLines)
+		for line in fileLines:
+			bytes += len(line)
+	return (lines, bytes)
+
+"""
+Compare the legacy parser and the current parser over every boxscore in a year's directory.
+Usage: python benchmarks/parse_benchmark.py [year] [repeat]
+"""
+if __name__ == '__main__':
+	year = len(sys.argv) > 1 and sys.argv[1] or '2008'
+	repeat = len(sys.argv) > 2 and int(sys.argv[2]) or 5
+
+	# read the files into memory first, so we only time the parsing
+	filenames = sorted(glob.glob(os.path.join(year, '*', '*')))
+	files = []
+	for filename in filenames:
+		week = int(filename.split(os.sep)[-2])
+		boxscoreFile = open(filename, 'r')
+		files.append((week, boxscoreFile.readlines()))
+		boxscoreFile.close()
+
+	if not files:
+		print "No boxscore files found under %s" % year
+		sys.exit(1)
+
+	for (week, lines) in files:
+		if legacy_parse(week, lines) != current_parse(week, lines):
+			print "Parsers disagree on a week %d file" % week
+			sys.exit(1)
+
+	legacyTime = time_parse(legacy_parse, files, repeat)
+	currentTime = time_parse(current_parse, files, repeat)
+
+	print "files: %d" % len(files)
+	print "legacy parser: %.3f ms/file" % (legacyTime * 1000 / len(files))
+	print "current parser: %.3f ms/file" % (currentTime * 1000 / len(files))
+	print "speedup: %.1fx" % (legacyTime / currentTime)
+
+	# now compare reading whole files against seeking to the roster section
+	start = time.time()
+	(fullLines, fullBytes) = read_and_parse(filenames, False)
+	fullTime = time.time() - start
+	start = time.time()
+	(rosterLines, rosterBytes) = read_and_parse(filenames, True)
+	rosterTime = time.time() - start
+
+	print "full file read: %.3f ms/file, %d lines/file, %d bytes/file" % (fullTime * 1000 / len(files), fullLines / len(files), fullBytes / len(files))
+	print "roster section read: %.3f ms/file, %d lines/file, %d bytes/file" % (rosterTime * 1000 / len(files), rosterLines / len(files), rosterBytes / len(files))
+	print "lines saved: %.0f%%; bytes saved: %.0f%%" % (100.0 - 100.0 * rosterLines / fullLines, 100.0 - 100.0 * rosterBytes / fullBytes)
@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from domain.parse import GameScore, Season
+from domain.report import TextWriter
+from domain.profiling import Profiler, setActiveProfiler
+from memory_benchmark import peak_rss
+from synthetic_league import SyntheticLeague
+
+"""
+The league sizes to measure, as teams x weeks x roster size x seasons: about the size
+of the 2008 league, then bigger leagues with deeper rosters over more seasons.
+"""
+DEFAULT_SIZES = [ '10x16x16x1', '20x17x20x2', '32x17x24x4', '64x17x30x4' ]
+
+"""
+How many times each size is measured; the fastest time for each phase is kept.
+"""
+REPEATS = 5
+
+"""
+How much slower (or bigger) than the baseline a measurement can be before it's
+reported as a slowdown: timings are noisy, so small differences don't count.
+"""
+SLOWDOWN_THRESHOLD = 1.25
+
+"""
+Nor do differences smaller than these, which the smallest leagues are all noise below.
+"""
+SLOWDOWN_MINIMUM_SECONDS = 0.01
+SLOWDOWN_MINIMUM_MB = 1
+
+"""
+The Season methods that write each report, with their extra arguments.
+"""
+REPORTS = [
+	('writeGameScores', ()),
+	('writeTeamPointsSummary', ()),
+	('writeTeamRecordSummary', ()),
+	('writePlayerScoreSummary', ()),
+	('writeTeamAboveAverageOpposingPlayersSummary', (True,)),
+	('writeHighScoringBenchPlayersSummary', ()),
+	('writeLowScoringStartersSummary', ()),
+]
+
+"""
+Turn a size like 10x16x16x1 into its teams, weeks, roster size and seasons.
+"""
+def parseSize(size):
+	(teams, weeks, rosterSize, seasons) = [ int(part) for part in size.split('x') ]
+	return (teams, weeks, rosterSize, seasons)
+
+"""
+Parse, analyze and write the reports for every season of a generated league once,
+timing each phase. Returns the profiler's results.
+"""
+def runSeasons(years):
+	profiler = Profiler()
+	setActiveProfiler(profiler)
+	try:
+		seasons = []
+		for year in years:
+			weekGames = []
+			for week in sorted([ int(week) for week in os.listdir(year) if week[0] != '.' ]):
+				for game in sorted([ int(game) for game in os.listdir(os.path.join(year, str(week))) if game[0] != '.' ]):
+					weekGames.append((week, game))
+
+			profiler.startPhase('parse')
+			season = Season(year)
+			for (week, game) in weekGames:
+				season.addGame(GameScore(year, week, game))
+
+			profiler.startPhase('analyze players')
+			season.analyzePlayers()
+			profiler.startPhase('analyze games')
+			season.analyzeGames()
+			profiler.endPhase()
+			seasons.append(season)
+
+		profiler.startPhase('report')
+		output = open(os.devnull, 'w')
+		try:
+			writer = TextWriter(output)
+			for season in seasons:
+				for (method, arguments) in REPORTS:
+					writer.startReport(method, None)
+					getattr(season, method)(writer, *arguments)
+					writer.endReport()
+		finally:
+			output.close()
+		return profiler.getResults()
+	finally:
+		setActiveProfiler(None)
+
+"""
+Measure a generated league in the given directory, several times over, returning the
+fastest wall and CPU time of each phase, the counters from the parser, and the peak
+resident memory. This runs in a process of its own, so each size's peak memory is
+its own.
+"""
+def measureLeague(directory, years):
+	os.chdir(directory)
+	startRss = peak_rss()
+
+	phases = {}
+	phaseNames = []
+	for i in range(REPEATS):
+		results = runSeasons(years)
+		for phase in results['phases']:
+			if phase['name'] not in phases:
+				phaseNames.append(phase['name'])
+				phases[phase['name']] = phase
+			else:
+				fastest = phases[phase['name']]
+				fastest['wall'] = min(fastest['wall'], phase['wall'])
+				fastest['cpu'] = min(fastest['cpu'], phase['cpu'])
+
+	counters = {}
+	for counter in results['counters']:
+		counters[counter['name']] = counter['value']
+
+	return {
+		'phases': [ phases[name] for name in phaseNames ],
+		'counters': counters,
+		'startRss': startRss,
+		'peakRss': peak_rss(),
+	}
+
+"""
+Generate a league of the given size and measure it. Returns the size's results.
+"""
+def measureSize(size):
+	(teams, weeks, rosterSize, seasons) = parseSize(size)
+	directory = tempfile.mkdtemp()
+	try:
+		league = SyntheticLeague(teams, weeks, rosterSize, seasons)
+		years = league.write(directory)
+
+		pool = multiprocessing.Pool(1)
+		try:
+			measured = pool.apply(measureLeague, (directory, years))
+		finally:
+			pool.close()
+			pool.join()
+	finally:
+		shutil.rmtree(directory)
+
+	if measured['counters'].get('playerRowsMatched') != league.playerLineCount:
+		print "Only %s of %d synthetic player rows were parsed" % (measured['counters'].get('playerRowsMatched'), league.playerLineCount)
+		sys.exit(1)
+
+	totalWall = sum([ phase['wall'] for phase in measured['phases'] ])
+	return {
+		'size': size,
+		'teams': teams,
+		'weeks': weeks,
+		'rosterSize': rosterSize,
+		'seasons': seasons,
+		'games': league.gameCount,
+		'playerLines': league.playerLineCount,
+		'bytes': league.bytesWritten,
+		'phases': measured['phases'],
+		'wall': totalWall,
+		'gamesPerSecond': league.gameCount / totalWall,
+		'playerLinesPerSecond': league.playerLineCount / totalWall,
+		'startRss': measured['startRss'],
+		'peakRss': measured['peakRss'],
+	}
+
+"""
+Compare results against a baseline from an earlier run, size by size, printing every
+phase, total or peak memory that's grown past the threshold.
+Returns the number of slowdowns.
+"""
+def compareResults(results, baseline):
+	baselineSizes = {}
+	for sizeResults in baseline['sizes']:
+		baselineSizes[sizeResults['size']] = sizeResults
+
+	slowdowns = 0
+	for sizeResults in results['sizes']:
+		baselineResults = baselineSizes.get(sizeResults['size'])
+		if baselineResults is None:
+			print "%s: not in the baseline" % sizeResults['size']
+			continue
+
+		measurements = [ ('total', sizeResults['wall'], baselineResults['wall'], 'ms', SLOWDOWN_MINIMUM_SECONDS) ]
+		baselinePhases = {}
+		for phase in baselineResults['phases']:
+			baselinePhases[phase['name']] = phase
+		for phase in sizeResults['phases']:
+			if phase['name'] in baselinePhases:
+				measurements.append((phase['name'], phase['wall'], baselinePhases[phase['name']]['wall'], 'ms', SLOWDOWN_MINIMUM_SECONDS))
+		measurements.append(('peak RSS', sizeResults['peakRss'], baselineResults['peakRss'], 'MB', SLOWDOWN_MINIMUM_MB))
+
+		for (name, value, baselineValue, unit, minimum) in measurements:
+			if baselineValue and value > baselineValue * SLOWDOWN_THRESHOLD and value - baselineValue > minimum:
+				scale = unit == 'ms' and 1000 or 1
+				print "%s: %s is %.1f %s, up from %.1f %s (%.0f%%)" % (sizeResults['size'], name, value * scale, unit, baselineValue * scale, unit, (value / baselineValue - 1) * 100)
+				slowdowns += 1
+	return slowdowns
+
+"""
+Generate synthetic leagues of several sizes and measure how parsing, analyzing and
+writing the reports scale: the time each phase takes, the games and player lines per
+second overall, and the peak resident memory. Sizes are given as
+TEAMSxWEEKSxROSTERxSEASONS. The results can be saved as JSON, and compared against the
+JSON from an earlier run, in which case the benchmark fails if anything got slower.
+Give - to skip saving or comparing.
+Usage: python benchmarks/scaling_benchmark.py [results.json] [baseline.json] [size ...]
+"""
+if __name__ == '__main__':
+	resultsFilename = len(sys.argv) > 1 and sys.argv[1] != '-' and sys.argv[1] or None
+	baselineFilename = len(sys.argv) > 2 and sys.argv[2] != '-' and sys.argv[2] or None
+	sizes = sys.argv[3:] or DEFAULT_SIZES
+
+	results = { 'time': time.time(), 'repeats': REPEATS, 'sizes': [] }
+	for size in sizes:
+		sizeResults = measureSize(size)
+		results['sizes'].append(sizeResults)
+
+		phases = '; '.join([ '%s: %.1f ms' % (phase['name'], phase['wall'] * 1000) for phase in sizeResults['phases'] ])
+		print "%s: games: %d; player lines: %d; %s" % (size, sizeResults['games'], sizeResults['playerLines'], phases)
+		print "%s: total: %.1f ms; %.0f games/s; %.0f player lines/s; peak RSS: %.1f MB (%.1f MB before loading)" % (size, sizeResults['wall'] * 1000,
+			sizeResults['gamesPerSecond'], sizeResults['playerLinesPerSecond'], sizeResults['peakRss'], sizeResults['startRss'])
+
+	if resultsFilename:
+		resultsFile = open(resultsFilename, 'w')
+		try:
+			json.dump(results, resultsFile, indent=1, sort_keys=True)
+		finally:
+			resultsFile.close()
+
+	if baselineFilename:
+		baselineFile = open(baselineFilename, 'r')
+		try:
+			baseline = json.load(baselineFile)
+		finally:
+			baselineFile.close()
+		slowdowns = compareResults(results, baseline)
+		if slowdowns:
+			print "%d slowdowns against %s" % (slowdowns, baselineFilename)
+			sys.exit(1)
+		print "No slowdowns against %s" % baselineFilename
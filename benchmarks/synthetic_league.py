@@ -0,0 +1,247 @@
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from domain.lineup import Roster
+from domain.parse import getGameFilename
+
+"""
+The mean and spread of the points each position scores in a week.
+"""
+SYNTHETIC_POSITIONS = {
+	'QB': (17, 7),
+	'RB': (10, 6),
+	'WR': (9, 6),
+	'TE': (6, 4),
+	'D/ST': (7, 5),
+	'K': (8, 4),
+}
+
+"""
+The positions a synthetic roster's bench is drawn from, as often as they appear here.
+"""
+SYNTHETIC_BENCH_POSITIONS = [ 'QB', 'RB', 'RB', 'RB', 'WR', 'WR', 'WR', 'TE', 'D/ST', 'K' ]
+
+"""
+The NFL teams a synthetic player can play for, and against.
+"""
+NFL_TEAMS = [ 'Ari', 'Atl', 'Bal', 'Buf', 'Car', 'Chi', 'Cin', 'Cle', 'Dal', 'Den', 'Det', 'GB', 'Hou', 'Ind', 'Jac', 'KC',
+	'Mia', 'Min', 'NE', 'NO', 'NYG', 'NYJ', 'Oak', 'Phi', 'Pit', 'SD', 'Sea', 'SF', 'StL', 'TB', 'Ten', 'Wsh' ]
+
+"""
+The year the first synthetic season is given; the others follow it.
+"""
+SYNTHETIC_FIRST_YEAR = 3001
+
+"""
+The lines of a boxscore page around the rosters, standing in for the scripts, styles
+and navigation the parser skips.
+"""
+PAGE_HEADER = [
+	'<html>\n',
+	'<head><title>Box Score</title>\n',
+	'<script type="text/javascript">var leagueId = 1; function toggleBench(action, count) { return false; }</script>\n',
+	'<style type="text/css">.playerTableBgRow0 { background: #f2f2e8; } .playerTableBgRow1 { background: #f8f8f2; }</style>\n',
+	'</head>\n',
+	'<body>\n',
+	'<table width="100%"><tr>\n',
+	'<td width=49%>\n',
+]
+PAGE_FOOTER = [
+	'</td>\n',
+	'</tr></table>\n',
+	'<div class="footer">Fantasy Football</div>\n',
+	'</body>\n',
+	'</html>\n',
+]
+
+TEAM_TITLE_FORMAT = '<td width="100%%" align="center" colspan="100" class="tableHead">%s</td>\n'
+TABLE_HEADER_FORMAT = '<tr style=""  class="playerTableBgRowSubhead tableSubHead "><td width="13%%">SLOT</td><td><NOBR>%s</NOBR></td><td title="Opponent" width=9%%>OPP</td><td title="Game Status" width=18%%><nobr>STATUS ET</nobr></td><td title="Total Points" align="right" width=12%%>PTS</td></tr>\n'
+PLAYER_ROW_FORMAT = '<tr style=""  id="plyr%(playerId)d" class="playerTableBgRow%(parity)d  "><td id="slot_%(playerId)d" class="slot_%(slotIndex)d playerSlot" style="font-weight: bold;">%(slot)s</td><td id="playername_%(playerId)d" ><NOBR><div season_id="%(year)d" league_id="1" team_id="%(teamId)d" player_id="%(playerId)d" tab_id="0" style="display:inline;text-decoration:underline;" class="hand popplayercard" >%(name)s</div>, %(nflTeam)s %(position)s</NOBR></td><td id="opponent_%(playerId)d"><div id="opponent_%(playerId)d_%(gameId)d"><a href="http://sports.espn.go.com/nfl/clubhouse?team=%(opponent)s" target=_new>%(opponent)s</a></div></td><td style="white-space:nowrap;" id="gamestatus_%(gameId)d_1_%(playerId)d"><a href="http://sports-ak.espn.go.com/nfl/boxscore?gameId=%(gameId)d" target="_new">21-17 F</a></td><td id="plscrg_%(playerId)d_totpts" align="right" style="font-weight:bold;">%(points)d</td></tr>\n'
+TOTAL_ROW_FORMAT = '<tr align=right valign=middle><td>%s POINTS: </td><td width=12%% id="plscrg_activetotpts_1" bgcolor="#f2f2e8">%d</td></tr>\n'
+
+"""
+A synthetic player: who they are, and the points they're likely to score.
+"""
+class SyntheticPlayer:
+	def __init__(self, playerId, position, nflTeam):
+		self.playerId = playerId
+		self.name = 'Player %d' % playerId
+		self.position = position
+		self.nflTeam = nflTeam
+		(self.meanPoints, self.pointsSpread) = SYNTHETIC_POSITIONS[position]
+
+"""
+Generates a league's worth of boxscore pages, in the same format as the real ones, so
+the analyzer can be run over leagues, seasons and rosters of any size.
+Each team gets a roster with enough players to fill every starting slot and the rest
+on the bench, and plays every other team in turn. Each week, every team starts a
+random choice of its eligible players, and every player scores a random number of
+points around their position's average, so the analysis has real decisions to find.
+The same seed always generates the same league.
+"""
+class SyntheticLeague:
+	def __init__(self, teams=10, weeks=16, rosterSize=16, seasons=1, seed=0, roster=None):
+		self.teams = max(teams, 2)
+		self.weeks = weeks
+		self.roster = roster or Roster()
+		self.rosterSize = max(rosterSize, len(self.roster.slots))
+		self.seasons = seasons
+		self.random = random.Random(seed)
+		self.nextPlayerId = 1
+
+		self.gameCount = 0
+		self.playerLineCount = 0
+		self.bytesWritten = 0
+
+	"""
+	Get the years of the seasons this league generates.
+	"""
+	def getYears(self):
+		return [ str(SYNTHETIC_FIRST_YEAR + season) for season in range(self.seasons) ]
+
+	"""
+	Write every season's boxscores into the YEAR/WEEK/GAME layout under the given directory.
+	Returns the years that were written.
+	"""
+	def write(self, directory):
+		for year in self.getYears():
+			teamPlayers = self.makeRosters()
+			for week in range(1, self.weeks + 1):
+				for (game, (homeTeam, awayTeam)) in enumerate(self.getMatchups(week)):
+					lines = self.makeGameLines(int(year), week, game + 1, [ (homeTeam, teamPlayers[homeTeam]), (awayTeam, teamPlayers[awayTeam]) ])
+					filename = os.path.join(directory, getGameFilename(year, week, game + 1))
+					if not os.path.isdir(os.path.dirname(filename)):
+						os.makedirs(os.path.dirname(filename))
+					gameFile = open(filename, 'w')
+					try:
+						gameFile.writelines(lines)
+					finally:
+						gameFile.close()
+					self.gameCount += 1
+					self.bytesWritten += sum([ len(line) for line in lines ])
+		return self.getYears()
+
+	"""
+	Make a roster for every team: the players for its starting slots, then a random
+	mix of positions on the bench. Every season drafts new players.
+	"""
+	def makeRosters(self):
+		teamPlayers = []
+		for team in range(self.teams):
+			positions = [ slotPositions[0] for (slotName, slotPositions) in self.roster.slots ]
+			while len(positions) < self.rosterSize:
+				positions.append(self.random.choice(SYNTHETIC_BENCH_POSITIONS))
+			players = []
+			for position in positions:
+				players.append(SyntheticPlayer(self.nextPlayerId, position, self.random.choice(NFL_TEAMS)))
+				self.nextPlayerId += 1
+			teamPlayers.append(players)
+		return teamPlayers
+
+	"""
+	Get the (home, away) team pairs that play in a week, round robin, so every team
+	plays every other before any pair meets again. With an odd number of teams, one
+	team has the week off.
+	"""
+	def getMatchups(self, week):
+		teams = range(self.teams)
+		if len(teams) % 2:
+			teams.append(None)
+		# the circle method: the first team stays put and the rest rotate a place each week
+		rotation = (week - 1) % (len(teams) - 1)
+		others = teams[1:]
+		teams = [ teams[0] ] + others[rotation:] + others[:rotation]
+
+		matchups = []
+		for i in range(len(teams) / 2):
+			(homeTeam, awayTeam) = (teams[i], teams[-1 - i])
+			if homeTeam is not None and awayTeam is not None:
+				matchups.append((homeTeam, awayTeam))
+		return matchups
+
+	"""
+	Choose a team's lineup for a week: a random eligible player for each starting slot,
+	with the rest on the bench. Returns (slot, player) pairs, starters first.
+	"""
+	def chooseLineup(self, players):
+		available = list(players)
+		self.random.shuffle(available)
+		lineup = []
+		for (slotName, slotPositions) in self.roster.slots:
+			for player in available:
+				if player.position in slotPositions:
+					lineup.append((slotName, player))
+					available.remove(player)
+					break
+		for player in available:
+			lineup.append(('Bench', player))
+		return lineup
+
+	"""
+	Make the lines of a single game's boxscore page.
+	"""
+	def makeGameLines(self, year, week, game, teams):
+		gameId = (year * 100 + week) * 100 + game
+		lines = list(PAGE_HEADER)
+		for (team, players) in teams:
+			teamName = 'SYNTHETIC TEAM %d' % (team + 1)
+			lineup = self.chooseLineup(players)
+			starters = [ (slot, player) for (slot, player) in lineup if slot != 'Bench' ]
+			bench = [ (slot, player) for (slot, player) in lineup if slot == 'Bench' ]
+			for (title, section, slotLines) in [ (teamName, 'STARTERS', starters), (teamName + ' BENCH', 'BENCH', bench) ]:
+				lines.append('<table border="0" cellspacing="1" cellpadding="0" width="100%" class="tableBody">\n')
+				lines.append('<tr bgcolor="#1d7225">\n')
+				lines.append(TEAM_TITLE_FORMAT % title)
+				lines.append('</tr>\n')
+				lines.append('</table>\n')
+				lines.append('<table border="0" cellspacing="1" cellpadding="0" width="100%" class="playerTableTable tableBody">\n')
+				lines.append(TABLE_HEADER_FORMAT % section)
+				totalPoints = 0
+				for (index, (slot, player)) in enumerate(slotLines):
+					points = int(round(self.random.gauss(player.meanPoints, player.pointsSpread)))
+					if player.position not in [ 'D/ST', 'K' ]:
+						points = max(points, 0)
+					totalPoints += points
+					lines.append(PLAYER_ROW_FORMAT % {
+						'playerId': player.playerId,
+						'parity': index % 2,
+						'slotIndex': index,
+						'slot': slot,
+						'year': year,
+						'teamId': team + 1,
+						'name': player.name,
+						'nflTeam': player.nflTeam,
+						'position': player.position,
+						'gameId': gameId,
+						'opponent': self.random.choice(NFL_TEAMS),
+						'points': points,
+					})
+					self.playerLineCount += 1
+				lines.append('</table>\n')
+				lines.append('<table width="100%" border="0" cellpadding="2" cellspacing="1" class="tableBody" bgcolor="#ffffff" >\n')
+				lines.append(TOTAL_ROW_FORMAT % (section == 'BENCH' and 'BENCH' or 'TOTAL', totalPoints))
+				lines.append('</table>\n')
+		lines.extend(PAGE_FOOTER)
+		return lines
+
+"""
+Write a synthetic league into a directory, to run the analyzer over by hand:
+cd into the directory and give the analyzer one of the years it prints.
+Usage: python benchmarks/synthetic_league.py directory [teams] [weeks] [rosterSize] [seasons] [seed]
+"""
+if __name__ == '__main__':
+	if len(sys.argv) < 2:
+		print "Usage: python benchmarks/synthetic_league.py directory [teams] [weeks] [rosterSize] [seasons] [seed]"
+		sys.exit(1)
+	directory = sys.argv[1]
+	teams = len(sys.argv) > 2 and int(sys.argv[2]) or 10
+	weeks = len(sys.argv) > 3 and int(sys.argv[3]) or 16
+	rosterSize = len(sys.argv) > 4 and int(sys.argv[4]) or 16
+	seasons = len(sys.argv) > 5 and int(sys.argv[5]) or 1
+	seed = len(sys.argv) > 6 and int(sys.argv[6]) or 0
+
+	league = SyntheticLeague(teams, weeks, rosterSize, seasons, seed)
+	years = league.write(directory)
+	print "years: %s; games: %d; player lines: %d; bytes: %d" % (', '.join(years), league.gameCount, league.playerLineCount, league.bytesWritten)
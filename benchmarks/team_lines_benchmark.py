@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from domain.analysis import Team, Player, PlayerPointsLine
+from domain.parse import PlayerScoreLine
+
+"""
+The original comparison functions for sorting a team's lines: by the difference between
+the week's points and the player's average, in descending order, and by the player's name.
+"""
+def compareByDifferenceFromAverage(lineA, lineB):
+	return cmp(lineB.weekPoints - lineB.averagePoints, lineA.weekPoints - lineA.averagePoints)
+
+def compareByName(lineA, lineB):
+	return cmp(lineA.name, lineB.name)
+
+"""
+The original way of keeping a team's lines in order: append, then re-sort the whole list.
+"""
+class LegacyTeam:
+	def __init__(self, name):
+		self.name = name
+		self.aboveAverageOpposingPlayerPointsLines = []
+		self.highScoringBenchPlayers = []
+		self.lowScoringStarters = []
+
+	def addAboveAverageOpposingPlayerPointsLine(self, line):
+		self.aboveAverageOpposingPlayerPointsLines.append(line)
+		self.aboveAverageOpposingPlayerPointsLines.sort(compareByDifferenceFromAverage)
+
+	def addHighScoringBenchPlayerPointsLine(self, line):
+		self.highScoringBenchPlayers.append(line)
+		self.highScoringBenchPlayers.sort(compareByName)
+
+	def addLowScoringStarterPlayerPointsLine(self, line):
+		self.lowScoringStarters.append(line)
+		self.lowScoringStarters.sort(compareByName)
+
+"""
+Make the lines a team would collect over a season: the opposing players who scored above
+their average, and the bench players and starters on the team itself.
+"""
+def make_lines(random, weeks, rosterSize):
+	lines = []
+	for week in range(1, weeks + 1):
+		for i in range(rosterSize):
+			player = Player(str(random.randint(1, 5000)), 'Player %d' % random.randint(1, 5000))
+			player.averagePoints = random.random() * 15
+			slot = random.choice([ 'QB', 'RB', 'WR', 'TE', 'D/ST', 'K', 'Bench', 'Bench' ])
+			scoreLine = PlayerScoreLine(week, fields=(player.playerId, '1', player.name, 'RB', slot, random.randint(-2, 35)))
+			lines.append(PlayerPointsLine(player, scoreLine))
+	return lines
+
+"""
+Add all the lines to each team and then read them back in order, the way the reports do.
+"""
+def fill_teams(teamClass, teamLines):
+	teams = []
+	for (name, lines) in teamLines:
+		team = teamClass(name)
+		for line in lines:
+			team.addAboveAverageOpposingPlayerPointsLine(line)
+			if line.scoreLine.slot == 'Bench':
+				team.addHighScoringBenchPlayerPointsLine(line)
+			else:
+				team.addLowScoringStarterPlayerPointsLine(line)
+		teams.append(team)
+
+	ordered = []
+	for team in teams:
+		ordered.append(([ line for line in team.aboveAverageOpposingPlayerPointsLines ], [ line for line in team.highScoringBenchPlayers ], [ line for line in team.lowScoringStarters ]))
+	return ordered
+
+"""
+Compare the legacy re-sort-on-append team lists against the current ones, on a synthetic league.
+Usage: python benchmarks/team_lines_benchmark.py [teams] [weeks] [rosterSize]
+"""
+if __name__ == '__main__':
+	teams = len(sys.argv) > 1 and int(sys.argv[1]) or 20
+	weeks = len(sys.argv) > 2 and int(sys.argv[2]) or 17
+	rosterSize = len(sys.argv) > 3 and int(sys.argv[3]) or 16
+
+	generator = random.Random(2008)
+	teamLines = []
+	for i in range(teams):
+		teamLines.append(('TEAM %d' % i, make_lines(generator, weeks, rosterSize)))
+
+	start = time.time()
+	legacyOrder = fill_teams(LegacyTeam, teamLines)
+	legacyTime = time.time() - start
+
+	start = time.time()
+	currentOrder = fill_teams(Team, teamLines)
+	currentTime = time.time() - start
+
+	if legacyOrder != currentOrder:
+		print "Team line orders disagree"
+		sys.exit(1)
+
+	print "teams: %d; weeks: %d; lines per team: %d" % (teams, weeks, weeks * rosterSize)
+	print "legacy team lists: %.1f ms" % (legacyTime * 1000)
+	print "current team lists: %.1f ms" % (currentTime * 1000)
+	print "speedup: %.1fx" % (legacyTime / currentTime)
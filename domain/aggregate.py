@@ -0,0 +1,412 @@
+import multiprocessing
+from domain.analysis import PlayerPointsLine, PlayerOpponentMatrix, isHighScoringBench, isLowScoringStart, sequenceOrder
+from domain.cache import ParseCache
+from domain.ingest import loadGameScores
+from domain.lineup import DEFAULT_ROSTER
+from domain.parse import Season, PlayerScoreLine
+
+"""
+The additive fields of a Team, in the order they're kept in a team's totals.
+"""
+TEAM_TOTAL_FIELDS = ['actualWins', 'actualLosses', 'actualTies', 'optimumWins', 'optimumLosses', 'optimumTies',
+	'actualPointsFor', 'actualPointsAgainst', 'optimumPointsFor', 'optimumPointsAgainst']
+
+"""
+A player score line in the compact, picklable form the aggregates pass around:
+(week, sequence, player fields), with the fields from PlayerScoreLine.getFields().
+The sequence numbers start from zero in each aggregate, and are shifted along when
+aggregates are merged, so they end up numbered as Season.addGame would have.
+"""
+def getLineTuple(scoreLine):
+	return (scoreLine.week, scoreLine.sequence, scoreLine.getFields())
+
+"""
+A game in the compact, picklable form the first phase hands on to the second: its
+teams in the game's order, each as (team name, line tuples for its players), so the
+second phase doesn't have to read the boxscores again. The lines have to have been
+numbered by SeasonAggregate.addGame first.
+"""
+def getGameTuple(game):
+	teams = []
+	for (teamName, teamScoreLine) in game.teams.items():
+		teams.append((teamName, [ getLineTuple(scoreLine) for scoreLine in teamScoreLine.players ]))
+	return teams
+
+def shiftLineTuples(lineTuples, offset):
+	shifted = []
+	for (week, sequence, fields) in lineTuples:
+		shifted.append((week, sequence + offset, fields))
+	return shifted
+
+"""
+An opponent matrix cell in the compact, picklable form the second phase passes around:
+(sequence, player id, player name, team name, appearances, points, expected points).
+The sequence is the cell's first line's, so it's shifted along like a line's when
+aggregates are merged, and a player's cells against the same team in several shards
+add up to a cell numbered by the first of them, as Season.analyzeTeamPlayers would.
+"""
+def getCellTuple(matrix, cell):
+	return (cell.sequence, cell.playerId, matrix.getPlayerName(cell.playerId), cell.teamName, cell.appearances, cell.points, cell.expectedPoints)
+
+def shiftCellTuples(cellTuples, offset):
+	shifted = []
+	for (sequence, playerId, playerName, teamName, appearances, points, expectedPoints) in cellTuples:
+		shifted.append((sequence + offset, playerId, playerName, teamName, appearances, points, expectedPoints))
+	return shifted
+
+"""
+Merge two dictionaries of lists, keyed by team name, whose teams are listed in the
+given orders; the lists from the second are appended to the first, with their
+sequence numbers shifted by the given offset.
+Returns the merged team order and dictionary.
+"""
+def mergeTeamLines(teamNames, lines, otherTeamNames, otherLines, offset):
+	mergedNames = list(teamNames)
+	merged = {}
+	for teamName in teamNames:
+		merged[teamName] = list(lines[teamName])
+	for teamName in otherTeamNames:
+		if teamName not in merged:
+			mergedNames.append(teamName)
+			merged[teamName] = []
+		merged[teamName].extend(shiftLineTuples(otherLines[teamName], offset))
+	return (mergedNames, merged)
+
+"""
+The first phase of a season's analysis, for some of its games: everything that
+only needs adding up. That's each team's points and records, each player's total
+points and number of games, and each team's high scoring bench players and low
+scoring starters.
+Aggregates for consecutive runs of games merge into the aggregate for all of them,
+and merging is associative, so shards can be analyzed anywhere and reduced in any
+grouping, as long as they're merged in game order.
+"""
+class SeasonAggregate:
+	def __init__(self):
+		# teams and players are listed in the order they first played, as in Season
+		self.teamNames = []
+		self.teamTotals = {}
+		self.playerIds = []
+		self.playerTotals = {}
+
+		self.highScoringBenchLines = {}
+		self.lowScoringStarterLines = {}
+
+		self.lineCount = 0
+
+	"""
+	Add a game's totals, as Season.analyzeGame does.
+	"""
+	def addGame(self, game):
+		for teamScoreLine in game.teams.values():
+			for scoreLine in teamScoreLine.players:
+				scoreLine.sequence = self.lineCount
+				self.lineCount += 1
+
+				totals = self.playerTotals.get(scoreLine.playerId)
+				if totals is None:
+					totals = [ scoreLine.name, 0, 0 ]
+					self.playerIds.append(scoreLine.playerId)
+					self.playerTotals[scoreLine.playerId] = totals
+				totals[1] += scoreLine.points
+				totals[2] += 1
+
+		[ awayTeamName, homeTeamName ] = game.teams.keys()
+		awayTotals = self.getTeamTotals(awayTeamName)
+		homeTotals = self.getTeamTotals(homeTeamName)
+		awayTeamScore = game.teams[awayTeamName]
+		homeTeamScore = game.teams[homeTeamName]
+
+		awayTotals[6] += awayTeamScore.actualPoints
+		awayTotals[7] += homeTeamScore.actualPoints
+		homeTotals[6] += homeTeamScore.actualPoints
+		homeTotals[7] += awayTeamScore.actualPoints
+		awayTotals[8] += awayTeamScore.optimumPoints
+		awayTotals[9] += homeTeamScore.optimumPoints
+		homeTotals[8] += homeTeamScore.optimumPoints
+		homeTotals[9] += awayTeamScore.optimumPoints
+
+		self.addResult(game.actualWinner, awayTeamName, awayTotals, homeTeamName, homeTotals, 0)
+		self.addResult(game.optimumWinner, awayTeamName, awayTotals, homeTeamName, homeTotals, 3)
+
+		for (teamName, teamScoreLine) in [ (awayTeamName, awayTeamScore), (homeTeamName, homeTeamScore) ]:
+			for scoreLine in teamScoreLine.players:
+				if isHighScoringBench(scoreLine.slot, scoreLine.points):
+					self.highScoringBenchLines[teamName].append(getLineTuple(scoreLine))
+				elif isLowScoringStart(scoreLine.slot, scoreLine.points):
+					self.lowScoringStarterLines[teamName].append(getLineTuple(scoreLine))
+
+	"""
+	Add a win, loss or tie to both teams' totals; the offset picks actual or optimum.
+	"""
+	def addResult(self, winner, awayTeamName, awayTotals, homeTeamName, homeTotals, offset):
+		if winner == awayTeamName:
+			awayTotals[offset] += 1
+			homeTotals[offset + 1] += 1
+		elif winner == homeTeamName:
+			awayTotals[offset + 1] += 1
+			homeTotals[offset] += 1
+		else:
+			awayTotals[offset + 2] += 1
+			homeTotals[offset + 2] += 1
+
+	"""
+	Get a team's totals, adding the team if it hasn't played yet.
+	"""
+	def getTeamTotals(self, teamName):
+		totals = self.teamTotals.get(teamName)
+		if totals is None:
+			totals = [0] * len(TEAM_TOTAL_FIELDS)
+			self.teamNames.append(teamName)
+			self.teamTotals[teamName] = totals
+			self.highScoringBenchLines[teamName] = []
+			self.lowScoringStarterLines[teamName] = []
+		return totals
+
+	"""
+	Merge this aggregate with the one for the games that came after it, returning a new aggregate.
+	"""
+	def merge(self, other):
+		merged = SeasonAggregate()
+
+		merged.teamNames = list(self.teamNames)
+		for teamName in self.teamNames:
+			merged.teamTotals[teamName] = list(self.teamTotals[teamName])
+		for teamName in other.teamNames:
+			if teamName not in merged.teamTotals:
+				merged.teamNames.append(teamName)
+				merged.teamTotals[teamName] = [0] * len(TEAM_TOTAL_FIELDS)
+			totals = merged.teamTotals[teamName]
+			for (index, value) in enumerate(other.teamTotals[teamName]):
+				totals[index] += value
+
+		merged.playerIds = list(self.playerIds)
+		for playerId in self.playerIds:
+			merged.playerTotals[playerId] = list(self.playerTotals[playerId])
+		for playerId in other.playerIds:
+			(name, points, count) = other.playerTotals[playerId]
+			if playerId not in merged.playerTotals:
+				merged.playerIds.append(playerId)
+				merged.playerTotals[playerId] = [ name, 0, 0 ]
+			merged.playerTotals[playerId][1] += points
+			merged.playerTotals[playerId][2] += count
+
+		(teamNames, merged.highScoringBenchLines) = mergeTeamLines(self.teamNames, self.highScoringBenchLines, other.teamNames, other.highScoringBenchLines, self.lineCount)
+		(teamNames, merged.lowScoringStarterLines) = mergeTeamLines(self.teamNames, self.lowScoringStarterLines, other.teamNames, other.lowScoringStarterLines, self.lineCount)
+
+		merged.lineCount = self.lineCount + other.lineCount
+		return merged
+
+	"""
+	Get each player's average points, by player id; this is what the second phase needs.
+	"""
+	def getPlayerAverages(self):
+		averages = {}
+		for playerId in self.playerIds:
+			(name, points, count) = self.playerTotals[playerId]
+			averages[playerId] = (points * 1.0) / count
+		return averages
+
+"""
+The second phase of a season's analysis, for some of its games: the players who
+scored above their average against each team, and the player by opposing team
+matrix. Those need every player's average over the whole season, so they can only
+start once the first phase has been reduced.
+Like SeasonAggregate, these merge associatively in game order. A shard should be
+whole weeks, since a player's lines are looked up by week.
+"""
+class OpposingLinesAggregate:
+	def __init__(self):
+		self.teamNames = []
+		self.aboveAverageOpposingLines = {}
+		self.lineCount = 0
+
+		# the opponent matrix's cells, in the order they were made, as opponent cell tuples
+		self.opponentCells = []
+
+	"""
+	Add the players who scored above their average in each game to their opponent's list,
+	and every player's line to the opponent matrix, as Season.analyzeTeamPlayers does.
+	The games are game tuples, numbered by the first phase for the same games.
+	"""
+	def addGames(self, gameTuples, averages):
+		# the first above average line for each player in each week, as in Player.linesAboveAverageByWeek
+		aboveAverageByPlayerWeek = {}
+		for teams in gameTuples:
+			for (teamName, lineTuples) in teams:
+				for lineTuple in lineTuples:
+					(week, sequence, fields) = lineTuple
+					self.lineCount += 1
+					if fields[5] > averages[fields[0]]:
+						aboveAverageByPlayerWeek.setdefault((fields[0], week), lineTuple)
+
+		opponentMatrix = PlayerOpponentMatrix()
+		for teams in gameTuples:
+			[ (awayTeamName, awayLines), (homeTeamName, homeLines) ] = teams
+			for teamName in [ awayTeamName, homeTeamName ]:
+				if teamName not in self.aboveAverageOpposingLines:
+					self.teamNames.append(teamName)
+					self.aboveAverageOpposingLines[teamName] = []
+
+			for (lineTuples, opposingTeamName) in [ (awayLines, homeTeamName), (homeLines, awayTeamName) ]:
+				for (week, sequence, ( playerId, teamId, name, position, slot, points )) in lineTuples:
+					opponentMatrix.addLine(playerId, name, opposingTeamName, points, averages[playerId], sequence)
+					aboveAverageLine = aboveAverageByPlayerWeek.get((playerId, week))
+					if aboveAverageLine:
+						self.aboveAverageOpposingLines[opposingTeamName].append(aboveAverageLine)
+
+		for cell in sorted(opponentMatrix.iterCells(), key=sequenceOrder):
+			self.opponentCells.append(getCellTuple(opponentMatrix, cell))
+
+	"""
+	Merge this aggregate with the one for the games that came after it, returning a new aggregate.
+	"""
+	def merge(self, other):
+		merged = OpposingLinesAggregate()
+		(merged.teamNames, merged.aboveAverageOpposingLines) = mergeTeamLines(self.teamNames, self.aboveAverageOpposingLines, other.teamNames, other.aboveAverageOpposingLines, self.lineCount)
+		# the cells are only added up into one matrix once the season's built, so merging is just appending
+		merged.opponentCells = self.opponentCells + shiftCellTuples(other.opponentCells, self.lineCount)
+		merged.lineCount = self.lineCount + other.lineCount
+		return merged
+
+"""
+Merge a list of aggregates, in order. Neighbours are merged pairwise, round after
+round, rather than each into the running total, so the earlier shards' results
+aren't copied again for every shard after them.
+"""
+def reduceAggregates(aggregates):
+	while len(aggregates) > 1:
+		merged = []
+		for index in range(0, len(aggregates) - 1, 2):
+			merged.append(aggregates[index].merge(aggregates[index + 1]))
+		if len(aggregates) % 2:
+			merged.append(aggregates[-1])
+		aggregates = merged
+	return aggregates[0]
+
+"""
+Load the games for a shard of (week, game) pairs in a worker, using the parse cache
+in the given directory if there is one.
+"""
+def loadShardGames(year, weekGames, roster, cacheDirectory):
+	cache = None
+	if cacheDirectory:
+		cache = ParseCache(cacheDirectory)
+	return loadGameScores(year, weekGames, cache, 1, roster)
+
+"""
+Run the first phase for a shard. The arguments come in a single tuple, so this can
+be handed to a worker pool. Returns the shard's aggregate, and its games as game
+tuples for the second phase.
+"""
+def mapSeasonShard(task):
+	(year, weekGames, roster, cacheDirectory) = task
+	aggregate = SeasonAggregate()
+	gameTuples = []
+	for game in loadShardGames(year, weekGames, roster, cacheDirectory):
+		aggregate.addGame(game)
+		gameTuples.append(getGameTuple(game))
+	return (aggregate, gameTuples)
+
+"""
+Run the second phase for a shard, from the game tuples of its first phase, with
+every player's season average.
+"""
+def mapOpposingLinesShard(task):
+	(gameTuples, averages) = task
+	aggregate = OpposingLinesAggregate()
+	aggregate.addGames(gameTuples, averages)
+	return aggregate
+
+"""
+Build a Season holding the teams and players from the reduced aggregates, so the
+team and player reports can be printed from it as usual.
+The season has no games, and its players have their totals and averages but not
+their score lines; the points lines in the teams' lists are rebuilt from the
+compact lines the aggregates carried.
+"""
+def buildSeason(year, seasonAggregate, opposingLinesAggregate):
+	season = Season(year)
+
+	for playerId in seasonAggregate.playerIds:
+		(name, points, count) = seasonAggregate.playerTotals[playerId]
+		player = season.addPlayer(playerId, name)
+		player.totalPoints = points
+		player.averagePoints = (points * 1.0) / count
+
+	for teamName in seasonAggregate.teamNames:
+		team = season.addTeam(teamName)
+		for (field, value) in zip(TEAM_TOTAL_FIELDS, seasonAggregate.teamTotals[teamName]):
+			setattr(team, field, value)
+		for lineTuple in seasonAggregate.highScoringBenchLines[teamName]:
+			team.addHighScoringBenchPlayerPointsLine(buildPointsLine(season, lineTuple))
+		for lineTuple in seasonAggregate.lowScoringStarterLines[teamName]:
+			team.addLowScoringStarterPlayerPointsLine(buildPointsLine(season, lineTuple))
+
+	for teamName in opposingLinesAggregate.teamNames:
+		team = season.addTeam(teamName)
+		for lineTuple in opposingLinesAggregate.aboveAverageOpposingLines[teamName]:
+			team.addAboveAverageOpposingPlayerPointsLine(buildPointsLine(season, lineTuple))
+	for cellTuple in opposingLinesAggregate.opponentCells:
+		(sequence, playerId, playerName, teamName, appearances, points, expectedPoints) = cellTuple
+		season.opponentMatrix.addCellTotals(playerId, playerName, teamName, sequence, appearances, points, expectedPoints)
+
+	return season
+
+"""
+Rebuild a player points line from a compact line.
+"""
+def buildPointsLine(season, lineTuple):
+	(week, sequence, fields) = lineTuple
+	scoreLine = PlayerScoreLine(week, fields=fields)
+	scoreLine.sequence = sequence
+	return PlayerPointsLine(season.getPlayerById(scoreLine.playerId), scoreLine)
+
+"""
+Analyze a season as a two phase map-reduce over the given shards, each a list of
+(week, game) pairs covering whole weeks, in order. With more than one job, the
+shards are analyzed in a pool of worker processes, each of which parses its own
+boxscores (through the parse cache, if there's a directory for it), and only the
+compact aggregates come back to be reduced.
+The first phase adds up the teams and players, and hands back each shard's games as
+compact game tuples; once it's reduced, the player averages go back out with the
+game tuples for the second phase, which finds the above average lines, so the
+boxscores are only read once.
+Returns a Season with the same team and player reports as analyzing it in one go.
+"""
+def analyzeShards(year, shards, jobs=1, cacheDirectory=None, roster=DEFAULT_ROSTER):
+	pool = None
+	mapper = map
+	if jobs > 1:
+		pool = multiprocessing.Pool(jobs)
+		mapper = pool.map
+
+	try:
+		tasks = []
+		for weekGames in shards:
+			tasks.append((year, weekGames, roster, cacheDirectory))
+		results = mapper(mapSeasonShard, tasks)
+		seasonAggregate = reduceAggregates([ aggregate for (aggregate, gameTuples) in results ])
+
+		averages = seasonAggregate.getPlayerAverages()
+		tasks = []
+		for (aggregate, gameTuples) in results:
+			tasks.append((gameTuples, averages))
+		opposingLinesAggregate = reduceAggregates(mapper(mapOpposingLinesShard, tasks))
+	finally:
+		if pool:
+			pool.close()
+			pool.join()
+
+	return buildSeason(year, seasonAggregate, opposingLinesAggregate)
+
+"""
+Split a season's (week, game) pairs into shards of whole weeks, one per week.
+"""
+def shardByWeek(weekGames):
+	shards = []
+	for (week, game) in weekGames:
+		if not shards or shards[-1][0][0] != week:
+			shards.append([])
+		shards[-1].append((week, game))
+	return shards
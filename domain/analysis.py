@@ -1,9 +1,15 @@
+import heapq
+
 
 """
 Represents a team in the league.
 Keep track of the team's actual record and optimum record, as well as the players who scored above their average against this team.
 """
-class Team:
+class Team(object):
+	__slots__ = ('name', 'actualWins', 'actualLosses', 'actualTies', 'optimumWins', 'optimumLosses', 'optimumTies',
+		'actualPointsFor', 'actualPointsAgainst', 'optimumPointsFor', 'optimumPointsAgainst',
+		'aboveAverageOpposingPlayerPointsLines', 'highScoringBenchPlayers', 'lowScoringStarters')
+
 	def __init__(self, name):
 		self.name = name
 		
@@ -19,34 +25,34 @@ class Team:
 		self.optimumPointsFor = 0
 		self.optimumPointsAgainst = 0
 
-		self.aboveAverageOpposingPlayerPointsLines = []
+		self.aboveAverageOpposingPlayerPointsLines = SortedLines(differenceFromAverageOrder)
 
-		self.highScoringBenchPlayers = []
-		self.lowScoringStarters = []
+		self.highScoringBenchPlayers = SortedLines(nameOrder)
+		self.lowScoringStarters = SortedLines(nameOrder)
 
 	"""
 	Add a player points line to this team, to keep track of those players who scored above their average against this team.
 	"""
 	def addAboveAverageOpposingPlayerPointsLine(self, line):
-		self.aboveAverageOpposingPlayerPointsLines.append(line)
+		self.aboveAverageOpposingPlayerPointsLines.add(line)
 
-		self.aboveAverageOpposingPlayerPointsLines.sort(PlayerPointsLine.sortByDifferenceFromAverage)
+	"""
+	Remove a player points line from the opposing players who scored above average, because the player's average has changed.
+	"""
+	def removeAboveAverageOpposingPlayerPointsLine(self, line):
+		self.aboveAverageOpposingPlayerPointsLines.remove(line)
 
 	"""
 	Add a player points line to the high scoring bench players list.
 	"""
 	def addHighScoringBenchPlayerPointsLine(self, line):
-		self.highScoringBenchPlayers.append(line)
-
-		self.highScoringBenchPlayers.sort(PlayerPointsLine.sortByName)
+		self.highScoringBenchPlayers.add(line)
 
 	"""
 	Add a player points line to the low scoring starters list.
 	"""
 	def addLowScoringStarterPlayerPointsLine(self, line):
-		self.lowScoringStarters.append(line)
-
-		self.lowScoringStarters.sort(PlayerPointsLine.sortByName)
+		self.lowScoringStarters.add(line)
 
 	"""
 	Get the total number of points scored against this team, over the course of the whole season, by players who scored more than their average in the game in which they faced this team.
@@ -84,51 +90,78 @@ class Player:
 		self.averagePoints = 0
 		self.linesAboveAverage = []
 		self.linesBelowAverage = []
+		self.linesAboveAverageByWeek = {}
+		self.pointsLinesByWeek = {}
 
 	"""
 	Add a PlayerScoreLine to this player's record.
+	Keeps a running total, so the average is always up to date.
 	"""
 	def addScoreLine(self, scoreLine):
 		self.scoreLines.append(scoreLine)
 
+		self.totalPoints += scoreLine.points
+		self.averagePoints = (self.totalPoints * 1.0) / len(self.scoreLines)
+
 	"""
 	Analyze the scores for this player over the course of the season.
-	Compiles the total points and the average weekly points, then calculates which games were above and below average.
+	Calculates which games were above and below average.
 	"""
 	def analyzeScores(self):
-		# first sum the points
-		self.totalPoints = 0
-		for scoreLine in self.scoreLines:
-			self.totalPoints += scoreLine.points
-
-		# calculate the average
-		self.averagePoints = (self.totalPoints * 1.0) / len(self.scoreLines)
+		# the points lines we've already made need to know about the new average
+		for line in self.pointsLinesByWeek.values():
+			line.averagePoints = self.averagePoints
 
 		# determine which lines are above and below average
 		self.linesAboveAverage = []
 		self.linesBelowAverage = []
+		self.linesAboveAverageByWeek = {}
 		for scoreLine in self.scoreLines:
-			if scoreLine.points > self.averagePoints:
-				self.linesAboveAverage.append(PlayerPointsLine(self, scoreLine))
-			elif scoreLine.points < self.averagePoints:
-				self.linesBelowAverage.append(PlayerPointsLine(self, scoreLine))
+			self.classifyScoreLine(scoreLine)
+
+	"""
+	Determine whether a single score line is above or below this player's average.
+	"""
+	def classifyScoreLine(self, scoreLine):
+		if scoreLine.points > self.averagePoints:
+			line = self.getPointsLine(scoreLine)
+			self.linesAboveAverage.append(line)
+			self.linesAboveAverageByWeek.setdefault(line.week, line)
+		elif scoreLine.points < self.averagePoints:
+			self.linesBelowAverage.append(self.getPointsLine(scoreLine))
+
+	"""
+	Get the points line for the given score line, creating it if we haven't yet.
+	There's only one points line per week, so they can be updated in place when the average changes.
+	"""
+	def getPointsLine(self, scoreLine):
+		line = self.pointsLinesByWeek.get(scoreLine.week)
+		if line is None or line.scoreLine is not scoreLine:
+			line = PlayerPointsLine(self, scoreLine)
+			self.pointsLinesByWeek[scoreLine.week] = line
+		return line
+
+	"""
+	Determine if we've already made a points line for the given score line.
+	"""
+	def hasPointsLine(self, scoreLine):
+		line = self.pointsLinesByWeek.get(scoreLine.week)
+		return line is not None and line.scoreLine is scoreLine
 
 	"""
 	Get this player's points line for the given week.
 	"""
 	def getAboveAverageWeeklyPointsLine(self, week):
-		for line in self.linesAboveAverage:
-			if line.playerId == self.playerId and line.week == week:
-				return line
-		else:
-			return None
+		return self.linesAboveAverageByWeek.get(week)
 
 """
 A simple class to represent the points a player scored in a given week, compared to their average points.
 There will be many of these for each player, depending on how often they scored above/below average against various teams.
 This is not a definitive data source for anything; it's created on the fly from the actual score line.
 """
-class PlayerPointsLine:
+class PlayerPointsLine(object):
+	__slots__ = ('scoreLine', 'playerId', 'name', 'averagePoints', 'week', 'weekPoints')
+
 	def __init__(self, player, playerScoreLine):
 		self.scoreLine = playerScoreLine
 		self.playerId = player.playerId
@@ -137,30 +170,244 @@ class PlayerPointsLine:
 		self.week = playerScoreLine.week
 		self.weekPoints = playerScoreLine.points
 
+"""
+The slots for players who aren't starting, as in TeamScoreLine.
+"""
+BENCH_SLOT = 'Bench'
+IR_SLOT = 'IR'
+
+"""
+The points a bench player has to score more than to be a high scoring bench player,
+and a starter has to score less than to be a low scoring starter, by default.
+"""
+HIGH_SCORING_BENCH_POINTS = 12
+LOW_SCORING_STARTER_POINTS = 10
+
+"""
+Determine if a player who scored the given points in the given slot was a high scoring bench player.
+"""
+def isHighScoringBench(slot, points, threshold=HIGH_SCORING_BENCH_POINTS):
+	return (slot == BENCH_SLOT and points > threshold)
+
+"""
+Determine if a player who scored the given points in the given slot was a low scoring starter.
+"""
+def isLowScoringStart(slot, points, threshold=LOW_SCORING_STARTER_POINTS):
+	return (slot != BENCH_SLOT and slot != IR_SLOT and points < threshold)
+
+"""
+Sort key for player points lines, by the difference between the week's points and the player's average, in descending order.
+Lines with the same difference stay in the order they were played.
+"""
+def differenceFromAverageOrder(line):
+	return (line.averagePoints - line.weekPoints, line.scoreLine.sequence)
+
+"""
+Sort key for player points lines, by the player's name.
+Lines for the same player stay in the order they were played.
+"""
+def nameOrder(line):
+	return (line.name, line.scoreLine.sequence)
+
+"""
+A list of lines that's kept in order by the given key function.
+Lines are appended as they come in, and the list is only sorted when it's read,
+rather than after every addition. The sort is stable, so lines with the same key
+stay in the order they were added.
+"""
+class SortedLines:
+	def __init__(self, key):
+		self.key = key
+		self.lines = []
+		self.isSorted = True
+
+	"""
+	Add a line to the list.
+	"""
+	def add(self, line):
+		self.lines.append(line)
+		self.isSorted = False
+
+	"""
+	Remove a line from the list.
+	"""
+	def remove(self, line):
+		self.lines.remove(line)
+
 	"""
-	Determine if this line represents a high scoring bench player.
+	Note that the keys of the lines have changed, so the list needs to be sorted again.
 	"""
-	def isHighScoringBenchPlayer(self):
-		return (self.scoreLine.slot == 'Bench' and self.weekPoints > 12)
-		#return (self.scoreLine.slot == 'Bench' and self.weekPoints > self.averagePoints)
+	def invalidate(self):
+		self.isSorted = False
 
 	"""
-	Determine if this line represents a low scoring starter.
+	Get all the lines, in order.
 	"""
-	def isLowScoringStarter(self):
-		return (self.scoreLine.slot != 'Bench' and self.scoreLine.slot != 'IR' and self.weekPoints < 10)
-		#return (self.scoreLine.slot != 'Bench' and self.scoreLine.slot != 'IR' and self.weekPoints < self.averagePoints)
+	def getLines(self):
+		if not self.isSorted:
+			self.lines.sort(key=self.key)
+			self.isSorted = True
+		return self.lines
+
+	def __iter__(self):
+		return iter(self.getLines())
+
+	def __len__(self):
+		return len(self.lines)
+
+"""
+How a single player did against a single opposing team: how many times they played
+them, the points they scored, and the points they'd have been expected to score,
+which is their season average for each of those games.
+"""
+class OpponentCell(object):
+	__slots__ = ('playerId', 'teamName', 'sequence', 'appearances', 'points', 'expectedPoints')
+
+	def __init__(self, playerId, teamName, sequence):
+		self.playerId = playerId
+		self.teamName = teamName
+		self.sequence = sequence
+		self.appearances = 0
+		self.points = 0
+		self.expectedPoints = 0.0
 
 	"""
-	Sorting function to sort by the difference between the week's points and the player's average, in descending order.
+	Get the points the player scored against the team above their average; negative
+	if they did worse against them than usual.
 	"""
-	def sortByDifferenceFromAverage(lineA, lineB):
-		return cmp(lineB.weekPoints - lineB.averagePoints, lineA.weekPoints - lineA.averagePoints)
+	def getPointsAboveAverage(self):
+		return self.points - self.expectedPoints
+
+"""
+Sort key for opponent cells, by points above average, in ascending order.
+Cells with the same points above average sort the earliest first, for heapq.nlargest.
+"""
+def pointsAboveAverageOrder(cell):
+	return (cell.getPointsAboveAverage(), -cell.sequence)
+
+"""
+A sparse matrix of every player against every fantasy team they played against, with
+their appearances, points and points above average in each pairing. Most players
+never face most teams, so only the pairings that happened are kept, indexed both by
+player and by team, so a player's history against every team and a team's history
+against every player are each a single lookup.
+Within a season, a player's expected points follow their average: when the average
+changes, the player's row is brought up to date. Matrices from several seasons can be
+merged into one, each pairing keeping the expected points from its own seasons.
+"""
+class PlayerOpponentMatrix:
+	def __init__(self):
+		self.cellsByPlayer = {}
+		self.cellsByTeam = {}
+		self.playerNames = {}
+
+		self.cellCount = 0
+
+	"""
+	Add a single game's line for a player against an opposing team, with the player's
+	average and the line's sequence number. A cell is numbered by its first line, to
+	keep ties in the order the pairings were first played.
+	"""
+	def addLine(self, playerId, playerName, teamName, points, averagePoints, sequence):
+		cell = self.getOrAddCell(playerId, teamName, sequence)
+		self.playerNames.setdefault(playerId, playerName)
+		cell.appearances += 1
+		cell.points += points
+		cell.expectedPoints += averagePoints
+
+	"""
+	Get a player's cell against a team, adding an empty one if they haven't played them yet.
+	"""
+	def getOrAddCell(self, playerId, teamName, sequence):
+		cell = self.getCell(playerId, teamName)
+		if cell is None:
+			cell = OpponentCell(playerId, teamName, sequence)
+			self.cellCount += 1
+			self.cellsByPlayer.setdefault(playerId, {})[teamName] = cell
+			self.cellsByTeam.setdefault(teamName, {})[playerId] = cell
+		return cell
+
+	"""
+	Bring a player's expected points up to date with a new season average.
+	Only for a matrix of a single season, where every appearance has the same average.
+	"""
+	def setPlayerAverage(self, playerId, averagePoints):
+		for cell in self.cellsByPlayer.get(playerId, {}).values():
+			cell.expectedPoints = cell.appearances * averagePoints
 
 	"""
-	Sorting function to sort by the player's name.
+	Get a player's cell against a team, or None if they never played them.
 	"""
-	def sortByName(lineA, lineB):
-		return cmp(lineA.name, lineB.name)
+	def getCell(self, playerId, teamName):
+		return self.cellsByPlayer.get(playerId, {}).get(teamName)
 
+	"""
+	Get a player's history against every team they played, as a dictionary of cells by team name.
+	"""
+	def getPlayerHistory(self, playerId):
+		return self.cellsByPlayer.get(playerId, {})
 
+	"""
+	Get a team's history against every player who played them, as a dictionary of cells by player id.
+	"""
+	def getTeamHistory(self, teamName):
+		return self.cellsByTeam.get(teamName, {})
+
+	"""
+	Get the players who scored the most above their average against a team, best first.
+	Only the top few are kept as the team's players are scanned, rather than sorting them all.
+	Players with the same points above average are in the order they first played the team.
+	"""
+	def getTopPlayersAgainstTeam(self, teamName, count):
+		return heapq.nlargest(count, self.getTeamHistory(teamName).itervalues(), key=pointsAboveAverageOrder)
+
+	"""
+	Get the teams a player scored the most above their average against, best first.
+	"""
+	def getTopTeamsForPlayer(self, playerId, count):
+		return heapq.nlargest(count, self.getPlayerHistory(playerId).itervalues(), key=pointsAboveAverageOrder)
+
+	"""
+	Get the player's name, by their id.
+	"""
+	def getPlayerName(self, playerId):
+		return self.playerNames.get(playerId)
+
+	"""
+	Merge this matrix with another, such as another season's, returning a new matrix.
+	The merged cells are numbered again, this matrix's first.
+	"""
+	def merge(self, other):
+		merged = PlayerOpponentMatrix()
+		for matrix in [ self, other ]:
+			for cell in sorted(matrix.iterCells(), key=sequenceOrder):
+				merged.addCellTotals(cell.playerId, matrix.getPlayerName(cell.playerId), cell.teamName, merged.cellCount, cell.appearances, cell.points, cell.expectedPoints)
+		return merged
+
+	"""
+	Add the totals of another matrix's cell, such as one for some of the same season's
+	games, to this matrix's cell for the same pairing. A new cell gets the given sequence number.
+	"""
+	def addCellTotals(self, playerId, playerName, teamName, sequence, appearances, points, expectedPoints):
+		cell = self.getOrAddCell(playerId, teamName, sequence)
+		self.playerNames.setdefault(playerId, playerName)
+		cell.appearances += appearances
+		cell.points += points
+		cell.expectedPoints += expectedPoints
+
+	"""
+	Iterate over every cell in the matrix.
+	"""
+	def iterCells(self):
+		for cells in self.cellsByPlayer.itervalues():
+			for cell in cells.itervalues():
+				yield cell
+
+	def __len__(self):
+		return self.cellCount
+
+"""
+Sort key for opponent cells, in the order they were made.
+"""
+def sequenceOrder(cell):
+	return cell.sequence
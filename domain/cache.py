@@ -0,0 +1,160 @@
+import os
+import cPickle
+import hashlib
+
+"""
+The directory used for the parse cache when none is given.
+"""
+DEFAULT_CACHE_DIRECTORY = '.cache'
+
+"""
+Bump this whenever the shape of the parsed data changes, so that old cache
+entries are ignored rather than loaded into the wrong structure.
+"""
+CACHE_VERSION = 1
+
+"""
+An on-disk cache of parsed boxscore files.
+Each entry holds the compact (team name, player fields) rows that
+GameScore.parseFile produces, keyed by the boxscore's path and validated
+against its size and modification time, so a changed file is re-parsed.
+The total size of the cache can be capped; the least recently used entries
+are evicted first.
+"""
+class ParseCache:
+	def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, maxBytes=None):
+		self.directory = directory
+		self.maxBytes = maxBytes
+		self.totalBytes = None
+
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+		if not os.path.isdir(self.directory):
+			os.makedirs(self.directory)
+
+	"""
+	Get the parsed rows for the given boxscore file, or None if there's no
+	valid entry for it. Entries for files that have changed since they were
+	cached are removed.
+	"""
+	def get(self, filename):
+		entryFilename = self._getEntryFilename(filename)
+		try:
+			entryFile = open(entryFilename, 'rb')
+		except IOError:
+			self.misses += 1
+			return None
+
+		try:
+			try:
+				entry = cPickle.load(entryFile)
+			finally:
+				entryFile.close()
+		except Exception:
+			entry = None
+
+		if entry is None or entry['signature'] != self._getSignature(filename):
+			self._remove(entryFilename)
+			self.misses += 1
+			return None
+
+		# touch the entry so eviction knows it was recently used
+		os.utime(entryFilename, None)
+		self.hits += 1
+		return entry['rows']
+
+	"""
+	Store the parsed rows for the given boxscore file, then evict old entries
+	if the cache has grown past its size cap.
+	"""
+	def put(self, filename, rows):
+		signature = self._getSignature(filename)
+		if signature is None:
+			return
+
+		entryFilename = self._getEntryFilename(filename)
+		if os.path.exists(entryFilename):
+			self._remove(entryFilename)
+
+		# write to a temporary file first, so a partial entry is never read
+		temporaryFilename = '%s.%d.tmp' % (entryFilename, os.getpid())
+		entryFile = open(temporaryFilename, 'wb')
+		try:
+			cPickle.dump({ 'filename': filename, 'signature': signature, 'rows': rows }, entryFile, cPickle.HIGHEST_PROTOCOL)
+		finally:
+			entryFile.close()
+		os.rename(temporaryFilename, entryFilename)
+
+		if self.totalBytes is not None:
+			self.totalBytes += os.path.getsize(entryFilename)
+		self.evict()
+
+	"""
+	Remove the least recently used entries until the cache fits in its size cap.
+	"""
+	def evict(self):
+		if self.maxBytes is None:
+			return
+
+		if self.totalBytes is None:
+			self.totalBytes = self.getSize()
+		if self.totalBytes <= self.maxBytes:
+			return
+
+		entries = []
+		for entryFilename in self._getEntryFilenames():
+			stat = os.stat(entryFilename)
+			entries.append((stat.st_mtime, stat.st_size, entryFilename))
+		entries.sort()
+
+		for (mtime, size, entryFilename) in entries:
+			if self.totalBytes <= self.maxBytes:
+				break
+			self._remove(entryFilename)
+			self.evictions += 1
+
+	"""
+	Remove every entry from the cache.
+	"""
+	def clear(self):
+		for entryFilename in self._getEntryFilenames():
+			self._remove(entryFilename)
+		self.totalBytes = 0
+
+	"""
+	Get the number of bytes currently used by the cache entries.
+	"""
+	def getSize(self):
+		total = 0
+		for entryFilename in self._getEntryFilenames():
+			total += os.path.getsize(entryFilename)
+		return total
+
+	def _getEntryFilenames(self):
+		entryFilenames = []
+		for name in os.listdir(self.directory):
+			if name.endswith('.pickle'):
+				entryFilenames.append(os.path.join(self.directory, name))
+		return entryFilenames
+
+	def _getEntryFilename(self, filename):
+		key = hashlib.md5('%d:%s' % (CACHE_VERSION, os.path.abspath(filename))).hexdigest()
+		return os.path.join(self.directory, '%s.pickle' % key)
+
+	def _getSignature(self, filename):
+		try:
+			stat = os.stat(filename)
+		except OSError:
+			return None
+		return (stat.st_size, stat.st_mtime)
+
+	def _remove(self, entryFilename):
+		try:
+			size = os.path.getsize(entryFilename)
+			os.remove(entryFilename)
+		except OSError:
+			return
+		if self.totalBytes is not None:
+			self.totalBytes -= size
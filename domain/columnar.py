@@ -0,0 +1,270 @@
+import sys
+import numpy
+from domain.analysis import BENCH_SLOT, IR_SLOT, HIGH_SCORING_BENCH_POINTS, LOW_SCORING_STARTER_POINTS
+from domain.lineup import DEFAULT_ROSTER
+from domain.parse import findGameFilename
+from domain.ingest import loadTeamRows
+from domain.report import TextWriter
+
+"""
+Assigns small integer codes to strings, in the order they're first seen.
+"""
+class Encoder:
+	def __init__(self):
+		self.values = []
+		self.codes = {}
+
+	def encode(self, value):
+		code = self.codes.get(value)
+		if code is None:
+			code = len(self.values)
+			self.codes[value] = code
+			self.values.append(value)
+		return code
+
+	def getCode(self, value):
+		return self.codes.get(value, -1)
+
+	def __len__(self):
+		return len(self.values)
+
+"""
+A columnar store of every player-week line in a season (or several).
+Each line is a row across a set of parallel arrays: week, game, team-week,
+fantasy team, player, NFL team id, position, slot and points. The strings
+are dictionary encoded. The season-wide analyses are group-bys over the arrays,
+so they run in NumPy instead of looping over Python objects.
+
+Lines are added with addGame or addTeamRows; call freeze once they're all in,
+before analyzing. The roster's starting slots are the ones that count towards a
+team's actual points, as in TeamScoreLine.
+"""
+class PlayerLineStore:
+	def __init__(self, roster=DEFAULT_ROSTER):
+		self.roster = roster
+		self.teams = Encoder()
+		self.players = Encoder()
+		self.positions = Encoder()
+		self.slots = Encoder()
+		self.playerNames = []
+
+		self.gameCount = 0
+
+		# one entry per team per game
+		self.teamWeekTeams = []
+		self.teamWeekWeeks = []
+		self.teamWeekGames = []
+
+		self.columns = {}
+		for column in ['week', 'game', 'teamWeek', 'team', 'player', 'nflTeam', 'position', 'slot', 'points']:
+			self.columns[column] = []
+
+	"""
+	Add the lines from a parsed GameScore.
+	"""
+	def addGame(self, game):
+		teamRows = []
+		for teamName in game.teams:
+			rows = []
+			for player in game.teams[teamName].players:
+				rows.append(player.getFields())
+			teamRows.append((teamName, rows))
+		self.addTeamRows(game.week, game.game, teamRows)
+
+	"""
+	Add the lines from a game's parsed (team name, player fields) rows, as they come
+	out of the parser or the parse cache, without building any objects.
+	"""
+	def addTeamRows(self, week, game, teamRows):
+		# go through the teams in the same order a GameScore's dictionary would
+		teams = {}
+		for (teamName, rows) in teamRows:
+			teams[teamName] = rows
+
+		self.gameCount += 1
+		columns = self.columns
+		for teamName in teams:
+			teamWeek = len(self.teamWeekTeams)
+			team = self.teams.encode(teamName)
+			self.teamWeekTeams.append(team)
+			self.teamWeekWeeks.append(week)
+			self.teamWeekGames.append(game)
+
+			for (playerId, teamId, name, position, slot, points) in teams[teamName]:
+				player = self.players.encode(playerId)
+				if player == len(self.playerNames):
+					self.playerNames.append(name)
+
+				columns['week'].append(week)
+				columns['game'].append(game)
+				columns['teamWeek'].append(teamWeek)
+				columns['team'].append(team)
+				columns['player'].append(player)
+				columns['nflTeam'].append(int(teamId))
+				columns['position'].append(self.positions.encode(position))
+				columns['slot'].append(self.slots.encode(slot))
+				columns['points'].append(points)
+
+	"""
+	Turn the columns into arrays, so they can be analyzed.
+	"""
+	def freeze(self):
+		for column in self.columns:
+			self.columns[column] = numpy.array(self.columns[column], dtype=numpy.int32)
+		self.teamWeekTeams = numpy.array(self.teamWeekTeams, dtype=numpy.int32)
+		self.teamWeekWeeks = numpy.array(self.teamWeekWeeks, dtype=numpy.int32)
+		self.teamWeekGames = numpy.array(self.teamWeekGames, dtype=numpy.int32)
+
+	"""
+	Get the number of player-week lines in the store.
+	"""
+	def getLineCount(self):
+		return len(self.columns['points'])
+
+	"""
+	Get each player's total points and number of lines, indexed by player code.
+	"""
+	def getPlayerTotals(self):
+		players = self.columns['player']
+		totals = numpy.bincount(players, weights=self.columns['points'], minlength=len(self.players)).astype(numpy.int64)
+		counts = numpy.bincount(players, minlength=len(self.players))
+		return (totals, counts)
+
+	"""
+	Get each player's average points, indexed by player code; see Player.analyzeScores.
+	"""
+	def getPlayerAverages(self):
+		(totals, counts) = self.getPlayerTotals()
+		return totals.astype(numpy.float64) / counts
+
+	"""
+	Get a mask of the lines where the player scored above their average.
+	"""
+	def getAboveAverageMask(self):
+		return self.columns['points'] > self.getPlayerAverages()[self.columns['player']]
+
+	"""
+	Get a mask of the lines where the player scored below their average.
+	"""
+	def getBelowAverageMask(self):
+		return self.columns['points'] < self.getPlayerAverages()[self.columns['player']]
+
+	"""
+	Get the points scored by the players in the given slots, for each team in each game,
+	indexed by team-week; see TeamScoreLine.getPointsBySlots.
+	"""
+	def getPointsBySlots(self, slots):
+		mask = self.getSlotMask(slots)
+		return numpy.bincount(self.columns['teamWeek'][mask], weights=self.columns['points'][mask], minlength=len(self.teamWeekTeams)).astype(numpy.int64)
+
+	"""
+	Get the actual points each team scored in each game, indexed by team-week.
+	"""
+	def getActualPoints(self):
+		return self.getPointsBySlots(self.roster.getSlotNames())
+
+	"""
+	Get a mask of the lines for players in the given slots.
+	"""
+	def getSlotMask(self, slots):
+		codes = []
+		for slot in slots:
+			codes.append(self.slots.getCode(slot))
+		return numpy.in1d(self.columns['slot'], codes)
+
+	"""
+	Get a mask of the lines for bench players who scored more than the given points; see isHighScoringBench.
+	"""
+	def getHighScoringBenchMask(self, points=HIGH_SCORING_BENCH_POINTS):
+		return (self.columns['slot'] == self.slots.getCode(BENCH_SLOT)) & (self.columns['points'] > points)
+
+	"""
+	Get a mask of the lines for starters who scored fewer than the given points; see isLowScoringStart.
+	"""
+	def getLowScoringStarterMask(self, points=LOW_SCORING_STARTER_POINTS):
+		slots = self.columns['slot']
+		return (slots != self.slots.getCode(BENCH_SLOT)) & (slots != self.slots.getCode(IR_SLOT)) & (self.columns['points'] < points)
+
+	"""
+	Get the lines picked out by a mask for each team, by team code, as line numbers
+	sorted by the player's name, the way Team keeps its bench players and starters.
+	"""
+	def getTeamLinesByName(self, mask):
+		lines = numpy.nonzero(mask)[0]
+		teamLines = [ [] for team in range(len(self.teams)) ]
+		for (line, team, player) in zip(lines, self.columns['team'][lines], self.columns['player'][lines]):
+			teamLines[team].append((self.playerNames[player], line))
+		for lines in teamLines:
+			lines.sort()
+		return teamLines
+
+	"""
+	Print a summary of each player's scores, in the same format as Season.printPlayerScoreSummary.
+	"""
+	def printPlayerScoreSummary(self):
+		self.writePlayerScoreSummary(TextWriter(sys.stdout))
+
+	def writePlayerScoreSummary(self, writer):
+		(totals, counts) = self.getPlayerTotals()
+		averages = self.getPlayerAverages()
+		fields = ('player', 'totalPoints', 'averagePoints')
+		for player in range(len(self.players)):
+			writer.writeRecord(fields, (self.playerNames[player], int(totals[player]), float(averages[player])), "%(player)s: total points: %(totalPoints)d; average points: %(averagePoints)f")
+
+	"""
+	Print the bench players on each team who scored more than the given points, in the
+	same format as Season.printHighScoringBenchPlayersSummary.
+	"""
+	def printHighScoringBenchPlayersSummary(self, points=HIGH_SCORING_BENCH_POINTS):
+		self.writeHighScoringBenchPlayersSummary(TextWriter(sys.stdout), points)
+
+	def writeHighScoringBenchPlayersSummary(self, writer, points=HIGH_SCORING_BENCH_POINTS):
+		self.writeTeamLines(writer, self.getHighScoringBenchMask(points))
+
+	"""
+	Print the starters on each team who scored fewer than the given points, in the same
+	format as Season.printLowScoringStartersSummary.
+	"""
+	def printLowScoringStartersSummary(self, points=LOW_SCORING_STARTER_POINTS):
+		self.writeLowScoringStartersSummary(TextWriter(sys.stdout), points)
+
+	def writeLowScoringStartersSummary(self, writer, points=LOW_SCORING_STARTER_POINTS):
+		self.writeTeamLines(writer, self.getLowScoringStarterMask(points))
+
+	"""
+	Write the lines picked out by a mask under each team, in the order the teams first played.
+	"""
+	def writeTeamLines(self, writer, mask):
+		fields = ('team', 'player', 'week', 'points')
+		for (team, lines) in enumerate(self.getTeamLinesByName(mask)):
+			teamName = self.teams.values[team]
+			writer.writeText("%s", (teamName,))
+			for (name, line) in lines:
+				writer.writeRecord(fields, (teamName, name, int(self.columns['week'][line]), int(self.columns['points'][line])), "%(player)s, week %(week)d: %(points)d")
+
+"""
+Build a frozen store from an analyzed or unanalyzed Season, whose games were parsed with the given roster.
+"""
+def storeFromSeason(season, roster=DEFAULT_ROSTER):
+	store = PlayerLineStore(roster)
+	for game in season.games:
+		store.addGame(game)
+	store.freeze()
+	return store
+
+"""
+Build a frozen store straight from the boxscore files for the given (week, game)
+pairs, using the parse cache where possible and never building the object model.
+With more than one job, the files are parsed in a pool of worker processes.
+"""
+def loadPlayerLineStore(year, weekGames, cache=None, jobs=1, roster=DEFAULT_ROSTER):
+	store = PlayerLineStore(roster)
+	teamRowsByGame = loadTeamRows(year, weekGames, cache, jobs)
+	for (week, game) in weekGames:
+		teamRows = teamRowsByGame[(week, game)]
+		if teamRows is None:
+			print "Could not read file: %s" % findGameFilename(year, week, game)
+			continue
+		store.addTeamRows(week, game, teamRows)
+	store.freeze()
+	return store
@@ -0,0 +1,67 @@
+import os
+import gzip
+from domain.parse import COMPRESSED_SUFFIX, ROSTER_MARKER, PLAYER_ROW_MARKER, getGameFilename, findGameFilename, openBoxscoreFile, readRosterLines, readBoxscoreFile
+
+"""
+The gzip compression level for compacted boxscores; they're written once and read many times.
+"""
+COMPACT_COMPRESSION_LEVEL = 9
+
+"""
+Compact a single game's boxscore: keep only its roster section, which is all the
+parser reads, and gzip it into <game>.gz, replacing the original file.
+The compacted file is checked to parse to exactly the same rows as the original
+before the original is removed; if it doesn't, the original is kept.
+Returns the sizes of the original and compacted files, or None if the game couldn't
+be read or compacted.
+"""
+def compactBoxscoreFile(year, week, game):
+	filename = findGameFilename(year, week, game)
+	compactFilename = getGameFilename(year, week, game) + COMPRESSED_SUFFIX
+
+	originalRows = readBoxscoreFile(filename)
+	if originalRows is None:
+		print "Could not read file: %s" % filename
+		return None
+
+	boxscoreFile = openBoxscoreFile(filename)
+	try:
+		rosterLines = trimRosterLines(list(readRosterLines(boxscoreFile)))
+	finally:
+		boxscoreFile.close()
+
+	# the temporary file starts with a dot, so it's never picked up as a game
+	temporaryFilename = os.path.join(os.path.dirname(compactFilename), '.%s.%d%s' % (game, os.getpid(), COMPRESSED_SUFFIX))
+	compactFile = gzip.open(temporaryFilename, 'wb', COMPACT_COMPRESSION_LEVEL)
+	try:
+		compactFile.writelines(rosterLines)
+	finally:
+		compactFile.close()
+
+	if readBoxscoreFile(temporaryFilename) != originalRows:
+		os.remove(temporaryFilename)
+		print "Could not compact file: %s" % filename
+		return None
+
+	originalBytes = os.path.getsize(filename)
+	os.rename(temporaryFilename, compactFilename)
+	if filename != compactFilename:
+		os.remove(filename)
+	return (originalBytes, os.path.getsize(compactFilename))
+
+"""
+Trim a boxscore's lines down to its roster section, from the first team title to the
+last player row, as readRosterLines does for a plain file; a compressed file's lines
+come back whole. If there's no roster section, all the lines are kept.
+"""
+def trimRosterLines(lines):
+	first = None
+	last = None
+	for (index, line) in enumerate(lines):
+		if ROSTER_MARKER in line or PLAYER_ROW_MARKER in line:
+			if first is None and ROSTER_MARKER in line:
+				first = index
+			last = index
+	if first is None:
+		return lines
+	return lines[first:last + 1]
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import Queue
+import httplib
+import urlparse
+import threading
+import email.utils
+from domain.parse import getGameFilename, findGameFilename
+
+"""
+Where the fetcher keeps each boxscore's ETag and Last-Modified headers, within the
+year's directory. It starts with a dot, so it isn't mistaken for a week.
+"""
+FETCH_METADATA_FILENAME = '.fetch-metadata'
+
+"""
+The HTTP statuses worth trying again, after a pause.
+"""
+RETRY_STATUSES = [ 429, 500, 502, 503, 504 ]
+
+"""
+The longest pause a server's Retry-After header can ask for, in seconds, so a bad
+header can't hold up a fetch indefinitely.
+"""
+MAX_RETRY_AFTER = 120
+
+"""
+Spaces requests out so there are no more than the given number per second, across
+all the threads sharing it. No rate means no limit.
+"""
+class RateLimiter:
+	def __init__(self, rate=None):
+		self.interval = rate and 1.0 / rate or 0
+		self.nextTime = 0
+		self.lock = threading.Lock()
+
+	def wait(self):
+		if not self.interval:
+			return
+		self.lock.acquire()
+		try:
+			now = time.time()
+			waitTime = self.nextTime - now
+			self.nextTime = max(now, self.nextTime) + self.interval
+		finally:
+			self.lock.release()
+		if waitTime > 0:
+			time.sleep(waitTime)
+
+"""
+Downloads boxscore pages into the YEAR/WEEK/GAME layout, from a base URL that the
+year, week and game are appended to as path components (or substituted into, if
+it has %(year)s, %(week)s and %(game)s in it).
+The pages are fetched by a fixed number of threads, each of which keeps one
+connection open and reuses it for every request it makes. Requests are rate limited,
+failures and server errors are retried with a growing pause, and a page that was
+fetched before is only downloaded again if the server says it's changed, using the
+ETag and Last-Modified headers from last time. Each page is written to a temporary
+file and renamed into place, so a half written boxscore is never read.
+"""
+class BoxscoreFetcher:
+	def __init__(self, baseUrl, threads=4, rate=None, retries=3, timeout=30):
+		self.baseUrl = baseUrl
+		self.threads = max(threads, 1)
+		self.rateLimiter = RateLimiter(rate)
+		self.retries = retries
+		self.timeout = timeout
+
+		self.lock = threading.Lock()
+		self.metadata = {}
+
+		self.downloaded = 0
+		self.notModified = 0
+		self.missing = 0
+		self.failed = 0
+		self.bytesDownloaded = 0
+
+	"""
+	Get the URL of a single game's boxscore page.
+	"""
+	def getUrl(self, year, week, game):
+		values = { 'year': year, 'week': week, 'game': game }
+		if '%(' in self.baseUrl:
+			return self.baseUrl % values
+		return '%s/%s/%s/%s' % (self.baseUrl.rstrip('/'), year, week, game)
+
+	"""
+	Fetch the given (week, game) pairs for a year. Pages the server doesn't have are
+	counted as missing, and no file is written for them.
+	"""
+	def fetch(self, year, weekGames):
+		self.loadMetadata(year)
+
+		tasks = Queue.Queue()
+		for (week, game) in weekGames:
+			tasks.put((week, game))
+
+		workers = []
+		for i in range(min(self.threads, len(weekGames))):
+			worker = threading.Thread(target=self.work, args=(year, tasks))
+			worker.daemon = True
+			worker.start()
+			workers.append(worker)
+		for worker in workers:
+			worker.join()
+
+		self.saveMetadata(year)
+
+	"""
+	Fetch games from the queue until it's empty, over a single reused connection.
+	"""
+	def work(self, year, tasks):
+		connections = {}
+		try:
+			while True:
+				try:
+					(week, game) = tasks.get_nowait()
+				except Queue.Empty:
+					return
+				self.fetchGame(year, week, game, connections)
+		finally:
+			for connection in connections.values():
+				connection.close()
+
+	"""
+	Fetch a single game, retrying if it fails.
+	"""
+	def fetchGame(self, year, week, game, connections):
+		url = self.getUrl(year, week, game)
+		filename = getGameFilename(year, week, game)
+		key = '%s/%s' % (week, game)
+
+		# the page may have been compacted since it was fetched, so look for either file
+		existingFilename = findGameFilename(year, week, game)
+		headers = {}
+		self.lock.acquire()
+		metadata = self.metadata.get(key, {})
+		self.lock.release()
+		if os.path.exists(existingFilename):
+			if metadata.get('etag'):
+				headers['If-None-Match'] = str(metadata['etag'])
+			headers['If-Modified-Since'] = str(metadata.get('lastModified') or email.utils.formatdate(os.path.getmtime(existingFilename), usegmt=True))
+
+		retryAfter = None
+		for attempt in range(self.retries + 1):
+			if attempt:
+				time.sleep(max(0.5 * 2 ** (attempt - 1), retryAfter or 0))
+			retryAfter = None
+			self.rateLimiter.wait()
+			try:
+				(status, body, responseHeaders) = self.request(url, headers, connections)
+			except (httplib.HTTPException, EnvironmentError):
+				# the connection may have been dropped; start a new one next time
+				self.closeConnection(url, connections)
+				continue
+
+			if status in RETRY_STATUSES:
+				retryAfter = getRetryAfter(responseHeaders)
+				continue
+			if status == 304:
+				self.count('notModified')
+			elif status == 404:
+				self.count('missing')
+			elif status == 200:
+				writeFileAtomically(filename, body)
+				if existingFilename != filename and os.path.exists(existingFilename):
+					# the compacted copy is out of date now
+					os.remove(existingFilename)
+				self.lock.acquire()
+				self.metadata[key] = { 'etag': responseHeaders.get('etag'), 'lastModified': responseHeaders.get('last-modified') }
+				self.downloaded += 1
+				self.bytesDownloaded += len(body)
+				self.lock.release()
+			else:
+				print "Could not fetch %s: HTTP %d" % (url, status)
+				self.count('failed')
+			return
+
+		print "Could not fetch %s" % url
+		self.count('failed')
+
+	"""
+	Make a single GET request, reusing this thread's connection to the host.
+	Returns the status, the body, and the headers by lower case name.
+	"""
+	def request(self, url, headers, connections):
+		parsedUrl = urlparse.urlsplit(url)
+		connectionKey = (parsedUrl.scheme, parsedUrl.netloc)
+		connection = connections.get(connectionKey)
+		if connection is None:
+			if parsedUrl.scheme == 'https':
+				connection = httplib.HTTPSConnection(parsedUrl.netloc, timeout=self.timeout)
+			else:
+				connection = httplib.HTTPConnection(parsedUrl.netloc, timeout=self.timeout)
+			connections[connectionKey] = connection
+
+		path = parsedUrl.path or '/'
+		if parsedUrl.query:
+			path += '?' + parsedUrl.query
+		connection.request('GET', path, headers=headers)
+		response = connection.getresponse()
+		body = response.read()
+		if response.getheader('connection', '').lower() == 'close':
+			self.closeConnection(url, connections)
+		return (response.status, body, dict(response.getheaders()))
+
+	def closeConnection(self, url, connections):
+		parsedUrl = urlparse.urlsplit(url)
+		connection = connections.pop((parsedUrl.scheme, parsedUrl.netloc), None)
+		if connection:
+			connection.close()
+
+	def count(self, counter):
+		self.lock.acquire()
+		setattr(self, counter, getattr(self, counter) + 1)
+		self.lock.release()
+
+	def loadMetadata(self, year):
+		try:
+			metadataFile = open(os.path.join(str(year), FETCH_METADATA_FILENAME), 'r')
+		except IOError:
+			self.metadata = {}
+			return
+		try:
+			self.metadata = json.load(metadataFile)
+		finally:
+			metadataFile.close()
+
+	def saveMetadata(self, year):
+		writeFileAtomically(os.path.join(str(year), FETCH_METADATA_FILENAME), json.dumps(self.metadata, indent=1, sort_keys=True))
+
+"""
+Write a file by writing a temporary file next to it and renaming it into place,
+making the directory first if need be. The temporary file starts with a dot, so
+it's never picked up as a week or a game.
+"""
+def writeFileAtomically(filename, contents):
+	(directory, basename) = os.path.split(filename)
+	if directory and not os.path.isdir(directory):
+		try:
+			os.makedirs(directory)
+		except OSError:
+			# another thread got there first
+			if not os.path.isdir(directory):
+				raise
+
+	temporaryFilename = os.path.join(directory, '.%s.%d.%d.tmp' % (basename, os.getpid(), threading.current_thread().ident))
+	temporaryFile = open(temporaryFilename, 'wb')
+	try:
+		temporaryFile.write(contents)
+	finally:
+		temporaryFile.close()
+	os.rename(temporaryFilename, filename)
+
+"""
+Get how long a server asked us to wait before trying again, in seconds, from its
+Retry-After header, which is either a number of seconds or a date; or None if it
+didn't say, or said something that can't be read. The wait is capped at MAX_RETRY_AFTER.
+"""
+def getRetryAfter(responseHeaders):
+	value = responseHeaders.get('retry-after')
+	if not value:
+		return None
+	value = value.strip()
+	if value.isdigit():
+		seconds = int(value)
+	else:
+		date = email.utils.parsedate_tz(value)
+		if date is None:
+			return None
+		seconds = email.utils.mktime_tz(date) - time.time()
+	return min(max(seconds, 0), MAX_RETRY_AFTER)
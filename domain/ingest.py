@@ -0,0 +1,82 @@
+import multiprocessing
+from domain.parse import GameScore, findGameFilename, readBoxscoreFile, timeBoxscoreFile
+from domain.profiling import getActiveProfiler
+from domain.lineup import DEFAULT_ROSTER
+
+"""
+Load the game scores for the given (week, game) pairs, in the order given.
+With more than one job, the boxscore files that aren't already cached are
+parsed in a pool of worker processes; the workers only hand back the compact
+parsed rows, and the GameScore objects are built here in the original order,
+so the result is exactly what a single process would have produced.
+"""
+def loadGameScores(year, weekGames, cache=None, jobs=1, roster=DEFAULT_ROSTER):
+	gameScores = []
+
+	if jobs <= 1:
+		for (week, game) in weekGames:
+			gameScores.append(GameScore(year, week, game, cache, roster=roster))
+		return gameScores
+
+	teamRowsByGame = loadTeamRows(year, weekGames, cache, jobs)
+	for (week, game) in weekGames:
+		# a game that couldn't be read falls through to GameScore, which reports it
+		gameScores.append(GameScore(year, week, game, teamRows=teamRowsByGame[(week, game)], roster=roster))
+	return gameScores
+
+"""
+Load the parsed (team name, player fields) rows of the given (week, game) pairs, by
+(week, game), from the cache where they're in it and from the boxscore files where
+they aren't, caching those. With more than one job, the files are parsed in a pool
+of worker processes, which hand back each file's timing with its rows to be recorded
+here. A game that couldn't be read has None for its rows.
+"""
+def loadTeamRows(year, weekGames, cache=None, jobs=1):
+	# find out which games still need to be parsed
+	teamRowsByGame = {}
+	misses = []
+	for (week, game) in weekGames:
+		teamRows = None
+		if cache:
+			teamRows = cache.get(findGameFilename(year, week, game))
+		if teamRows is None:
+			misses.append((week, game))
+		else:
+			teamRowsByGame[(week, game)] = teamRows
+
+	if misses:
+		tasks = []
+		for (week, game) in misses:
+			tasks.append(findGameFilename(year, week, game))
+
+		if jobs <= 1:
+			results = map(readBoxscoreFile, tasks)
+		else:
+			pool = multiprocessing.Pool(jobs)
+			try:
+				chunkSize = len(tasks) / (jobs * 4) + 1
+				timedResults = pool.map(timeBoxscoreFile, tasks, chunkSize)
+			finally:
+				pool.close()
+				pool.join()
+			results = recordFileTimings(tasks, timedResults)
+
+		for (filename, weekGame, teamRows) in zip(tasks, misses, results):
+			teamRowsByGame[weekGame] = teamRows
+			if teamRows is not None and cache:
+				cache.put(filename, teamRows)
+
+	return teamRowsByGame
+
+"""
+Record the timings that came back from the workers with their files' rows in this
+process's profiler, if there is one, and return just the rows.
+"""
+def recordFileTimings(filenames, timedResults):
+	profiler = getActiveProfiler()
+	results = []
+	for (filename, (teamRows, timing)) in zip(filenames, timedResults):
+		if profiler and timing:
+			profiler.recordFile(filename, *timing)
+		results.append(teamRows)
+	return results
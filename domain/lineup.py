@@ -0,0 +1,162 @@
+"""
+The starting lineup the analyzer has always assumed: 1 QB, 2 RB, 2 WR, 1 RB/WR, 1 TE, 1 D/ST, 1 K.
+"""
+DEFAULT_ROSTER_DESCRIPTION = 'QB:QB,RB:RB,RB:RB,WR:WR,WR:WR,RB/WR:RB+WR,TE:TE,D/ST:D/ST,K:K'
+
+"""
+Sort key for player score lines, by points.
+"""
+def pointsOrder(player):
+	return player.points
+
+"""
+Group the given player score lines by position, each group sorted by points, best first.
+Players with the same points stay in the order they were given.
+"""
+def sortByPosition(players):
+	playersByPosition = {}
+	for player in players:
+		playersByPosition.setdefault(player.position, []).append(player)
+	for position in playersByPosition:
+		playersByPosition[position].sort(key=pointsOrder, reverse=True)
+	return playersByPosition
+
+"""
+A league's starting lineup: a list of slots, each with the positions that can play in it.
+Slots are described as "<slot>:<position>[+<position>...]", separated by commas; for
+example, a superflex slot is "OP:QB+RB+WR+TE".
+
+Finds the optimum lineup for a team's players exactly, for any set of slots.
+Within a position, the players who start are always the best ones, so a lineup's
+points only depend on how many players of each position start. The optimizer
+goes through the slots one at a time, keeping the best lineup for each combination
+of those counts, which stays a small number of combinations for real rosters.
+Like a real lineup, a slot is only left empty if none of its positions have any
+players left, even if the players left would score negative points.
+"""
+class Roster:
+	def __init__(self, description=DEFAULT_ROSTER_DESCRIPTION):
+		self.description = description
+		self.slots = []
+		for slotDescription in description.split(','):
+			[ slotName, positions ] = slotDescription.strip().split(':')
+			self.slots.append((slotName, positions.split('+')))
+
+	"""
+	Get the names of the starting slots, without duplicates.
+	"""
+	def getSlotNames(self):
+		slotNames = []
+		for (slotName, positions) in self.slots:
+			if slotName not in slotNames:
+				slotNames.append(slotName)
+		return slotNames
+
+	"""
+	Find the optimum lineup for the given player score lines.
+	Returns the lineup's points, and the lineup itself as a list of (slot, player)
+	pairs in slot order, where the player is None for a slot that can't be filled.
+	"""
+	def optimize(self, players):
+		return self.optimizeSorted(sortByPosition(players))
+
+	"""
+	Find the optimum lineup, from players already grouped and sorted by sortByPosition.
+	"""
+	def optimizeSorted(self, playersByPosition):
+		positions = playersByPosition.keys()
+
+		# each state is the number of players used from each position, with the best points
+		# and the position picked for each slot so far; the list keeps the order deterministic
+		emptyCounts = (0,) * len(positions)
+		states = { emptyCounts: (0, ()) }
+		stateOrder = [ emptyCounts ]
+
+		for (slotName, slotPositions) in self.slots:
+			eligible = []
+			for (index, position) in enumerate(positions):
+				if position in slotPositions:
+					eligible.append((index, playersByPosition[position]))
+
+			nextStates = {}
+			nextStateOrder = []
+			for counts in stateOrder:
+				(points, picks) = states[counts]
+				filled = False
+				for (index, available) in eligible:
+					used = counts[index]
+					if used < len(available):
+						filled = True
+						nextCounts = counts[:index] + (used + 1,) + counts[index + 1:]
+						nextPoints = points + available[used].points
+						if nextCounts not in nextStates:
+							nextStateOrder.append(nextCounts)
+							nextStates[nextCounts] = (nextPoints, picks + (index,))
+						elif nextPoints > nextStates[nextCounts][0]:
+							nextStates[nextCounts] = (nextPoints, picks + (index,))
+				if not filled:
+					if counts not in nextStates:
+						nextStateOrder.append(counts)
+						nextStates[counts] = (points, picks + (None,))
+					elif points > nextStates[counts][0]:
+						nextStates[counts] = (points, picks + (None,))
+
+			states = nextStates
+			stateOrder = nextStateOrder
+
+		best = None
+		for counts in stateOrder:
+			if best is None or states[counts][0] > best[0]:
+				best = states[counts]
+		(points, picks) = best
+
+		# hand out each position's players, best first, to the slots that picked it
+		lineup = []
+		used = [0] * len(positions)
+		for ((slotName, slotPositions), index) in zip(self.slots, picks):
+			if index is None:
+				lineup.append((slotName, None))
+			else:
+				lineup.append((slotName, playersByPosition[positions[index]][used[index]]))
+				used[index] += 1
+
+		return (points, lineup)
+
+	"""
+	Find the best swap into or out of the actual lineup for each of the given player
+	score lines: for a bench player, the worst starter whose slot they could have played;
+	for a starter, the best bench player who could have played their slot. Players with
+	the same points are taken in the order they were given. The worst starter each
+	position could have replaced, and the best bench player each position had, are found
+	once, so each player's swap is a lookup rather than a scan of the other side of the lineup.
+	Returns the swapped players by the id of each player that has one.
+	"""
+	def findLineupSwaps(self, players):
+		slotPositions = dict(self.slots)
+
+		worstStarters = {}
+		bestBenchPlayers = {}
+		for (index, player) in enumerate(players):
+			if player.slot in slotPositions:
+				for position in slotPositions[player.slot]:
+					starter = worstStarters.get(position)
+					if starter is None or player.points < starter.points:
+						worstStarters[position] = player
+			elif player.slot == 'Bench':
+				benchPlayer = bestBenchPlayers.get(player.position)
+				if benchPlayer is None or player.points > benchPlayer[0]:
+					bestBenchPlayers[player.position] = (player.points, -index, player)
+
+		swaps = {}
+		for player in players:
+			if player.slot in slotPositions:
+				candidates = [ bestBenchPlayers[position] for position in slotPositions[player.slot] if position in bestBenchPlayers ]
+				if candidates:
+					swaps[id(player)] = max(candidates)[2]
+			elif player.slot == 'Bench':
+				starter = worstStarters.get(player.position)
+				if starter is not None:
+					swaps[id(player)] = starter
+		return swaps
+
+DEFAULT_ROSTER = Roster()
@@ -0,0 +1,215 @@
+import sys
+import numpy
+from domain.report import TextWriter
+
+"""
+The number of simulated schedules to run at a time; bounds the memory used by the simulation.
+"""
+SIMULATION_BATCH_SIZE = 10000
+
+"""
+Make the pairings for a round robin between the given number of positions, with the
+circle method: one position stays put while the rest rotate around it.
+Returns an array of [round, position] = opposing position, with -1 for a bye when
+there's an odd number of positions. With fewer than two positions, there are no rounds.
+"""
+def makeRoundRobin(positions):
+	if positions < 2:
+		return numpy.zeros((0, positions), dtype=numpy.int64)
+	size = positions + positions % 2
+	rounds = numpy.zeros((size - 1, size), dtype=numpy.int64)
+	circle = range(size)
+	for round in range(size - 1):
+		for i in range(size / 2):
+			a = circle[i]
+			b = circle[size - 1 - i]
+			rounds[round, a] = b
+			rounds[round, b] = a
+		# keep the first position fixed and rotate the others
+		circle = [ circle[0] ] + [ circle[-1] ] + circle[1:-1]
+
+	# the extra position, if any, is the bye
+	rounds[rounds >= positions] = -1
+	return rounds[:, :positions]
+
+"""
+Analyzes how lucky each team was in its schedule.
+Compares each team's record against every other team each week (all-play), simulates
+their record over many randomized round robin schedules, and measures the strength
+of the schedule they actually played.
+All of it is done with NumPy arrays of points by week and team, and the simulations
+are run in batches, so it stays fast for many thousands of schedules.
+"""
+class ScheduleLuck:
+	def __init__(self, season):
+		self.teamNames = []
+		for team in season.teams:
+			self.teamNames.append(team.name)
+		teamIndexes = {}
+		for (index, teamName) in enumerate(self.teamNames):
+			teamIndexes[teamName] = index
+
+		self.weeks = season.getWeeks()
+		weekIndexes = {}
+		for (index, week) in enumerate(self.weeks):
+			weekIndexes[week] = index
+
+		# points by week and team; NaN where a team didn't play that week
+		shape = (len(self.weeks), len(self.teamNames))
+		self.actualPoints = numpy.empty(shape)
+		self.actualPoints.fill(numpy.nan)
+		self.optimumPoints = numpy.empty(shape)
+		self.optimumPoints.fill(numpy.nan)
+		self.opponents = -numpy.ones(shape, dtype=numpy.int64)
+
+		for game in season.games:
+			week = weekIndexes[game.week]
+			[ awayTeamName, homeTeamName ] = game.teams.keys()
+			away = teamIndexes[awayTeamName]
+			home = teamIndexes[homeTeamName]
+			self.actualPoints[week, away] = game.teams[awayTeamName].actualPoints
+			self.actualPoints[week, home] = game.teams[homeTeamName].actualPoints
+			self.optimumPoints[week, away] = game.teams[awayTeamName].optimumPoints
+			self.optimumPoints[week, home] = game.teams[homeTeamName].optimumPoints
+			self.opponents[week, away] = home
+			self.opponents[week, home] = away
+
+		self.expectedWins = None
+		self.winsPercentiles = None
+
+	"""
+	Get each team's record if they'd played every other team every week, with the given
+	points by week and team. Returns arrays of wins, losses and ties, indexed by team.
+	"""
+	def getAllPlayRecords(self, points):
+		# comparisons against NaN are false, so weeks a team didn't play count for nothing;
+		# every team ties itself in the weeks it played, so those are taken back out
+		played = ~numpy.isnan(points)
+		with numpy.errstate(invalid='ignore'):
+			wins = (points[:, :, None] > points[:, None, :]).sum(axis=2).sum(axis=0)
+			losses = (points[:, :, None] < points[:, None, :]).sum(axis=2).sum(axis=0)
+			ties = (points[:, :, None] == points[:, None, :]).sum(axis=2).sum(axis=0) - played.sum(axis=0)
+		return (wins, losses, ties)
+
+	"""
+	Get each team's all-play record with the points they actually scored.
+	"""
+	def getActualAllPlayRecords(self):
+		return self.getAllPlayRecords(self.actualPoints)
+
+	"""
+	Get each team's all-play record with their optimum points.
+	"""
+	def getOptimumAllPlayRecords(self):
+		return self.getAllPlayRecords(self.optimumPoints)
+
+	"""
+	Get each team's wins against the schedule they actually played, counting a tie as half a win.
+	"""
+	def getActualWins(self):
+		opponentPoints = self.getOpponentPoints()
+		with numpy.errstate(invalid='ignore'):
+			return (self.actualPoints > opponentPoints).sum(axis=0) + 0.5 * (self.actualPoints == opponentPoints).sum(axis=0)
+
+	"""
+	Get the points scored against each team each week; NaN where they didn't play.
+	"""
+	def getOpponentPoints(self):
+		weeks = numpy.arange(len(self.weeks))[:, None]
+		opponentPoints = self.actualPoints[weeks, numpy.maximum(self.opponents, 0)]
+		opponentPoints[self.opponents < 0] = numpy.nan
+		return opponentPoints
+
+	"""
+	Simulate the season over the given number of random round robin schedules.
+	Each simulation shuffles the teams into the round robin and shuffles the order
+	of the rounds, repeating the rounds if there are more weeks than rounds; each
+	team's points each week stay what they actually scored.
+	Sets the expected wins for each team (a tie counts as half a win), and the
+	percentile of their actual wins among the simulated seasons.
+	"""
+	def simulate(self, simulations, seed=0):
+		teams = len(self.teamNames)
+		weeks = len(self.weeks)
+		if teams < 2:
+			# nobody to play, so every schedule is the one they had
+			self.expectedWins = numpy.zeros(teams)
+			self.winsPercentiles = numpy.zeros(teams) + 50.0
+			return
+
+		random = numpy.random.RandomState(seed)
+		roundRobin = makeRoundRobin(teams)
+		rounds = roundRobin.shape[0]
+
+		# with a bye, the team that sits out gets NaN points, so it neither wins nor loses
+		points = numpy.concatenate([ self.actualPoints, numpy.empty((weeks, 1)) ], axis=1)
+		points[:, teams] = numpy.nan
+		roundRobin = numpy.where(roundRobin < 0, teams, roundRobin)
+
+		actualWins = self.getActualWins()
+		totalWins = numpy.zeros(teams)
+		below = numpy.zeros(teams)
+		equal = numpy.zeros(teams)
+
+		done = 0
+		while done < simulations:
+			batch = min(SIMULATION_BATCH_SIZE, simulations - done)
+			batchIndexes = numpy.arange(batch)[:, None]
+
+			# which team is in each round robin position, and which round is played each week
+			teamAtPosition = numpy.argsort(random.random_sample((batch, teams)), axis=1)
+			roundOrder = numpy.argsort(random.random_sample((batch, rounds)), axis=1)
+			weekRounds = roundOrder[:, numpy.arange(weeks) % rounds]
+
+			# the position each position plays each week, then the teams in those positions
+			opposingPositions = roundRobin[weekRounds]
+			teamAtPositionWithBye = numpy.concatenate([ teamAtPosition, numpy.zeros((batch, 1), dtype=teamAtPosition.dtype) + teams ], axis=1)
+			opposingTeams = teamAtPositionWithBye[batchIndexes[:, :, None], opposingPositions]
+
+			weekIndexes = numpy.arange(weeks)[None, :, None]
+			teamPoints = points[weekIndexes, teamAtPosition[:, None, :]]
+			opposingPoints = points[weekIndexes, opposingTeams]
+			with numpy.errstate(invalid='ignore'):
+				positionWins = (teamPoints > opposingPoints).sum(axis=1) + 0.5 * (teamPoints == opposingPoints).sum(axis=1)
+
+			# put the wins back in team order
+			wins = numpy.empty((batch, teams))
+			wins[batchIndexes, teamAtPosition] = positionWins
+
+			totalWins += wins.sum(axis=0)
+			below += (wins < actualWins).sum(axis=0)
+			equal += (wins == actualWins).sum(axis=0)
+			done += batch
+
+		self.expectedWins = totalWins / simulations
+		self.winsPercentiles = 100.0 * (below + 0.5 * equal) / simulations
+
+	"""
+	Get each team's strength of schedule: the average all-play winning percentage of the
+	opponents they actually played, and the average points scored against them.
+	"""
+	def getStrengthOfSchedule(self):
+		(wins, losses, ties) = self.getActualAllPlayRecords()
+		winningPercentages = (wins + 0.5 * ties) / numpy.maximum(wins + losses + ties, 1)
+		played = self.opponents >= 0
+		opponentPercentages = numpy.where(played, winningPercentages[numpy.maximum(self.opponents, 0)], 0).sum(axis=0) / numpy.maximum(played.sum(axis=0), 1)
+		opponentPoints = numpy.where(played, self.getOpponentPoints(), 0).sum(axis=0) / numpy.maximum(played.sum(axis=0), 1)
+		return (opponentPercentages, opponentPoints)
+
+	"""
+	Print each team's all-play records, simulated expected wins, and strength of schedule.
+	"""
+	def printScheduleLuckSummary(self):
+		self.writeScheduleLuckSummary(TextWriter(sys.stdout))
+
+	def writeScheduleLuckSummary(self, writer):
+		if self.expectedWins is None:
+			raise ValueError("The schedules have to be simulated before the schedule luck summary is written")
+		(actualWins, actualLosses, actualTies) = self.getActualAllPlayRecords()
+		(optimumWins, optimumLosses, optimumTies) = self.getOptimumAllPlayRecords()
+		(opponentPercentages, opponentPoints) = self.getStrengthOfSchedule()
+		wins = self.getActualWins()
+		fields = ('team', 'allPlayActualWins', 'allPlayActualLosses', 'allPlayActualTies', 'allPlayOptimumWins', 'allPlayOptimumLosses', 'allPlayOptimumTies', 'wins', 'expectedWins', 'winsPercentile', 'opponentsAllPlayPercentage', 'opponentsPoints')
+		for (index, teamName) in enumerate(self.teamNames):
+			values = (teamName, int(actualWins[index]), int(actualLosses[index]), int(actualTies[index]), int(optimumWins[index]), int(optimumLosses[index]), int(optimumTies[index]), float(wins[index]), float(self.expectedWins[index]), float(self.winsPercentiles[index]), float(opponentPercentages[index]), float(opponentPoints[index]))
+			writer.writeRecord(fields, values, "%(team)s: all-play actual record: %(allPlayActualWins)d-%(allPlayActualLosses)d-%(allPlayActualTies)d; all-play optimum record: %(allPlayOptimumWins)d-%(allPlayOptimumLosses)d-%(allPlayOptimumTies)d; wins: %(wins).1f; expected wins: %(expectedWins).2f; wins percentile: %(winsPercentile).1f; opponents' all-play pct: %(opponentsAllPlayPercentage).3f; opponents' points: %(opponentsPoints).1f")
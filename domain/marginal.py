@@ -0,0 +1,238 @@
+import sys
+from domain.lineup import sortByPosition, pointsOrder
+from domain.report import TextWriter
+
+"""
+The value of a single rostered player to their team in a single game: how many of
+the team's optimum points they were responsible for, and what would have happened
+to the actual result if they'd been benched (for a starter) or started (for a bench player).
+"""
+class PlayerMarginalValue(object):
+	__slots__ = ('week', 'game', 'teamName', 'opponentName', 'player', 'actualPoints', 'opponentPoints', 'optimumContribution', 'swappedPlayer', 'swappedActualPoints', 'flipsResult')
+
+	def __init__(self, week, game, teamName, opponentName, player, actualPoints, opponentPoints):
+		self.week = week
+		self.game = game
+		self.teamName = teamName
+		self.opponentName = opponentName
+		self.player = player
+		self.actualPoints = actualPoints
+		self.opponentPoints = opponentPoints
+
+		# the optimum points lost if the player hadn't been on the roster at all
+		self.optimumContribution = 0
+
+		# the best swap into or out of the actual lineup, and the team's actual points after it
+		self.swappedPlayer = None
+		self.swappedActualPoints = None
+		self.flipsResult = False
+
+	"""
+	Determine if swapping this player in or out of the lineup would have turned the game
+	from a loss into a tie or a win, or from a tie into a win.
+	"""
+	def wouldHaveImprovedResult(self):
+		return self.flipsResult and self.swappedActualPoints > self.actualPoints
+
+"""
+Get the result of a game from one team's point of view.
+"""
+def getResult(points, opponentPoints):
+	return cmp(points, opponentPoints)
+
+"""
+Work out every rostered player's marginal value for one team in one game.
+Each position is sorted once; removing a player who isn't in the optimum lineup can't
+change the optimum, so only the optimum starters need the optimum worked out again,
+and that's done by repairing the optimum lineup locally, with repairOptimumWithout.
+Only where that can't be relied on is the lineup re-optimized, reusing the sorted
+lists with just the one player taken out.
+"""
+def analyzeTeamMarginalValues(game, teamName, opponentName):
+	teamScoreLine = game.teams[teamName]
+	opponentPoints = game.teams[opponentName].actualPoints
+	roster = teamScoreLine.roster
+	result = getResult(teamScoreLine.actualPoints, opponentPoints)
+
+	playersByPosition = sortByPosition(teamScoreLine.players)
+	optimumStarters = {}
+	for (slotName, player) in teamScoreLine.optimumLineup:
+		if player is not None:
+			optimumStarters[id(player)] = True
+
+	# the best player of each position left out of the optimum lineup, best first
+	repairable = canRepairLineup(roster, teamScoreLine.optimumLineup, teamScoreLine.players)
+	if repairable:
+		candidates = getReplacementCandidates(teamScoreLine.optimumLineup, playersByPosition)
+
+	# the best swap into or out of the lineup for each player, and the starting slots it's made in
+	swaps = roster.findLineupSwaps(teamScoreLine.players)
+	slotNames = roster.getSlotNames()
+
+	values = []
+	for player in teamScoreLine.players:
+		value = PlayerMarginalValue(game.week, game.game, teamName, opponentName, player, teamScoreLine.actualPoints, opponentPoints)
+
+		if id(player) in optimumStarters:
+			optimumWithout = None
+			if repairable:
+				optimumWithout = repairOptimumWithout(roster, teamScoreLine.optimumLineup, teamScoreLine.optimumPoints, candidates, player)
+			if optimumWithout is None:
+				remaining = dict(playersByPosition)
+				remaining[player.position] = [ other for other in playersByPosition[player.position] if other is not player ]
+				( optimumWithout, lineup ) = roster.optimizeSorted(remaining)
+			value.optimumContribution = teamScoreLine.optimumPoints - optimumWithout
+
+		value.swappedPlayer = swaps.get(id(player))
+		if player.slot in slotNames:
+			# bench the starter for the best bench player who could have played that slot, if any
+			replacementPoints = 0
+			if value.swappedPlayer is not None:
+				replacementPoints = value.swappedPlayer.points
+			value.swappedActualPoints = teamScoreLine.actualPoints - player.points + replacementPoints
+		elif value.swappedPlayer is not None:
+			# start the bench player instead of the worst starter whose slot they could have played
+			value.swappedActualPoints = teamScoreLine.actualPoints - value.swappedPlayer.points + player.points
+
+		if value.swappedActualPoints is not None:
+			value.flipsResult = getResult(value.swappedActualPoints, opponentPoints) != result
+
+		values.append(value)
+	return values
+
+"""
+Determine if a team's optimum lineup can be repaired locally when a starter is taken
+out, rather than optimized again. An optimum lineup is the best set of players that
+can all be matched to the slots, so without one of its starters, the best lineup is
+the rest of it plus the best player left who can still be matched in. That holds as
+long as every slot is filled, and no player with negative points can play a slot
+that takes more than one position, since the optimizer can leave such a player out
+of a flex slot by filling it with someone else.
+"""
+def canRepairLineup(roster, lineup, players):
+	for (slotName, player) in lineup:
+		if player is None:
+			return False
+
+	flexPositions = {}
+	for (slotName, positions) in roster.slots:
+		if len(positions) > 1:
+			for position in positions:
+				flexPositions[position] = True
+	for player in players:
+		if player.points < 0 and player.position in flexPositions:
+			return False
+	return True
+
+"""
+Get the players who could come into a lineup: the best player of each position who
+isn't in it, best first. The optimizer always starts a position's best players, so
+those are the ones after the starters in each position's sorted list.
+"""
+def getReplacementCandidates(lineup, playersByPosition):
+	starters = {}
+	for (slotName, player) in lineup:
+		starters[player.position] = starters.get(player.position, 0) + 1
+
+	candidates = []
+	for (position, players) in playersByPosition.items():
+		used = starters.get(position, 0)
+		if used < len(players):
+			candidates.append(players[used])
+	candidates.sort(key=pointsOrder, reverse=True)
+	return candidates
+
+"""
+Work out the optimum points of a lineup without one of its starters, by repairing it
+locally. The starter's slot is refilled with the best candidate who can get into it,
+either straight into the slot, or by moving starters along through the other slots
+they can play: a flex starter who moves into the vacated slot frees the flex for
+whoever can play it, and so on. If nobody can, the slot is left empty.
+See canRepairLineup for when this gives the same optimum as optimizing again.
+"""
+def repairOptimumWithout(roster, lineup, optimumPoints, candidates, removed):
+	slotPositions = [ positions for (slotName, positions) in roster.slots ]
+
+	# the slots that can be emptied, by moving their starters along into the vacated slot
+	freed = []
+	for (index, (slotName, player)) in enumerate(lineup):
+		if player is removed:
+			freed.append(index)
+	freedPositions = dict([ (position, True) for position in slotPositions[freed[0]] ])
+	moved = True
+	while moved:
+		moved = False
+		for (index, (slotName, player)) in enumerate(lineup):
+			if index not in freed and player.position in freedPositions:
+				freed.append(index)
+				for position in slotPositions[index]:
+					freedPositions[position] = True
+				moved = True
+
+	for candidate in candidates:
+		if candidate.position in freedPositions:
+			return optimumPoints - removed.points + candidate.points
+	return optimumPoints - removed.points
+
+"""
+Work out the marginal value of every rostered player, for both teams in every game of the season.
+"""
+def analyzeMarginalValues(season):
+	values = []
+	for game in season.games:
+		[ awayTeamName, homeTeamName ] = game.teams.keys()
+		values.extend(analyzeTeamMarginalValues(game, awayTeamName, homeTeamName))
+		values.extend(analyzeTeamMarginalValues(game, homeTeamName, awayTeamName))
+	return values
+
+"""
+Print each team's players by the total optimum points they contributed over the season.
+"""
+def printPlayerContributionSummary(season, values):
+	writePlayerContributionSummary(TextWriter(sys.stdout), season, values)
+
+def writePlayerContributionSummary(writer, season, values):
+	# by player id, since different players can have the same name
+	contributions = {}
+	playerNames = {}
+	for value in values:
+		key = (value.teamName, value.player.playerId)
+		contributions[key] = contributions.get(key, 0) + value.optimumContribution
+		playerNames.setdefault(value.player.playerId, value.player.name)
+
+	fields = ('team', 'player', 'optimumPointsContributed')
+	for team in season.teams:
+		writer.writeText("%s", (team.name,))
+		teamContributions = []
+		for ((teamName, playerId), contribution) in contributions.items():
+			if teamName == team.name and contribution:
+				teamContributions.append((-contribution, playerNames[playerId], playerId))
+		teamContributions.sort()
+		for (contribution, playerName, playerId) in teamContributions:
+			writer.writeRecord(fields, (team.name, playerName, -contribution), "%(player)s: optimum points contributed: %(optimumPointsContributed)d")
+
+"""
+Print every lineup decision that cost a team the game: starters who should have
+been benched, and bench players who should have started.
+"""
+def printCostlyLineupDecisionsSummary(values):
+	writeCostlyLineupDecisionsSummary(TextWriter(sys.stdout), values)
+
+def writeCostlyLineupDecisionsSummary(writer, values):
+	fields = ('week', 'team', 'opponent', 'actualPoints', 'opponentPoints', 'player', 'playerPoints', 'playerSlot', 'swappedPlayer', 'swappedPlayerPoints', 'swappedActualPoints')
+	for value in values:
+		if not value.wouldHaveImprovedResult():
+			continue
+		if value.player.slot == 'Bench':
+			textFormat = "Week %(week)d, %(team)s vs %(opponent)s (%(actualPoints)d-%(opponentPoints)d): starting %(player)s (%(playerPoints)d) instead of %(swappedPlayer)s (%(swappedPlayerPoints)d) would have made it %(swappedActualPoints)d-%(opponentPoints)d"
+		elif value.swappedPlayer is not None:
+			textFormat = "Week %(week)d, %(team)s vs %(opponent)s (%(actualPoints)d-%(opponentPoints)d): benching %(player)s (%(playerPoints)d) for %(swappedPlayer)s (%(swappedPlayerPoints)d) would have made it %(swappedActualPoints)d-%(opponentPoints)d"
+		else:
+			textFormat = "Week %(week)d, %(team)s vs %(opponent)s (%(actualPoints)d-%(opponentPoints)d): benching %(player)s (%(playerPoints)d) would have made it %(swappedActualPoints)d-%(opponentPoints)d"
+
+		swappedPlayerName = None
+		swappedPlayerPoints = None
+		if value.swappedPlayer is not None:
+			swappedPlayerName = value.swappedPlayer.name
+			swappedPlayerPoints = value.swappedPlayer.points
+		writer.writeRecord(fields, (value.week, value.teamName, value.opponentName, value.actualPoints, value.opponentPoints, value.player.name, value.player.points, value.player.slot, swappedPlayerName, swappedPlayerPoints, value.swappedActualPoints), textFormat)
@@ -1,5 +1,18 @@
+import os
 import re
-from domain.analysis import Team, Player, PlayerPointsLine
+import sys
+import mmap
+import time
+import zlib
+from domain.analysis import Team, Player, PlayerOpponentMatrix, isHighScoringBench, isLowScoringStart
+from domain.lineup import DEFAULT_ROSTER
+from domain.report import TextWriter
+from domain.profiling import getActiveProfiler
+
+"""
+How many players the player opponent summary shows for each team.
+"""
+OPPONENT_SUMMARY_PLAYER_COUNT = 5
 
 """
 Represent a fantasy football season.
@@ -13,12 +26,50 @@ class Season:
 		self.teams = []
 		self.players = []
 
+		# indexes into the lists above; the lists keep the order for printing
+		self.teamsByName = {}
+		self.playersById = {}
+
+		# the team each player faced, by (player id, week)
+		self.opposingTeamsByPlayerWeek = {}
+
+		# how every player did against every team they faced
+		self.opponentMatrix = PlayerOpponentMatrix()
+
+		# every player score line is numbered in the order it was played, to keep sorting stable
+		self.scoreLineCount = 0
+
+		# how many player points lines the game analysis created, and how many it avoided creating
+		self.pointsLinesCreated = 0
+		self.pointsLinesReused = 0
+		self.pointsLinesSkipped = 0
+
 	"""
 	Add a game to the list of games played this season.
 	"""
 	def addGame(self, game):
 		self.games.append(game)
 
+		for teamScoreLine in game.teams.values():
+			for playerLine in teamScoreLine.players:
+				playerLine.sequence = self.scoreLineCount
+				self.scoreLineCount += 1
+
+	"""
+	Get the weeks that have been added to this season.
+	"""
+	def getWeeks(self):
+		weeks = {}
+		for game in self.games:
+			weeks[game.week] = True
+		return sorted(weeks.keys())
+
+	"""
+	Get the (week, game) pairs of the games that have been added to this season, in the order they were played.
+	"""
+	def getWeekGames(self):
+		return sorted([ (game.week, game.game) for game in self.games ])
+
 	"""
 	Add a team to the season. To make sure there are no duplicates, first
 	checks if the team exists; this returns either the newly created team
@@ -29,17 +80,14 @@ class Season:
 		if not team:
 			team = Team(teamName)
 			self.teams.append(team)
+			self.teamsByName[teamName] = team
 		return team
 
 	"""
 	Get a team that played this season, by the team's name.
 	"""
 	def getTeamByName(self, teamName):
-		for team in self.teams:
-			if team.name == teamName:
-				return team
-		else:
-			return None
+		return self.teamsByName.get(teamName)
 
 	"""
 	Add a player to the season roster. To make sure there are no duplicates,
@@ -51,93 +99,19 @@ class Season:
 		if not player:
 			player = Player(playerId, playerName)
 			self.players.append(player)
+			self.playersById[playerId] = player
 		return player
 
 	"""
 	Get a player who played this season, by his player id.
 	"""
 	def getPlayerById(self, playerId):
-		for player in self.players:
-			if player.playerId == playerId:
-				return player
-		else:
-			return None
-
-	"""
-	Analyze all the games played this season, and calculate the actual and optimum
-	points for and against each team.
-	Also calculate the players who scored above their average against each team.
-	"""
-	def analyzeGames(self):
-		for game in self.games:
-			# add teams from this game
-			[ awayTeamName, homeTeamName ] = game.teams.keys()
-			awayTeam = self.addTeam(awayTeamName)
-			homeTeam = self.addTeam(homeTeamName)
-
-			# get the team scores
-			awayTeamScore = game.teams[awayTeamName]
-			homeTeamScore = game.teams[homeTeamName]
-
-			# record actual points
-			awayTeam.actualPointsFor += awayTeamScore.actualPoints
-			awayTeam.actualPointsAgainst += homeTeamScore.actualPoints
-			homeTeam.actualPointsFor += homeTeamScore.actualPoints
-			homeTeam.actualPointsAgainst += awayTeamScore.actualPoints
-
-			# record optimum points
-			awayTeam.optimumPointsFor += awayTeamScore.optimumPoints
-			awayTeam.optimumPointsAgainst += homeTeamScore.optimumPoints
-			homeTeam.optimumPointsFor += homeTeamScore.optimumPoints
-			homeTeam.optimumPointsAgainst += awayTeamScore.optimumPoints
-
-			# get the players who scored above average in this game for each team
-			for playerScore in awayTeamScore.players:
-				player = self.getPlayerById(playerScore.playerId)
-				line = player.getAboveAverageWeeklyPointsLine(playerScore.week)
-				if line:
-					homeTeam.addAboveAverageOpposingPlayerPointsLine(line)
-			for playerScore in homeTeamScore.players:
-				player = self.getPlayerById(playerScore.playerId)
-				line = player.getAboveAverageWeeklyPointsLine(playerScore.week)
-				if line:
-					awayTeam.addAboveAverageOpposingPlayerPointsLine(line)
-
-	"""
-	Analyze all the teams in the league for all the weeks that have been
-	parsed this season. Calculate their actual and optimum record.
-	"""
-	def analyzeTeams(self):
-		for game in self.games:
-			[ awayTeamName, homeTeamName ] = game.teams.keys()
-			awayTeam = self.addTeam(awayTeamName)
-			homeTeam = self.addTeam(homeTeamName)
-
-			# get the actual winner of this game
-			if game.actualWinner == awayTeam.name:
-				awayTeam.actualWins += 1
-				homeTeam.actualLosses += 1
-			elif game.actualWinner == homeTeam.name:
-				awayTeam.actualLosses += 1
-				homeTeam.actualWins += 1
-			else:
-				awayTeam.actualTies += 1
-				homeTeam.actualTies += 1
-
-			# get the optimum winner of this game
-			if game.optimumWinner == awayTeam.name:
-				awayTeam.optimumWins += 1
-				homeTeam.optimumLosses += 1
-			elif game.optimumWinner == homeTeam.name:
-				awayTeam.optimumLosses += 1
-				homeTeam.optimumWins += 1
-			else:
-				awayTeam.optimumTies += 1
-				homeTeam.optimumTies += 1
+		return self.playersById.get(playerId)
 
 	"""
 	Analyze all the players who were on a roster this season, and their scores,
 	calculating averages, etc.
+	This has to happen before the games are analyzed, since that needs each player's average.
 	"""
 	def analyzePlayers(self):
 		for game in self.games:
@@ -150,98 +124,295 @@ class Season:
 			player.analyzeScores()
 
 	"""
-	Calculate which players scored above average for your bench, and below averge in your starting lineup.
+	Analyze all the games played this season, in a single pass:
+	calculate the actual and optimum points for and against each team,
+	and their actual and optimum records; find the players who scored above
+	their average against each team; and find the high scoring bench players
+	and low scoring starters on each team.
 	"""
-	def analyzeTeamPlayers(self):
+	def analyzeGames(self):
 		for game in self.games:
-			[ awayTeamName, homeTeamName] = game.teams.keys()
-			awayTeam = self.addTeam(awayTeamName)
-			homeTeam = self.addTeam(homeTeamName)
+			self.analyzeGame(game)
+
+	"""
+	Analyze a single game; see analyzeGames.
+	"""
+	def analyzeGame(self, game):
+		# add teams from this game
+		[ awayTeamName, homeTeamName ] = game.teams.keys()
+		awayTeam = self.addTeam(awayTeamName)
+		homeTeam = self.addTeam(homeTeamName)
+
+		# get the team scores
+		awayTeamScore = game.teams[awayTeamName]
+		homeTeamScore = game.teams[homeTeamName]
+
+		# record actual points
+		awayTeam.actualPointsFor += awayTeamScore.actualPoints
+		awayTeam.actualPointsAgainst += homeTeamScore.actualPoints
+		homeTeam.actualPointsFor += homeTeamScore.actualPoints
+		homeTeam.actualPointsAgainst += awayTeamScore.actualPoints
+
+		# record optimum points
+		awayTeam.optimumPointsFor += awayTeamScore.optimumPoints
+		awayTeam.optimumPointsAgainst += homeTeamScore.optimumPoints
+		homeTeam.optimumPointsFor += homeTeamScore.optimumPoints
+		homeTeam.optimumPointsAgainst += awayTeamScore.optimumPoints
+
+		# get the actual winner of this game
+		if game.actualWinner == awayTeam.name:
+			awayTeam.actualWins += 1
+			homeTeam.actualLosses += 1
+		elif game.actualWinner == homeTeam.name:
+			awayTeam.actualLosses += 1
+			homeTeam.actualWins += 1
+		else:
+			awayTeam.actualTies += 1
+			homeTeam.actualTies += 1
+
+		# get the optimum winner of this game
+		if game.optimumWinner == awayTeam.name:
+			awayTeam.optimumWins += 1
+			homeTeam.optimumLosses += 1
+		elif game.optimumWinner == homeTeam.name:
+			awayTeam.optimumLosses += 1
+			homeTeam.optimumWins += 1
+		else:
+			awayTeam.optimumTies += 1
+			homeTeam.optimumTies += 1
+
+		# look at each team's players, against their own team and the opponent
+		self.analyzeTeamPlayers(awayTeamScore, awayTeam, homeTeam)
+		self.analyzeTeamPlayers(homeTeamScore, homeTeam, awayTeam)
+
+	"""
+	Go through the players on one side of a game: the ones who scored above their average
+	count against the opponent, and the ones who scored well on the bench or badly in the
+	starting lineup count for their own team.
+	A player's existing points line is reused where possible, so a new points line is only
+	created for a bench player or starter who scored exactly their average.
+	"""
+	def analyzeTeamPlayers(self, teamScoreLine, team, opposingTeam):
+		for playerScoreLine in teamScoreLine.players:
+			player = self.getPlayerById(playerScoreLine.playerId)
+			self.opposingTeamsByPlayerWeek[(player.playerId, playerScoreLine.week)] = opposingTeam
+			self.opponentMatrix.addLine(player.playerId, player.name, opposingTeam.name, playerScoreLine.points, player.averagePoints, playerScoreLine.sequence)
+
+			pointsLine = player.getAboveAverageWeeklyPointsLine(playerScoreLine.week)
+			if pointsLine:
+				opposingTeam.addAboveAverageOpposingPlayerPointsLine(pointsLine)
+
+			isHighScoringBenchPlayer = isHighScoringBench(playerScoreLine.slot, playerScoreLine.points)
+			if isHighScoringBenchPlayer or isLowScoringStart(playerScoreLine.slot, playerScoreLine.points):
+				if player.hasPointsLine(playerScoreLine):
+					self.pointsLinesReused += 1
+				else:
+					self.pointsLinesCreated += 1
+				pointsLine = player.getPointsLine(playerScoreLine)
+
+				if isHighScoringBenchPlayer:
+					team.addHighScoringBenchPlayerPointsLine(pointsLine)
+				else:
+					team.addLowScoringStarterPlayerPointsLine(pointsLine)
+			else:
+				self.pointsLinesSkipped += 1
 
-			awayTeamScoreLine = game.teams[awayTeamName]
-			homeTeamScoreLine = game.teams[homeTeamName]
+	"""
+	Analyze all the players, games, and teams for this season.
+	This takes two passes over the games: one to find each player's average,
+	and one to analyze the games themselves.
+	"""
+	def analyze(self):
+		self.analyzePlayers()
+		self.analyzeGames()
+
+	"""
+	Add new games (usually the next week) to a season that's already been analyzed,
+	updating the analysis in place instead of starting over.
+	Team points and records are only updated with the new games. Player totals and
+	averages are running sums; only the players whose averages changed have their
+	earlier games reclassified as above or below average, and the opposing teams'
+	lists are fixed up to match.
+	The result is the same as analyzing the whole season at once. That depends on the
+	new games coming after the ones already analyzed, since the order the games were
+	played in decides the order of the teams, the players and their lines; if any of
+	them come before the last game already analyzed, such as the rest of a week that
+	was only partly there before, the season is analyzed again from all its games instead.
+	"""
+	def update(self, games):
+		if games and self.games and min(map(weekGameOrder, games)) < max(map(weekGameOrder, self.games)):
+			self.reanalyze(self.games + list(games))
+			return
+
+		# add the new score lines to the players, remembering where each player was before
+		updatedPlayers = []
+		previousStates = {}
+		for game in games:
+			self.addGame(game)
+			for teamScoreLine in game.teams.values():
+				for playerLine in teamScoreLine.players:
+					player = self.addPlayer(playerLine.playerId, playerLine.name)
+					if player.playerId not in previousStates:
+						previousStates[player.playerId] = (player.averagePoints, len(player.scoreLines))
+						updatedPlayers.append(player)
+					player.addScoreLine(playerLine)
+
+		for player in updatedPlayers:
+			(previousAverage, previousCount) = previousStates[player.playerId]
+			if previousCount and player.averagePoints == previousAverage:
+				# only the new lines need classifying
+				for scoreLine in player.scoreLines[previousCount:]:
+					player.classifyScoreLine(scoreLine)
+			else:
+				self.reclassifyPlayer(player, previousCount)
 
-			for playerScoreLine in awayTeamScoreLine.players:
-				player = self.getPlayerById(playerScoreLine.playerId)
-				pointsLine = PlayerPointsLine(player, playerScoreLine)
+		# and then the new games themselves
+		for game in games:
+			self.analyzeGame(game)
 
-				if pointsLine.isHighScoringBenchPlayer():
-					awayTeam.addHighScoringBenchPlayerPointsLine(pointsLine)
-				elif pointsLine.isLowScoringStarter():
-					awayTeam.addLowScoringStarterPlayerPointsLine(pointsLine)
+	"""
+	Start the season over with the given games, added in the order they were played,
+	and analyze it from scratch.
+	"""
+	def reanalyze(self, games):
+		self.__init__(self.year)
+		for game in sorted(games, key=weekGameOrder):
+			self.addGame(game)
+		self.analyze()
 
-			for playerScoreLine in homeTeamScoreLine.players:
-				player = self.getPlayerById(playerScoreLine.playerId)
-				pointsLine = PlayerPointsLine(player, playerScoreLine)
+	"""
+	Reclassify all of a player's score lines after their average has changed, and
+	update the opposing teams from the games that were already analyzed.
+	"""
+	def reclassifyPlayer(self, player, previousCount):
+		previousLinesAboveAverage = player.linesAboveAverageByWeek
+		player.analyzeScores()
+		self.opponentMatrix.setPlayerAverage(player.playerId, player.averagePoints)
 
-				if pointsLine.isHighScoringBenchPlayer():
-					homeTeam.addHighScoringBenchPlayerPointsLine(pointsLine)
-				elif pointsLine.isLowScoringStarter():
-					homeTeam.addLowScoringStarterPlayerPointsLine(pointsLine)
+		for scoreLine in player.scoreLines[:previousCount]:
+			opposingTeam = self.opposingTeamsByPlayerWeek.get((player.playerId, scoreLine.week))
+			if not opposingTeam:
+				continue
 
+			previousLine = previousLinesAboveAverage.get(scoreLine.week)
+			line = player.getAboveAverageWeeklyPointsLine(scoreLine.week)
+			if previousLine and not line:
+				opposingTeam.removeAboveAverageOpposingPlayerPointsLine(previousLine)
+			elif line and not previousLine:
+				opposingTeam.addAboveAverageOpposingPlayerPointsLine(line)
+			elif line:
+				# still above average, but by a different amount
+				opposingTeam.aboveAverageOpposingPlayerPointsLines.invalidate()
 
 	"""
-	Analyze all the players, games, and teams for this season.
+	Write the game scores, and who won each game, both actually and optimally.
 	"""
-	def analyze(self):
-		self.analyzePlayers()
-		self.analyzeGames()
-		self.analyzeTeams()
-		self.analyzeTeamPlayers()
+	def writeGameScores(self, writer):
+		fields = ('week', 'game', 'team', 'actualPoints', 'optimumPoints', 'actualWinner', 'optimumWinner')
+		for gameScore in self.games:
+			writer.writeText("Week %d, game %d, winner; actual: %s, optimum: %s", (gameScore.week, gameScore.game, gameScore.actualWinner, gameScore.optimumWinner))
+
+			for teamName in gameScore.teams:
+				writer.writeRecord(fields, (gameScore.week, gameScore.game, teamName, gameScore.teams[teamName].actualPoints, gameScore.teams[teamName].optimumPoints, gameScore.actualWinner, gameScore.optimumWinner), "Week %(week)d, game %(game)d, %(team)s; actual: %(actualPoints)d, optimum: %(optimumPoints)d")
 
 	"""
 	Print the summary of points scored by each team, both actual and optimal.
 	"""
 	def printTeamPointsSummary(self):
+		self.writeTeamPointsSummary(TextWriter(sys.stdout))
+
+	def writeTeamPointsSummary(self, writer):
+		fields = ('team', 'actualPointsFor', 'actualPointsAgainst', 'optimumPointsFor', 'optimumPointsAgainst', 'differencePointsFor', 'differencePointsAgainst')
 		self.teams.sort(Team.sortByOptimumPointsForDescending)
 		for team in self.teams:
-			print "%s: APF: %d; APA: %d; OPF: %d; OPA: %d; dPF: %d; dPA: %d" % (team.name, team.actualPointsFor, team.actualPointsAgainst, team.optimumPointsFor, team.optimumPointsAgainst, team.optimumPointsFor - team.actualPointsFor, team.optimumPointsAgainst - team.actualPointsAgainst)
+			writer.writeRecord(fields, (team.name, team.actualPointsFor, team.actualPointsAgainst, team.optimumPointsFor, team.optimumPointsAgainst, team.optimumPointsFor - team.actualPointsFor, team.optimumPointsAgainst - team.actualPointsAgainst), "%(team)s: APF: %(actualPointsFor)d; APA: %(actualPointsAgainst)d; OPF: %(optimumPointsFor)d; OPA: %(optimumPointsAgainst)d; dPF: %(differencePointsFor)d; dPA: %(differencePointsAgainst)d")
 
 	"""
 	Print the summary of each team's record, both actual and optimal.
 	"""
 	def printTeamRecordSummary(self):
+		self.writeTeamRecordSummary(TextWriter(sys.stdout))
+
+	def writeTeamRecordSummary(self, writer):
+		fields = ('team', 'actualWins', 'actualLosses', 'actualTies', 'optimumWins', 'optimumLosses', 'optimumTies')
 		self.teams.sort(Team.sortByOptimumWinsDescending)
 		for team in self.teams:
-			print "%s: actual record: %d-%d-%d; optimum record: %d-%d-%d" % (team.name, team.actualWins, team.actualLosses, team.actualTies, team.optimumWins, team.optimumLosses, team.optimumTies)
+			writer.writeRecord(fields, (team.name, team.actualWins, team.actualLosses, team.actualTies, team.optimumWins, team.optimumLosses, team.optimumTies), "%(team)s: actual record: %(actualWins)d-%(actualLosses)d-%(actualTies)d; optimum record: %(optimumWins)d-%(optimumLosses)d-%(optimumTies)d")
 
 	"""
 	Print a summary of the players who scored significantly above average for each team.
 	Optionally display WHICH players scored above average, and how much above average they were.
 	"""
 	def printTeamAboveAverageOpposingPlayersSummary(self, showIndividualPlayers=False):
+		self.writeTeamAboveAverageOpposingPlayersSummary(TextWriter(sys.stdout), showIndividualPlayers)
+
+	def writeTeamAboveAverageOpposingPlayersSummary(self, writer, showIndividualPlayers=False):
+		fields = ('team', 'opposingPlayersAboveAverage', 'totalAboveAverage')
+		playerFields = ('team', 'player', 'week', 'points', 'aboveAverage')
 		for team in self.teams:
-			print "%s: # opposing players above average: %d; total above average: %d" % (team.name, len(team.aboveAverageOpposingPlayerPointsLines), team.getTotalOpposingPlayersPointsAboveAverage())
+			writer.writeRecord(fields, (team.name, len(team.aboveAverageOpposingPlayerPointsLines), team.getTotalOpposingPlayersPointsAboveAverage()), "%(team)s: # opposing players above average: %(opposingPlayersAboveAverage)d; total above average: %(totalAboveAverage)d")
 
 			if showIndividualPlayers:
 				for line in team.aboveAverageOpposingPlayerPointsLines:
 					if line.weekPoints - line.averagePoints > 10:
-						print "%s: points: %d; above average: %d" % (line.name, line.weekPoints, line.weekPoints - line.averagePoints)
+						writer.writeRecord(playerFields, (team.name, line.name, line.week, line.weekPoints, line.weekPoints - line.averagePoints), "%(player)s: points: %(points)d; above average: %(aboveAverage)d")
 
 	"""
 	Print a summary of each player's scores.
 	"""
 	def printPlayerScoreSummary(self):
+		self.writePlayerScoreSummary(TextWriter(sys.stdout))
+
+	def writePlayerScoreSummary(self, writer):
+		fields = ('player', 'totalPoints', 'averagePoints')
 		for player in self.players:
-			print "%s: total points: %d; average points: %f" % (player.name, player.totalPoints, player.averagePoints)
+			writer.writeRecord(fields, (player.name, player.totalPoints, player.averagePoints), "%(player)s: total points: %(totalPoints)d; average points: %(averagePoints)f")
 
 	"""
 	Print a summary of the players on each team that scored well on the bench.
 	"""
 	def printHighScoringBenchPlayersSummary(self):
+		self.writeHighScoringBenchPlayersSummary(TextWriter(sys.stdout))
+
+	def writeHighScoringBenchPlayersSummary(self, writer):
+		fields = ('team', 'player', 'week', 'points')
 		for team in self.teams:
-			print team.name
+			writer.writeText("%s", (team.name,))
 			for playerPointsLine in team.highScoringBenchPlayers:
-				print "%s, week %d: %d" % (playerPointsLine.name, playerPointsLine.week, playerPointsLine.weekPoints)
+				writer.writeRecord(fields, (team.name, playerPointsLine.name, playerPointsLine.week, playerPointsLine.weekPoints), "%(player)s, week %(week)d: %(points)d")
 
 	"""
 	Print a summary of the players on each team that scored badly while starting.
 	"""
 	def printLowScoringStartersSummary(self):
+		self.writeLowScoringStartersSummary(TextWriter(sys.stdout))
+
+	def writeLowScoringStartersSummary(self, writer):
+		fields = ('team', 'player', 'week', 'points')
 		for team in self.teams:
-			print team.name
+			writer.writeText("%s", (team.name,))
 			for line in team.lowScoringStarters:
-				print "%s, week %d: %d" % (line.name, line.week, line.weekPoints)
+				writer.writeRecord(fields, (team.name, line.name, line.week, line.weekPoints), "%(player)s, week %(week)d: %(points)d")
+
+	"""
+	Print the players who scored the most above their average against each team, over
+	all the games they played them, from the player opponent matrix.
+	"""
+	def printPlayerOpponentSummary(self, count=OPPONENT_SUMMARY_PLAYER_COUNT):
+		self.writePlayerOpponentSummary(TextWriter(sys.stdout), count)
+
+	def writePlayerOpponentSummary(self, writer, count=OPPONENT_SUMMARY_PLAYER_COUNT):
+		fields = ('team', 'playerId', 'player', 'games', 'points', 'aboveAverage')
+		for team in self.teams:
+			writer.writeText("%s", (team.name,))
+			for cell in self.opponentMatrix.getTopPlayersAgainstTeam(team.name, count):
+				writer.writeRecord(fields, (team.name, cell.playerId, self.opponentMatrix.getPlayerName(cell.playerId), cell.appearances, cell.points, cell.getPointsAboveAverage()), "%(player)s: games: %(games)d; points: %(points)d; above average: %(aboveAverage).1f")
+
+"""
+Sort key for games, in the order they were played: by week, then game.
+"""
+def weekGameOrder(game):
+	return (game.week, game.game)
 
 """
 Represents a single game in a single week, between two teams.
@@ -251,27 +422,67 @@ won the game in reality, and who would have won if both teams had
 been set optimally.
 """
 class GameScore:
-	def __init__(self, year, week, game):
-		self.filename = '%s/%s/%s' % (year, week, game)
+	def __init__(self, year, week, game, cache=None, teamRows=None, roster=DEFAULT_ROSTER):
+		self.filename = findGameFilename(year, week, game)
 		self.year = year
 		self.week = week
 		self.game = game
-		
-		try:
-			self.file = open(self.filename, 'r')
-		except:
-			self.file = None
-			print "Could not read file: %s" % self.filename
 
 		self.teams = {}
+		self.teamNames = []
 
 		self.actualWinner = ''
 		self.optimumWinner = ''
 
-		if self.file:
-			self.analyzeFile()
+		# a cached (or already parsed) result lets us skip reading the HTML entirely
+		if teamRows is None and cache:
+			teamRows = cache.get(self.filename)
+
+		if teamRows is None:
+			try:
+				self.file = openBoxscoreFile(self.filename)
+			except:
+				self.file = None
+				print "Could not read file: %s" % self.filename
+
+			if self.file:
+				try:
+					teamRows = self.parseFile()
+				except (IOError, EOFError):
+					# a compressed file that's corrupt or cut short; none of its rows can be trusted
+					print "Could not read file: %s" % self.filename
+				finally:
+					# we're done with the file once it's parsed
+					self.file.close()
+				if cache and teamRows is not None:
+					cache.put(self.filename, teamRows)
+		else:
+			self.file = None
+
+		if teamRows is not None:
+			self.loadTeamRows(teamRows, roster)
 			self.analyzeWinners()
 
+	"""
+	Leave out the file when pickling; it's only needed while parsing.
+	The teams are pickled in the order they were added, since that decides the
+	order of the dictionary, which decides which team is home and which is away.
+	"""
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		state['file'] = None
+		teams = []
+		for teamName in self.teamNames:
+			teams.append((teamName, self.teams[teamName]))
+		state['teams'] = teams
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.teams = {}
+		for (teamName, team) in state['teams']:
+			self.teams[teamName] = team
+
 	"""
 	Determine who won in reality, and who would have won if both
 	teams played optimally.
@@ -300,109 +511,343 @@ class GameScore:
 	Parse the file and extract the player score lines for each player,
 	and add them to the team score lines.
 	"""
-	def analyzeFile(self):
-		teams = {}
-		teamName = ''
+	def analyzeFile(self, roster=DEFAULT_ROSTER):
+		self.loadTeamRows(self.parseFile(), roster)
+
+	"""
+	Parse the file into a list of (team name, player fields) pairs, where
+	the player fields are the tuples from PlayerScoreLine.getFields().
+	This is the compact, picklable form of the game that gets cached.
+	"""
+	def parseFile(self):
+		profiler = getActiveProfiler()
+		if profiler:
+			start = time.time()
+
+		parser = BoxscoreParser()
+		teamRows = parser.parse(readRosterLines(self.file))
+		parser.warnRejectedRows(self.filename)
+
+		if profiler:
+			profiler.recordFile(self.filename, time.time() - start, parser.getCounts())
+		return teamRows
+
+	"""
+	Build the team score lines from parsed (team name, player fields) pairs.
+	"""
+	def loadTeamRows(self, teamRows, roster=DEFAULT_ROSTER):
+		for (teamName, rows) in teamRows:
+			teamName = intern(teamName)
+			self.teamNames.append(teamName)
+			players = []
+			for fields in rows:
+				players.append(PlayerScoreLine(self.week, fields=fields))
+			self.teams[teamName] = TeamScoreLine(self.week, players, roster)
+
+"""
+Get the path of the boxscore file for the given game.
+"""
+def getGameFilename(year, week, game):
+	return '%s/%s/%s' % (year, week, game)
+
+"""
+The suffix of a gzip compressed boxscore file.
+"""
+COMPRESSED_SUFFIX = '.gz'
+
+"""
+Get the path of the boxscore file to read for the given game: the plain file if there
+is one, or else the compressed one if there is one, or else the plain file's path.
+"""
+def findGameFilename(year, week, game):
+	filename = getGameFilename(year, week, game)
+	if not os.path.exists(filename) and os.path.exists(filename + COMPRESSED_SUFFIX):
+		return filename + COMPRESSED_SUFFIX
+	return filename
+
+"""
+Get the game number from the name of a boxscore file, plain or compressed,
+or None if it isn't one (like a hidden or temporary file).
+"""
+def getGameNumber(name):
+	if name.endswith(COMPRESSED_SUFFIX):
+		name = name[:-len(COMPRESSED_SUFFIX)]
+	if name.isdigit():
+		return int(name)
+	return None
+
+"""
+Open a boxscore file for reading, decompressing it as it's read if it's compressed.
+"""
+def openBoxscoreFile(filename):
+	if filename.endswith(COMPRESSED_SUFFIX):
+		return CompressedBoxscoreFile(filename)
+	return open(filename, 'r')
+
+"""
+How much of a compressed boxscore to read at a time.
+"""
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+"""
+The bytes every gzip member starts with. Compressed files joined with cat are one
+member after another, and reading them gives the files joined together.
+"""
+GZIP_MAGIC = '\x1f\x8b'
 
-		for line in self.file:
-			# we can determine which team we're counting by the title above the list of scores
-			teamNameSearch = re.search('<td.* class="tableHead">([\w\s\.]+)</td>', line)
-			if teamNameSearch:
-				teamName = teamNameSearch.group(1).replace(' BENCH', '')
+"""
+A gzip compressed boxscore file, read as a stream of lines.
+The file is decompressed a chunk at a time with zlib and split into lines as it
+goes, which is much faster than reading lines from a GzipFile, and never holds
+more than a chunk of the page in memory. Like a GzipFile, it reads every member
+of the file, raises an IOError if the file is corrupt or has anything but another
+member after one, and an EOFError if it ends before the end of the stream, so a
+truncated file is never taken for a short page.
+"""
+class CompressedBoxscoreFile:
+	def __init__(self, filename):
+		self.filename = filename
+		self.file = open(filename, 'rb')
+
+	def __iter__(self):
+		# the window bits tell zlib to expect a gzip header
+		decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+		pending = ''
+		while True:
+			data = self.file.read(DECOMPRESS_CHUNK_SIZE)
+			if not data:
+				break
+			while data:
 				try:
-					if not teams[teamName]:
-						teams[teamName] = []
-				except:
-					teams[teamName] = []
-				continue
+					pending += decompressor.decompress(data)
+				except zlib.error:
+					raise IOError("Could not decompress file: %s" % self.filename)
+
+				# once a member has ended, anything more is left unused, and has to be the start of another member
+				data = decompressor.unused_data
+				if data:
+					if not GZIP_MAGIC.startswith(data[:len(GZIP_MAGIC)]):
+						raise IOError("Unexpected data after the compressed stream: %s" % self.filename)
+					decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+			lines = pending.split('\n')
+			pending = lines.pop()
+			for line in lines:
+				yield line + '\n'
+
+		# zlib doesn't say if the stream ended early, but once it has ended, anything more is left unused
+		probe = decompressor.copy()
+		try:
+			probe.decompress('\0')
+		except zlib.error:
+			pass
+		if not probe.unused_data:
+			raise EOFError("Compressed file ended before the end of the stream: %s" % self.filename)
 
-			try:
-				player = PlayerScoreLine(self.week, line)
-				teams[teamName].append(player)
-			except:
-				continue
+		pending += decompressor.flush()
+		if pending:
+			yield pending
 
-		for teamList in teams:
-			self.teams[teamList] = TeamScoreLine(self.week, teams[teamList])
+	def close(self):
+		self.file.close()
 
 """
-Represents a single player's scoring line for a single game.
+The marker on the team title rows, which come right before the player rows.
+Everything in the page before the first one is scripts and styles.
 """
-class PlayerScoreLine:
-	def __init__(self, week, line):
-		self.line = line
-		self.week = week
-		if self._parsePlayerId(line):
-			self.playerId = self._parsePlayerId(line)
-			self.teamId = self._parseTeamId(line)
-			( self.name, self.position ) = self._parseNameAndPosition(line)
-			self.slot = self._parseSlot(line)
-			self.points = self._parsePoints(line)
-		else:
-			raise Error("Cannot find player score")
+ROSTER_MARKER = 'tableHead'
 
-	def __str__(self):
-		return "week %s, player %s, team %s: %s, %s, %s, %s" % (self.week, self.playerId, self.teamId, self.name, self.position, self.slot, self.points)
+"""
+The marker on each player row.
+"""
+PLAYER_ROW_MARKER = 'id="plyr'
 
-	def _parsePlayerId(self, line):
-		idSearch = re.search('id="plyr(\d+)"', line)
-		if idSearch:
-			return idSearch.group(1)
-		else:
-			raise Error("Cannot find playerId")
+"""
+The title above each list of scores, which tells us which team the following player rows belong to.
+"""
+TEAM_NAME_PATTERN = re.compile('<td.* class="tableHead">([\w\s\.]+)</td>')
 
-	def _parseTeamId(self, line):
-		teamSearch = re.search('<div .* team_id="(\d+)"', line)
-		if teamSearch:
-			return teamSearch.group(1)
-		else:
-			raise Error("Cannot find team id")
-
-	def _parseNameAndPosition(self, line):
-		playerSearch = re.search('<div.+>([\w\s\.\/\'-]+)</div>\*?, \w+ ([\w\/]+)', line)
-		if playerSearch:
-			playerName = playerSearch.group(1)
-			playerPosition = playerSearch.group(2)
-			return (playerName, playerPosition)
-		else:
-			raise Error("Cannot find name and position")
+"""
+Every field of a player row, in the order they appear in the row:
+player id, slot, team id, name, position and points.
+"""
+PLAYER_ROW_PATTERN = re.compile('id="plyr(\d+)".*?<td id="slot_\d+"[^>]*>([\w\/]+)</td><td.*?<div [^>]* team_id="(\d+)"[^>]*>([\w\s\.\/\'-]+)</div>\*?, \w+ ([\w\/]+).*<td id="plscrg_\d+_totpts"[^>]*>(-?\d+)</td>')
 
-	def _parseSlot(self, line):
-		slotSearch = re.search('<td id="slot_\d+".*>([\w\/]+)</td><td', line)
-		if slotSearch:
-			return slotSearch.group(1)
-		else:
-			raise Error("Cannot find slot")
+"""
+Parses the lines of a boxscore into a list of (team name, player fields) pairs.
+Only lines containing a cheap marker are handed to the regular expressions,
+and each player row is matched with a single precompiled pattern.
+Player rows that can't be parsed are counted rather than silently dropped.
+"""
+class BoxscoreParser:
+	def __init__(self):
+		self.linesScanned = 0
+		self.rowsMatched = 0
+		self.rowsRejected = 0
+
+	def parse(self, lines):
+		teams = {}
+		teamName = None
+		teamList = None
+
+		for line in lines:
+			self.linesScanned += 1
+
+			if PLAYER_ROW_MARKER in line:
+				playerMatch = PLAYER_ROW_PATTERN.search(line)
+				if playerMatch and teamList is not None:
+					( playerId, slot, teamId, name, position, points ) = playerMatch.groups()
+					teamList.append((playerId, teamId, name, position, slot, int(points)))
+					self.rowsMatched += 1
+				else:
+					self.rowsRejected += 1
+
+			elif ROSTER_MARKER in line:
+				# we can determine which team we're counting by the title above the list of scores
+				teamNameMatch = TEAM_NAME_PATTERN.search(line)
+				if teamNameMatch:
+					teamName = teamNameMatch.group(1).replace(' BENCH', '')
+					teamList = teams.setdefault(teamName, [])
 
+		teamRows = []
+		for teamName in teams:
+			teamRows.append((teamName, teams[teamName]))
+		return teamRows
+
+	"""
+	Get the parser's counters, as (lines scanned, player rows matched, player rows rejected).
+	"""
+	def getCounts(self):
+		return (self.linesScanned, self.rowsMatched, self.rowsRejected)
+
+	"""
+	Report any player rows that couldn't be parsed.
+	"""
+	def warnRejectedRows(self, filename):
+		if self.rowsRejected:
+			print >> sys.stderr, "Could not parse %d player rows in file: %s" % (self.rowsRejected, filename)
 
-	def _parsePoints(self, line):
-		pointsSearch = re.search('<td id="plscrg_\d+_totpts".*>(-?\d+)</td>', line)
-		if pointsSearch:
-			return int(pointsSearch.group(1))
+"""
+Get the lines of the roster section of a boxscore file: from the first team
+title to the last player row. The file is memory-mapped so we can jump straight
+to the markers without reading the rest of the page line by line.
+If the markers can't be found, fall back to all the lines in the file.
+A compressed file can't be mapped, so its lines are streamed to the parser as
+they're decompressed instead, and the parser skips the rest of the page.
+"""
+def readRosterLines(boxscoreFile):
+	if isinstance(boxscoreFile, CompressedBoxscoreFile):
+		return iter(boxscoreFile)
+
+	try:
+		boxscoreMap = mmap.mmap(boxscoreFile.fileno(), 0, access=mmap.ACCESS_READ)
+	except (ValueError, EnvironmentError):
+		# empty files can't be mapped
+		boxscoreFile.seek(0)
+		return boxscoreFile.readlines()
+
+	try:
+		firstMarker = boxscoreMap.find(ROSTER_MARKER)
+		if firstMarker == -1:
+			return boxscoreMap[:].splitlines(True)
+
+		# the roster ends with whichever comes last, a player row or a team title
+		lastMarker = max(boxscoreMap.rfind(ROSTER_MARKER), boxscoreMap.rfind(PLAYER_ROW_MARKER))
+
+		start = boxscoreMap.rfind('\n', 0, firstMarker) + 1
+		end = boxscoreMap.find('\n', lastMarker)
+		if end == -1:
+			end = len(boxscoreMap)
 		else:
-			raise Error("Cannot find points")
+			end += 1
+
+		return boxscoreMap[start:end].splitlines(True)
+	finally:
+		boxscoreMap.close()
+
+"""
+Read and parse a single boxscore file, returning its (team name, player fields)
+pairs, or None if the file can't be read, or is compressed and corrupt or cut short.
+This is a plain function of picklable arguments so it can run in a worker process.
+"""
+def readBoxscoreFile(filename):
+	( teamRows, timing ) = timeBoxscoreFile(filename)
+	profiler = getActiveProfiler()
+	if profiler and timing:
+		profiler.recordFile(filename, *timing)
+	return teamRows
+
+"""
+Read and parse a single boxscore file like readBoxscoreFile, but hand back how long
+it took with the rows, as (rows, (seconds, parser counts)), rather than recording it.
+A worker process's profiler is lost with the worker, so the workers use this, and
+the timings are recorded in the process that gets the rows. A file that can't be
+read has None for its rows and its timing.
+"""
+def timeBoxscoreFile(filename):
+	start = time.time()
+
+	try:
+		boxscoreFile = openBoxscoreFile(filename)
+	except IOError:
+		return (None, None)
+
+	try:
+		parser = BoxscoreParser()
+		teamRows = parser.parse(readRosterLines(boxscoreFile))
+	except (IOError, EOFError):
+		return (None, None)
+	finally:
+		boxscoreFile.close()
 
+	parser.warnRejectedRows(filename)
+	return (teamRows, (time.time() - start, parser.getCounts()))
+
+"""
+Represents a single player's scoring line for a single game.
+There are a lot of these, so they're slotted, the strings are interned, and the
+HTML they were parsed from isn't kept.
+"""
+class PlayerScoreLine(object):
+	__slots__ = ('week', 'sequence', 'playerId', 'teamId', 'name', 'position', 'slot', 'points')
+
+	def __init__(self, week, fields):
+		self.week = week
+		self.sequence = 0
+		( playerId, teamId, name, position, slot, self.points ) = fields
+		self.playerId = intern(playerId)
+		self.teamId = intern(teamId)
+		self.name = intern(name)
+		self.position = intern(position)
+		self.slot = intern(slot)
 
 	"""
-	A comparison function to allow sorting players in a list
-	by the number of points they scored, in descending order.
+	Get the parsed fields of this line as a tuple, suitable for caching and
+	for rebuilding the line later without the HTML.
 	"""
-	def compareByPointsDescending(playerA, playerB):
-		return cmp(playerB.points, playerA.points)
+	def getFields(self):
+		return (self.playerId, self.teamId, self.name, self.position, self.slot, self.points)
+
+	def __str__(self):
+		return "week %s, player %s, team %s: %s, %s, %s, %s" % (self.week, self.playerId, self.teamId, self.name, self.position, self.slot, self.points)
 
 """
 Take a list of players for a given team in a given week, and calculate
 their actual points scored as well as the number of points they'd have
 scored if they set their roster optimally.
 """
-class TeamScoreLine:
-	def __init__(self, week, players=[]):
+class TeamScoreLine(object):
+	__slots__ = ('week', 'players', 'roster', 'actualPoints', 'benchPoints', 'irPoints', 'optimumPoints', 'optimumLineup')
+
+	def __init__(self, week, players=[], roster=DEFAULT_ROSTER):
 		self.week = week
 		self.players = players
+		self.roster = roster
 		self.actualPoints = 0
 		self.benchPoints = 0
 		self.irPoints = 0
 		self.optimumPoints = 0
+		self.optimumLineup = []
 
 		self.analyzeActualPoints()
 		self.analyzeBenchPoints()
@@ -414,7 +859,7 @@ class TeamScoreLine:
 	starting lineup.
 	"""
 	def analyzeActualPoints(self):
-		self.actualPoints = self.getPointsBySlots(['QB', 'RB', 'RB/WR', 'WR', 'TE', 'D/ST', 'K'])
+		self.actualPoints = self.getPointsBySlots(self.roster.getSlotNames())
 
 	"""
 	Calculate the number of points they scored on their bench.
@@ -430,61 +875,12 @@ class TeamScoreLine:
 
 	"""
 	Calculate the number of points they would have scored if the lineup
-	had been set optimally.
-	Assumes that you can start 1 QB, 2 RB, 2 WR, 1 RB/WR, 1 TE, 1 D/ST, 1 K.
-	Starts the top two RB, the top two WR, and the higher scoring of the third
-	best in either category.
+	had been set optimally, and what that lineup would have been.
+	The slots come from the roster; by default you can start
+	1 QB, 2 RB, 2 WR, 1 RB/WR, 1 TE, 1 D/ST, 1 K.
 	"""
 	def analyzeOptimumPoints(self):
-		QBs = self.getPlayersByPositions(['QB'])
-		RBs = self.getPlayersByPositions(['RB'])
-		WRs = self.getPlayersByPositions(['WR'])
-		TEs = self.getPlayersByPositions(['TE'])
-		Ds = self.getPlayersByPositions(['D/ST'])
-		Ks = self.getPlayersByPositions(['K'])
-
-		self.optimumPoints = 0
-
-		# they get the top score from their QB, TE, D/ST, and K
-		if len(QBs) > 0:
-			self.optimumPoints += QBs[0].points
-		if len(TEs) > 0:
-			self.optimumPoints += TEs[0].points
-		if len(Ds) > 0:
-			self.optimumPoints += Ds[0].points
-		if len(Ks) > 0:
-			self.optimumPoints += Ks[0].points
-
-		# they get the top two scores from their RB
-		if len(RBs) > 0:
-			self.optimumPoints += RBs[0].points
-		if len(RBs) > 1:
-			self.optimumPoints += RBs[1].points
-		
-		# they get the top two scores from their WR
-		if len(WRs) > 0:
-			self.optimumPoints += WRs[0].points
-		if len(WRs) > 1:
-			self.optimumPoints += WRs[1].points
-
-		# they get whichever score is higher from their third RB and third WR
-		if len(RBs) > 2:
-			thirdRB = RBs[2]
-		else:
-			thirdRB = None
-		if len(WRs) > 2:
-			thirdWR = WRs[2]
-		else:
-			thirdWR = None
-		if thirdRB and thirdWR:
-			if thirdRB.points > thirdWR.points:
-				self.optimumPoints += thirdRB.points
-			else:
-				self.optimumPoints += thirdWR.points
-		elif thirdRB:
-			self.optimumPoints += thirdRB.points
-		elif thirdWR:
-			self.optimumPoints += thirdWR.points
+		( self.optimumPoints, self.optimumLineup ) = self.roster.optimize(self.players)
 
 	"""
 	Get the number of points scored by all the players in the
@@ -508,16 +904,4 @@ class TeamScoreLine:
 				players.append(player)
 		return players
 
-	"""
-	Get the players who play the given positions.
-	"""
-	def getPlayersByPositions(self, positions=[]):
-		players =[]
-		for player in self.players:
-			if player.position in positions:
-				players.append(player)
-
-		players.sort(PlayerScoreLine.compareByPointsDescending)
-		return players
-
 
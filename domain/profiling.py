@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+
+# not available on Windows
+try:
+	import resource
+except ImportError:
+	resource = None
+
+"""
+How many of the slowest boxscore files to show.
+"""
+SLOWEST_FILE_COUNT = 10
+
+"""
+The profiler that parsing reports to, if there is one; see getActiveProfiler.
+"""
+activeProfiler = None
+
+"""
+Get the profiler that's collecting timings for this process, or None if nothing is
+being profiled. Code that's run a lot checks this once, so profiling costs nothing
+when it's off.
+"""
+def getActiveProfiler():
+	return activeProfiler
+
+"""
+Make the given profiler (or None) the one that's collecting timings for this process.
+"""
+def setActiveProfiler(profiler):
+	global activeProfiler
+	activeProfiler = profiler
+
+"""
+Get the CPU time this process has used so far, user and system.
+getrusage is much finer grained than os.times, where there is one.
+"""
+def getCpuTime():
+	if resource:
+		usage = resource.getrusage(resource.RUSAGE_SELF)
+		return usage.ru_utime + usage.ru_stime
+	times = os.times()
+	return times[0] + times[1]
+
+"""
+Collects where the time goes in a run: the wall and CPU time of each phase, how long
+each boxscore file took to read and parse, and counters of the work that was done.
+Phases run one after another; starting a phase ends the one before it, and a phase
+that's run more than once adds up.
+"""
+class Profiler:
+	def __init__(self):
+		self.phaseNames = []
+		self.phaseTimes = {}
+		self.currentPhase = None
+		self.phaseStart = None
+
+		self.fileTimings = []
+
+		self.counterNames = []
+		self.counters = {}
+
+	"""
+	Start timing a phase, ending the current one if there is one.
+	"""
+	def startPhase(self, name):
+		self.endPhase()
+		self.currentPhase = name
+		self.phaseStart = (time.time(), getCpuTime())
+
+	"""
+	End the current phase, if there is one.
+	"""
+	def endPhase(self):
+		if self.currentPhase is None:
+			return
+		(wallStart, cpuStart) = self.phaseStart
+		if self.currentPhase not in self.phaseTimes:
+			self.phaseNames.append(self.currentPhase)
+			self.phaseTimes[self.currentPhase] = [0, 0]
+		times = self.phaseTimes[self.currentPhase]
+		times[0] += time.time() - wallStart
+		times[1] += getCpuTime() - cpuStart
+		self.currentPhase = None
+
+	"""
+	Record how long a boxscore file took to read and parse, with its parser's counters,
+	as BoxscoreParser.getCounts gives them. The file may have been parsed in a worker.
+	"""
+	def recordFile(self, filename, seconds, counts):
+		( linesScanned, rowsMatched, rowsRejected ) = counts
+		self.fileTimings.append((seconds, filename, linesScanned, rowsMatched))
+		self.count('filesParsed')
+		self.count('linesScanned', linesScanned)
+		self.count('playerRowsMatched', rowsMatched)
+		self.count('playerRowsRejected', rowsRejected)
+
+	"""
+	Add to a counter.
+	"""
+	def count(self, name, amount=1):
+		if name not in self.counters:
+			self.counterNames.append(name)
+			self.counters[name] = 0
+		self.counters[name] += amount
+
+	"""
+	Get everything that's been collected, as plain data that can be saved as JSON.
+	"""
+	def getResults(self, slowestFileCount=SLOWEST_FILE_COUNT):
+		self.endPhase()
+
+		phases = []
+		for name in self.phaseNames:
+			(wall, cpu) = self.phaseTimes[name]
+			phases.append({ 'name': name, 'wall': wall, 'cpu': cpu })
+
+		slowest = []
+		for (seconds, filename, lines, rows) in sorted(self.fileTimings, reverse=True)[:slowestFileCount]:
+			slowest.append({ 'filename': filename, 'seconds': seconds, 'lines': lines, 'rows': rows })
+
+		counters = []
+		for name in self.counterNames:
+			counters.append({ 'name': name, 'value': self.counters[name] })
+
+		return {
+			'phases': phases,
+			'files': {
+				'count': len(self.fileTimings),
+				'seconds': sum([ timing[0] for timing in self.fileTimings ]),
+				'slowest': slowest,
+			},
+			'counters': counters,
+		}
+
+	"""
+	Print a summary of the results, to standard error by default so it doesn't get mixed into the reports.
+	"""
+	def printSummary(self, stream=None):
+		stream = stream or sys.stderr
+		results = self.getResults()
+
+		print >> stream, "Phases:"
+		totalWall = 0
+		totalCpu = 0
+		for phase in results['phases']:
+			print >> stream, "%s: wall: %.1f ms; cpu: %.1f ms" % (phase['name'], phase['wall'] * 1000, phase['cpu'] * 1000)
+			totalWall += phase['wall']
+			totalCpu += phase['cpu']
+		print >> stream, "total: wall: %.1f ms; cpu: %.1f ms" % (totalWall * 1000, totalCpu * 1000)
+
+		files = results['files']
+		print >> stream, "Files parsed: %d, in %.1f ms" % (files['count'], files['seconds'] * 1000)
+		for timing in files['slowest']:
+			print >> stream, "%s: %.2f ms; lines: %d; rows: %d" % (timing['filename'], timing['seconds'] * 1000, timing['lines'], timing['rows'])
+
+		print >> stream, "Counters:"
+		for counter in results['counters']:
+			print >> stream, "%s: %d" % (counter['name'], counter['value'])
+
+	"""
+	Save the results as JSON, so runs can be compared over time.
+	"""
+	def saveJson(self, filename):
+		results = self.getResults()
+		results['time'] = time.time()
+		profileFile = open(filename, 'w')
+		try:
+			json.dump(results, profileFile, indent=1, sort_keys=True)
+		finally:
+			profileFile.close()
@@ -0,0 +1,229 @@
+import sys
+import bisect
+from domain.analysis import BENCH_SLOT, IR_SLOT, HIGH_SCORING_BENCH_POINTS, LOW_SCORING_STARTER_POINTS
+from domain.report import TextWriter
+
+"""
+How many of each team's biggest bench regrets the lineup regret summary lists.
+"""
+REGRET_SUMMARY_COUNT = 5
+
+"""
+A single player's line in a single game, with how much it cost the team: for a bench
+player, the points they'd have added by starting instead of the worst starter whose
+slot they could have played; for a starter, the points they'd have added by being
+benched for the best bench player who could have played their slot. The regret is
+never negative, and the swapped player is None if there was nobody to swap with.
+"""
+class LineupLine(object):
+	__slots__ = ('scoreLine', 'teamName', 'game', 'regret', 'swappedPlayer')
+
+	def __init__(self, scoreLine, teamName, game):
+		self.scoreLine = scoreLine
+		self.teamName = teamName
+		self.game = game
+		self.regret = 0
+		self.swappedPlayer = None
+
+"""
+Sort key for lineup lines, by points. Lines with the same points stay in the order they were played.
+"""
+def linePointsOrder(line):
+	return (line.scoreLine.points, line.scoreLine.sequence)
+
+"""
+Sort key for lineup lines, by regret, in descending order.
+"""
+def regretOrder(line):
+	return (-line.regret, line.scoreLine.sequence)
+
+"""
+Sort key for lineup lines, by the player's name, as the bench and starters reports list them.
+"""
+def lineNameOrder(line):
+	return (line.scoreLine.name, line.scoreLine.sequence)
+
+"""
+A single team's lines in a single slot, sorted by points once, so the lines above or
+below any number of points are found with a binary search instead of a scan.
+"""
+class SlotLines:
+	def __init__(self, lines):
+		self.lines = sorted(lines, key=linePointsOrder)
+		self.points = [ line.scoreLine.points for line in self.lines ]
+
+	"""
+	Get the lines with more than the given points, best first.
+	"""
+	def getAbove(self, points):
+		lines = self.lines[bisect.bisect_right(self.points, points):]
+		lines.reverse()
+		return lines
+
+	"""
+	Get the lines with fewer than the given points, worst first.
+	"""
+	def getBelow(self, points):
+		return self.lines[:bisect.bisect_left(self.points, points)]
+
+"""
+An index of every team's lineup decisions over a season, built in a single pass over
+its games: each team's lines by slot, sorted by points, and each bench player's regret,
+sorted from the most points left on the bench. The high scoring bench players and low
+scoring starters are only found for one threshold each while the season's analyzed;
+with the index, any threshold, and the biggest regrets, are answered without going
+through the games again, so trying one threshold after another costs a binary search
+each. The season has to have its games, so not a streamed one.
+"""
+class LineupIndex:
+	def __init__(self, season):
+		self.season = season
+
+		# each team's slot lines, by team name and then slot
+		self.slotLines = {}
+
+		# the bench lines that left points on the bench, most first, by team name and for the whole league
+		self.teamBenchRegrets = {}
+		self.benchRegrets = []
+
+		# the points each team left on the bench, by team name and then bench player's position;
+		# a starter can only be swapped out once, so in each game only the biggest regret over
+		# each starter counts, rather than every bench player who outscored the same starter
+		self.positionRegrets = {}
+
+		linesBySlot = {}
+		for game in season.games:
+			for (teamName, teamScoreLine) in game.teams.items():
+				starterRegrets = {}
+				for line in analyzeTeamLineup(game, teamName, teamScoreLine):
+					linesBySlot.setdefault(teamName, {}).setdefault(line.scoreLine.slot, []).append(line)
+					if line.scoreLine.slot == BENCH_SLOT and line.regret > 0:
+						self.teamBenchRegrets.setdefault(teamName, []).append(line)
+						starterRegret = starterRegrets.get(id(line.swappedPlayer))
+						if starterRegret is None or line.regret > starterRegret.regret:
+							starterRegrets[id(line.swappedPlayer)] = line
+				for line in starterRegrets.values():
+					positionRegrets = self.positionRegrets.setdefault(teamName, {})
+					positionRegrets[line.scoreLine.position] = positionRegrets.get(line.scoreLine.position, 0) + line.regret
+
+		for (teamName, slots) in linesBySlot.items():
+			self.slotLines[teamName] = {}
+			for (slot, lines) in slots.items():
+				self.slotLines[teamName][slot] = SlotLines(lines)
+
+		for lines in self.teamBenchRegrets.values():
+			lines.sort(key=regretOrder)
+			self.benchRegrets.extend(lines)
+		self.benchRegrets.sort(key=regretOrder)
+
+	"""
+	Get a team's lines in a slot, sorted by points, worst first.
+	"""
+	def getSlotLines(self, teamName, slot):
+		slotLines = self.slotLines.get(teamName, {}).get(slot)
+		if slotLines is None:
+			return []
+		return slotLines.lines
+
+	"""
+	Get a team's bench players who scored more than the given points, best first.
+	"""
+	def getBenchPlayersAbove(self, teamName, points=HIGH_SCORING_BENCH_POINTS):
+		slotLines = self.slotLines.get(teamName, {}).get(BENCH_SLOT)
+		if slotLines is None:
+			return []
+		return slotLines.getAbove(points)
+
+	"""
+	Get a team's starters who scored fewer than the given points, from every starting slot, worst first.
+	"""
+	def getStartersBelow(self, teamName, points=LOW_SCORING_STARTER_POINTS):
+		lines = []
+		for (slot, slotLines) in self.slotLines.get(teamName, {}).items():
+			if slot != BENCH_SLOT and slot != IR_SLOT:
+				lines.extend(slotLines.getBelow(points))
+		lines.sort(key=linePointsOrder)
+		return lines
+
+	"""
+	Get the bench players who left the most points on the bench, most first, for a team
+	or, without one, the whole league.
+	"""
+	def getTopBenchRegrets(self, count, teamName=None):
+		if teamName is None:
+			return self.benchRegrets[:count]
+		return self.teamBenchRegrets.get(teamName, [])[:count]
+
+	"""
+	Get the points a team left on the bench at each position, as (position, points)
+	pairs, most first.
+	"""
+	def getPositionRegrets(self, teamName):
+		regrets = [ (-points, position) for (position, points) in self.positionRegrets.get(teamName, {}).items() ]
+		regrets.sort()
+		return [ (position, -points) for (points, position) in regrets ]
+
+	"""
+	Print a summary of the players on each team that scored more than the given points
+	on the bench, in the same form as Season.printHighScoringBenchPlayersSummary.
+	"""
+	def printHighScoringBenchPlayersSummary(self, points=HIGH_SCORING_BENCH_POINTS):
+		self.writeHighScoringBenchPlayersSummary(TextWriter(sys.stdout), points)
+
+	def writeHighScoringBenchPlayersSummary(self, writer, points=HIGH_SCORING_BENCH_POINTS):
+		fields = ('team', 'player', 'week', 'points')
+		for team in self.season.teams:
+			writer.writeText("%s", (team.name,))
+			for line in sorted(self.getBenchPlayersAbove(team.name, points), key=lineNameOrder):
+				writer.writeRecord(fields, (team.name, line.scoreLine.name, line.scoreLine.week, line.scoreLine.points), "%(player)s, week %(week)d: %(points)d")
+
+	"""
+	Print a summary of the players on each team that scored fewer than the given points
+	while starting, in the same form as Season.printLowScoringStartersSummary.
+	"""
+	def printLowScoringStartersSummary(self, points=LOW_SCORING_STARTER_POINTS):
+		self.writeLowScoringStartersSummary(TextWriter(sys.stdout), points)
+
+	def writeLowScoringStartersSummary(self, writer, points=LOW_SCORING_STARTER_POINTS):
+		fields = ('team', 'player', 'week', 'points')
+		for team in self.season.teams:
+			writer.writeText("%s", (team.name,))
+			for line in sorted(self.getStartersBelow(team.name, points), key=lineNameOrder):
+				writer.writeRecord(fields, (team.name, line.scoreLine.name, line.scoreLine.week, line.scoreLine.points), "%(player)s, week %(week)d: %(points)d")
+
+	"""
+	Print each team's points left on the bench, by position, and its biggest bench regrets.
+	"""
+	def printLineupRegretSummary(self, count=REGRET_SUMMARY_COUNT):
+		self.writeLineupRegretSummary(TextWriter(sys.stdout), count)
+
+	def writeLineupRegretSummary(self, writer, count=REGRET_SUMMARY_COUNT):
+		positionFields = ('team', 'position', 'pointsLeftOnBench')
+		regretFields = ('team', 'week', 'game', 'player', 'position', 'points', 'starter', 'starterPoints', 'pointsLeftOnBench')
+		for team in self.season.teams:
+			writer.writeText("%s", (team.name,))
+			for (position, points) in self.getPositionRegrets(team.name):
+				writer.writeRecord(positionFields, (team.name, position, points), "%(position)s: points left on the bench: %(pointsLeftOnBench)d")
+			for line in self.getTopBenchRegrets(count, team.name):
+				writer.writeRecord(regretFields, (team.name, line.scoreLine.week, line.game, line.scoreLine.name, line.scoreLine.position, line.scoreLine.points,
+					line.swappedPlayer.name, line.swappedPlayer.points, line.regret),
+					"%(player)s, week %(week)d: %(points)d on the bench over %(starter)s (%(starterPoints)d): %(pointsLeftOnBench)d points left on the bench")
+
+"""
+Make the lineup lines for one team in one game, working out each player's regret from
+the same swaps analyzeTeamMarginalValues looks at.
+"""
+def analyzeTeamLineup(game, teamName, teamScoreLine):
+	swaps = teamScoreLine.roster.findLineupSwaps(teamScoreLine.players)
+
+	lines = []
+	for player in teamScoreLine.players:
+		line = LineupLine(player, teamName, game.game)
+		line.swappedPlayer = swaps.get(id(player))
+		if line.swappedPlayer is not None:
+			if player.slot == BENCH_SLOT:
+				line.regret = max(player.points - line.swappedPlayer.points, 0)
+			else:
+				line.regret = max(line.swappedPlayer.points - player.points, 0)
+		lines.append(line)
+	return lines
@@ -0,0 +1,158 @@
+import sys
+import csv
+import json
+
+"""
+The formats reports can be written in.
+"""
+FORMATS = ['text', 'csv', 'json', 'ndjson']
+
+"""
+The buffer size for report output files, so large reports go out in big writes.
+"""
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+"""
+Writes reports to a stream, one record at a time.
+A report is started with its name and title, then gets any number of records, and is
+ended before the next one starts. Each record is a tuple of field names and a tuple of
+values, along with a format for showing it as text, which can use any of the field names.
+Some lines only make sense in the text format, like headings; those are written with
+writeText, and the other formats leave them out.
+This base class writes nothing; the subclasses each write one format.
+"""
+class ReportWriter:
+	def __init__(self, stream, ownsStream=False):
+		self.stream = stream
+		self.ownsStream = ownsStream
+		self.reportName = None
+
+	def startReport(self, name, title):
+		self.reportName = name
+
+	def writeRecord(self, fields, values, textFormat):
+		pass
+
+	def writeText(self, textFormat, values=()):
+		pass
+
+	def endReport(self):
+		self.reportName = None
+
+	"""
+	Finish writing, and flush the stream; it's only closed if the writer opened it.
+	"""
+	def close(self):
+		if self.ownsStream:
+			self.stream.close()
+		else:
+			self.stream.flush()
+
+"""
+Writes reports as lines of text, the way the analyzer has always printed them.
+"""
+class TextWriter(ReportWriter):
+	def startReport(self, name, title):
+		ReportWriter.startReport(self, name, title)
+		self.stream.write('\n')
+		if title:
+			self.stream.write(title + '\n')
+
+	def writeRecord(self, fields, values, textFormat):
+		self.stream.write(textFormat % dict(zip(fields, values)) + '\n')
+
+	def writeText(self, textFormat, values=()):
+		self.stream.write(textFormat % values + '\n')
+
+"""
+Writes reports as CSV. Every row starts with the name of its report, and a header row
+is written whenever the fields change, so several reports can share one file.
+"""
+class CsvWriter(ReportWriter):
+	def __init__(self, stream, ownsStream=False):
+		ReportWriter.__init__(self, stream, ownsStream)
+		self.writer = csv.writer(stream)
+		self.fields = None
+
+	def startReport(self, name, title):
+		ReportWriter.startReport(self, name, title)
+		self.fields = None
+
+	def writeRecord(self, fields, values, textFormat):
+		if fields != self.fields:
+			self.writer.writerow(('report',) + fields)
+			self.fields = fields
+		self.writer.writerow((self.reportName,) + tuple(values))
+
+"""
+Writes reports as a single JSON object, with a list of records for each report.
+It's written as it goes, rather than built up in memory first.
+"""
+class JsonWriter(ReportWriter):
+	def __init__(self, stream, ownsStream=False):
+		ReportWriter.__init__(self, stream, ownsStream)
+		self.reportCount = 0
+		self.recordCount = 0
+
+	def startReport(self, name, title):
+		ReportWriter.startReport(self, name, title)
+		if self.reportCount:
+			self.stream.write(',\n')
+		else:
+			self.stream.write('{\n')
+		self.stream.write('%s: [' % json.dumps(name))
+		self.reportCount += 1
+		self.recordCount = 0
+
+	def writeRecord(self, fields, values, textFormat):
+		if self.recordCount:
+			self.stream.write(',\n')
+		else:
+			self.stream.write('\n')
+		self.stream.write(getJsonObject(fields, values))
+		self.recordCount += 1
+
+	def endReport(self):
+		ReportWriter.endReport(self)
+		self.stream.write('\n]')
+
+	def close(self):
+		if self.reportCount:
+			self.stream.write('\n}\n')
+		else:
+			self.stream.write('{}\n')
+		ReportWriter.close(self)
+
+"""
+Writes reports as newline delimited JSON: one object per record, with its report's name.
+"""
+class NdjsonWriter(ReportWriter):
+	def writeRecord(self, fields, values, textFormat):
+		self.stream.write(getJsonObject(('report',) + fields, (self.reportName,) + tuple(values)) + '\n')
+
+"""
+Get a JSON object for a record, with its fields in order.
+"""
+def getJsonObject(fields, values):
+	members = []
+	for (field, value) in zip(fields, values):
+		members.append('%s: %s' % (json.dumps(field), json.dumps(value)))
+	return '{' + ', '.join(members) + '}'
+
+"""
+Get a writer for the given format, writing to the given file, or to standard output if there isn't one.
+"""
+def getReportWriter(format, filename=None):
+	writers = {
+		'text': TextWriter,
+		'csv': CsvWriter,
+		'json': JsonWriter,
+		'ndjson': NdjsonWriter,
+	}
+	if format not in writers:
+		raise ValueError("Unknown report format: %s" % format)
+
+	if filename:
+		return writers[format](open(filename, 'wb', OUTPUT_BUFFER_SIZE), True)
+	else:
+		return writers[format](sys.stdout)
@@ -0,0 +1,211 @@
+import os
+import time
+import threading
+import StringIO
+import BaseHTTPServer
+from domain.parse import GameScore, Season, findGameFilename, getGameNumber
+from domain.lineup import DEFAULT_ROSTER
+from domain.report import JsonWriter
+
+"""
+The reports the server serves, by path, with the Season method that writes each one.
+"""
+SERVER_REPORTS = {
+	'gameScores': 'writeGameScores',
+	'teamPointsSummary': 'writeTeamPointsSummary',
+	'teamRecordSummary': 'writeTeamRecordSummary',
+	'playerScoreSummary': 'writePlayerScoreSummary',
+	'teamAboveAverageOpposingPlayersScoreSummary': 'writeTeamAboveAverageOpposingPlayersSummary',
+	'highScoringBenchPlayersSummary': 'writeHighScoringBenchPlayersSummary',
+	'lowScoringStartersSummary': 'writeLowScoringStartersSummary',
+	'playerOpponentSummary': 'writePlayerOpponentSummary',
+}
+
+"""
+How often to look for changed boxscores, in seconds.
+"""
+DEFAULT_POLL_INTERVAL = 5
+
+"""
+Get the signature of every boxscore file in a year's directory, between the given weeks
+if there are any, by (week, game). A file's signature changes whenever it's rewritten.
+"""
+def scanGameFiles(year, startWeek=None, endWeek=None):
+	signatures = {}
+	for weekDirectory in os.listdir(str(year)):
+		if weekDirectory[0] == '.':
+			continue
+		week = int(weekDirectory)
+		if (startWeek is not None and week < startWeek) or (endWeek is not None and week > endWeek):
+			continue
+		for gameFilename in os.listdir(os.path.join(str(year), weekDirectory)):
+			game = getGameNumber(gameFilename)
+			if game is None:
+				continue
+			try:
+				stat = os.stat(findGameFilename(year, week, game))
+			except OSError:
+				continue
+			signatures[(week, game)] = (stat.st_mtime, stat.st_size)
+	return signatures
+
+"""
+Keeps a season loaded and up to date with the boxscore files on disk.
+Each refresh looks for boxscores that were added, changed or removed since the last
+one, and only parses those. If the only changes are new weeks after the ones already
+loaded, the season is updated in place, the way --state does it; otherwise it's
+analyzed again from the games, without parsing the ones that didn't change.
+The reports are rendered as JSON when they're first asked for, and kept until the
+season changes, so most requests are just handing back the rendered report.
+"""
+class SeasonWatcher:
+	def __init__(self, year, startWeek=None, endWeek=None, cache=None, roster=DEFAULT_ROSTER):
+		self.year = year
+		self.startWeek = startWeek
+		self.endWeek = endWeek
+		self.cache = cache
+		self.roster = roster
+
+		self.lock = threading.Lock()
+		self.season = Season(year)
+		self.gameScores = {}
+		self.signatures = {}
+		self.renderedReports = {}
+		self.refreshCount = 0
+
+		# the teams in the order they were added; the reports sort the season's list in place
+		self.teamOrder = []
+
+	"""
+	Bring the season up to date with the files on disk.
+	Returns the number of boxscores that were parsed.
+	"""
+	def refresh(self):
+		signatures = scanGameFiles(self.year, self.startWeek, self.endWeek)
+		changed = []
+		for weekGame in sorted(signatures):
+			if self.signatures.get(weekGame) != signatures[weekGame]:
+				changed.append(weekGame)
+		removed = []
+		for weekGame in self.signatures:
+			if weekGame not in signatures:
+				removed.append(weekGame)
+		if not changed and not removed:
+			return 0
+
+		gameScores = {}
+		for (week, game) in changed:
+			gameScores[(week, game)] = GameScore(self.year, week, game, self.cache, roster=self.roster)
+
+		analyzedWeeks = self.season.getWeeks()
+		lastWeek = analyzedWeeks and analyzedWeeks[-1] or None
+
+		self.lock.acquire()
+		try:
+			if not removed and (lastWeek is None or changed[0][0] > lastWeek):
+				# only new weeks, so they can be added to the season as it is
+				newGames = []
+				for weekGame in changed:
+					newGames.append(gameScores[weekGame])
+				if self.season.games:
+					self.season.teams[:] = self.teamOrder
+					self.season.update(newGames)
+				else:
+					for gameScore in newGames:
+						self.season.addGame(gameScore)
+					self.season.analyze()
+			else:
+				for weekGame in removed:
+					del self.gameScores[weekGame]
+				self.gameScores.update(gameScores)
+				self.season = Season(self.year)
+				for weekGame in sorted(self.gameScores):
+					self.season.addGame(self.gameScores[weekGame])
+				self.season.analyze()
+
+			self.gameScores.update(gameScores)
+			self.teamOrder = list(self.season.teams)
+			self.signatures = signatures
+			self.renderedReports = {}
+			self.refreshCount += 1
+		finally:
+			self.lock.release()
+
+		return len(changed)
+
+	"""
+	Get a report as JSON, rendering it if it hasn't been since the season last changed.
+	"""
+	def getReport(self, name):
+		self.lock.acquire()
+		try:
+			rendered = self.renderedReports.get(name)
+			if rendered is None:
+				# each report sees the teams in the same order, however many have been rendered before it
+				self.season.teams[:] = self.teamOrder
+				output = StringIO.StringIO()
+				writer = JsonWriter(output)
+				writer.startReport(name, None)
+				getattr(self.season, SERVER_REPORTS[name])(writer)
+				writer.endReport()
+				writer.close()
+				rendered = output.getvalue()
+				self.renderedReports[name] = rendered
+			return rendered
+		finally:
+			self.lock.release()
+
+	"""
+	Keep refreshing the season every so often, until the process exits.
+	"""
+	def watch(self, interval=DEFAULT_POLL_INTERVAL):
+		while True:
+			time.sleep(interval)
+			try:
+				self.refresh()
+			except Exception, e:
+				# a boxscore caught halfway through being written shouldn't stop the server
+				print "Could not refresh the season: %s" % e
+
+"""
+Serves the watcher's reports as JSON: GET /<report> for any of SERVER_REPORTS,
+or / for the list of reports.
+"""
+class ReportRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+	def do_GET(self):
+		name = self.path.split('?', 1)[0].strip('/')
+		if not name:
+			self.sendJson(200, '{"reports": [%s]}\n' % ', '.join([ '"%s"' % report for report in sorted(SERVER_REPORTS) ]))
+		elif name in SERVER_REPORTS:
+			self.sendJson(200, self.server.watcher.getReport(name))
+		else:
+			self.sendJson(404, '{"error": "Unknown report"}\n')
+
+	def sendJson(self, status, body):
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	"""
+	Keep quiet about every request.
+	"""
+	def log_message(self, format, *args):
+		pass
+
+"""
+Load the season, then serve its reports over HTTP on the given local port, refreshing
+it in the background whenever the boxscores change, until the process is stopped.
+"""
+def serveSeason(watcher, port, interval=DEFAULT_POLL_INTERVAL, host='127.0.0.1'):
+	watcher.refresh()
+
+	thread = threading.Thread(target=watcher.watch, args=(interval,))
+	thread.daemon = True
+	thread.start()
+
+	server = BaseHTTPServer.HTTPServer((host, port), ReportRequestHandler)
+	server.watcher = watcher
+	print "Serving %s reports on http://%s:%d/" % (watcher.year, host, port)
+	server.serve_forever()
@@ -0,0 +1,33 @@
+import os
+import cPickle
+
+"""
+Save an analyzed season to the given file, so later runs can update it with new
+weeks instead of starting over. The file is replaced atomically.
+"""
+def saveSeason(season, filename):
+	temporaryFilename = '%s.%d.tmp' % (filename, os.getpid())
+	stateFile = open(temporaryFilename, 'wb')
+	try:
+		cPickle.dump(season, stateFile, cPickle.HIGHEST_PROTOCOL)
+	finally:
+		stateFile.close()
+	os.rename(temporaryFilename, filename)
+
+"""
+Load an analyzed season from the given file, or None if there isn't one yet.
+"""
+def loadSeason(filename, year):
+	try:
+		stateFile = open(filename, 'rb')
+	except IOError:
+		return None
+
+	try:
+		season = cPickle.load(stateFile)
+	finally:
+		stateFile.close()
+
+	if season.year != year:
+		raise ValueError("State file %s is for %s, not %s" % (filename, season.year, year))
+	return season
@@ -0,0 +1,133 @@
+import sqlite3
+from domain.parse import GameScore
+from domain.lineup import DEFAULT_ROSTER
+
+"""
+The encoding of the boxscore pages, which the parsed names are in. The store keeps
+the names as text, so they're decoded going in and encoded again coming out, to the
+same bytes the parser gives.
+"""
+BOXSCORE_ENCODING = 'iso-8859-1'
+
+"""
+The tables and indexes of a season store.
+A game's teams are numbered in the order they were parsed, and each team's player
+lines in the order they appear on the page, so the games can be rebuilt exactly.
+"""
+STORE_SCHEMA = [
+	'CREATE TABLE IF NOT EXISTS games (year INTEGER, week INTEGER, game INTEGER, actualWinner TEXT, optimumWinner TEXT, PRIMARY KEY (year, week, game))',
+	'CREATE TABLE IF NOT EXISTS teamWeeks (year INTEGER, week INTEGER, game INTEGER, teamIndex INTEGER, team TEXT, actualPoints INTEGER, optimumPoints INTEGER, PRIMARY KEY (year, week, game, teamIndex))',
+	'CREATE TABLE IF NOT EXISTS playerLines (year INTEGER, week INTEGER, game INTEGER, teamIndex INTEGER, lineIndex INTEGER, team TEXT, playerId TEXT, nflTeamId TEXT, name TEXT, position TEXT, slot TEXT, points INTEGER, PRIMARY KEY (year, week, game, teamIndex, lineIndex))',
+	'CREATE INDEX IF NOT EXISTS teamWeeksTeam ON teamWeeks (team)',
+	'CREATE INDEX IF NOT EXISTS playerLinesPlayer ON playerLines (playerId)',
+	'CREATE INDEX IF NOT EXISTS playerLinesTeam ON playerLines (team)',
+	'CREATE INDEX IF NOT EXISTS playerLinesWeek ON playerLines (year, week)',
+	'CREATE INDEX IF NOT EXISTS playerLinesSlot ON playerLines (slot)',
+]
+
+"""
+A single SQLite file holding the parsed games of any number of seasons, with a row
+per game, per team per game, and per player line.
+Once a season has been ingested, its reports can be run from the store without
+reading any boxscores, and the tables can be queried directly.
+"""
+class SeasonStore:
+	def __init__(self, filename):
+		self.filename = filename
+		self.connection = sqlite3.connect(filename)
+		for statement in STORE_SCHEMA:
+			self.connection.execute(statement)
+		self.connection.commit()
+
+	"""
+	Add the given games for a year to the store, replacing any that are already there.
+	Games that couldn't be read are left out.
+	"""
+	def addGames(self, year, gameScores):
+		cursor = self.connection.cursor()
+		for gameScore in gameScores:
+			if not gameScore.teams:
+				continue
+
+			key = (year, gameScore.week, gameScore.game)
+			for table in [ 'games', 'teamWeeks', 'playerLines' ]:
+				cursor.execute('DELETE FROM %s WHERE year = ? AND week = ? AND game = ?' % table, key)
+
+			cursor.execute('INSERT INTO games VALUES (?, ?, ?, ?, ?)', key + (decodeText(gameScore.actualWinner), decodeText(gameScore.optimumWinner)))
+			for (teamIndex, teamName) in enumerate(gameScore.teamNames):
+				teamScoreLine = gameScore.teams[teamName]
+				cursor.execute('INSERT INTO teamWeeks VALUES (?, ?, ?, ?, ?, ?, ?)', key + (teamIndex, decodeText(teamName), teamScoreLine.actualPoints, teamScoreLine.optimumPoints))
+
+				rows = []
+				for (lineIndex, player) in enumerate(teamScoreLine.players):
+					rows.append(key + (teamIndex, lineIndex, decodeText(teamName)) + tuple([ decodeText(field) for field in player.getFields() ]))
+				cursor.executemany('INSERT INTO playerLines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+		self.connection.commit()
+
+	"""
+	Get a sorted list of the weeks stored for the given year, between the given weeks if there are any.
+	"""
+	def getWeeks(self, year, startWeek=None, endWeek=None):
+		weeks = []
+		for (week,) in self.connection.execute('SELECT DISTINCT week FROM games WHERE year = ? ORDER BY week', (year,)):
+			if (startWeek is None or week >= startWeek) and (endWeek is None or week <= endWeek):
+				weeks.append(week)
+		return weeks
+
+	"""
+	Get a sorted list of the games stored for the given year and week.
+	"""
+	def getGames(self, year, week):
+		games = []
+		for (game,) in self.connection.execute('SELECT game FROM games WHERE year = ? AND week = ? ORDER BY game', (year, week)):
+			games.append(game)
+		return games
+
+	"""
+	Load the game scores for the given (week, game) pairs, in the order given,
+	without reading any boxscores. The optimum lineups are worked out again from
+	the player lines, with the given roster.
+	"""
+	def loadGameScores(self, year, weekGames, roster=DEFAULT_ROSTER):
+		weeks = sorted(set([ week for (week, game) in weekGames ]))
+		weekList = ', '.join([ '?' ] * len(weeks))
+
+		# each game's teams, in order, as (team name, player fields) pairs, whether or not they have any lines
+		teamRowsByGame = {}
+		rowsByTeam = {}
+		query = 'SELECT week, game, teamIndex, team FROM teamWeeks WHERE year = ? AND week IN (%s) ORDER BY week, game, teamIndex' % weekList
+		for (week, game, teamIndex, teamName) in self.connection.execute(query, [ year ] + weeks):
+			rows = []
+			teamRowsByGame.setdefault((week, game), []).append((encodeText(teamName), rows))
+			rowsByTeam[(week, game, teamIndex)] = rows
+
+		# read the games' lines in one query, and attach them to their teams
+		query = 'SELECT week, game, teamIndex, playerId, nflTeamId, name, position, slot, points FROM playerLines WHERE year = ? AND week IN (%s) ORDER BY week, game, teamIndex, lineIndex' % weekList
+		for (week, game, teamIndex, playerId, nflTeamId, name, position, slot, points) in self.connection.execute(query, [ year ] + weeks):
+			rows = rowsByTeam.get((week, game, teamIndex))
+			if rows is not None:
+				rows.append((encodeText(playerId), encodeText(nflTeamId), encodeText(name), encodeText(position), encodeText(slot), points))
+
+		gameScores = []
+		for (week, game) in weekGames:
+			gameScores.append(GameScore(year, week, game, teamRows=teamRowsByGame.get((week, game)), roster=roster))
+		return gameScores
+
+	def close(self):
+		self.connection.close()
+
+"""
+Decode a parsed name for the store; anything that isn't a byte string is kept as is.
+"""
+def decodeText(value):
+	if isinstance(value, str):
+		return value.decode(BOXSCORE_ENCODING)
+	return value
+
+"""
+Encode a name from the store back into the bytes the parser gives. A name that was
+written to the store some other way, with characters the pages can't have, gets
+them replaced rather than failing the load.
+"""
+def encodeText(value):
+	return value.encode(BOXSCORE_ENCODING, 'replace')
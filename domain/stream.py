@@ -0,0 +1,187 @@
+import collections
+import multiprocessing
+from domain.aggregate import SeasonAggregate, OpposingLinesAggregate, buildSeason, shardByWeek
+from domain.analysis import PlayerPointsLine
+from domain.cache import ParseCache
+from domain.ingest import loadGameScores, recordFileTimings
+from domain.lineup import DEFAULT_ROSTER
+from domain.parse import GameScore, PlayerScoreLine, findGameFilename, timeBoxscoreFile
+
+"""
+The reports that need every game kept, which a streamed season doesn't have.
+"""
+GAME_REPORTS = ['gameScores', 'playerContributionSummary', 'costlyLineupDecisionsSummary', 'scheduleLuckSummary', 'weeklyStandingsSummary', 'playerTrendsSummary', 'lineupRegretSummary']
+
+"""
+Yield the game scores for the given (week, game) pairs, in order, loading them a week
+at a time with the given loader, which is called as loadGames(year, weekGames, ...)
+like loadGameScores or SeasonStore.loadGameScores. Only one week's games are loaded
+at once, and each week's are let go of as soon as the next week's are wanted.
+"""
+def streamGameScores(loadGames, year, weekGames, *arguments):
+	for shard in shardByWeek(weekGames):
+		for gameScore in loadGames(year, shard, *arguments):
+			yield gameScore
+
+"""
+Yield the game scores parsed from the boxscores for the given (week, game) pairs, in
+order, a week at a time, like streamGameScores with loadGameScores. With more than one
+job, a single pool of worker processes is kept for the whole stream and handed the
+weeks in order, so the next weeks are parsed while this one is analyzed; the workers
+are only let a few weeks ahead, so the parsed weeks don't pile up waiting.
+"""
+def streamBoxscores(year, weekGames, cache=None, jobs=1, roster=DEFAULT_ROSTER):
+	if jobs <= 1:
+		for gameScore in streamGameScores(loadGameScores, year, weekGames, cache, jobs, roster):
+			yield gameScore
+		return
+
+	cacheDirectory = None
+	cacheSize = None
+	if cache:
+		cacheDirectory = cache.directory
+		cacheSize = cache.maxBytes
+
+	shards = shardByWeek(weekGames)
+	tasks = []
+	for shard in shards:
+		tasks.append(([ findGameFilename(year, week, game) for (week, game) in shard ], cacheDirectory, cacheSize))
+
+	# the weeks handed to the pool and not taken back yet, in order
+	pending = collections.deque()
+	nextTask = 0
+	pool = multiprocessing.Pool(jobs)
+	try:
+		for (shard, (filenames, cacheDirectory, cacheSize)) in zip(shards, tasks):
+			while nextTask < len(tasks) and len(pending) < jobs * 2:
+				pending.append(pool.apply_async(loadWeekTeamRows, (tasks[nextTask],)))
+				nextTask += 1
+
+			(timedResults, hits, misses) = pending.popleft().get()
+			if cache:
+				cache.hits += hits
+				cache.misses += misses
+			for ((week, game), teamRows) in zip(shard, recordFileTimings(filenames, timedResults)):
+				# a game that couldn't be read falls through to GameScore, which reports it
+				yield GameScore(year, week, game, teamRows=teamRows, roster=roster)
+	finally:
+		# every week has been taken back by now, unless the stream was stopped early
+		pool.terminate()
+		pool.join()
+
+"""
+Load the parsed rows of one week's boxscore files in a worker, from the parse cache
+in the given directory, if there is one, where they're in it, and from the files
+where they aren't, caching those. Returns each file's (rows, timing), as
+timeBoxscoreFile gives them, with no timing for a cached file, and the number of
+cache hits and misses, so the timings and counts can be recorded by the caller.
+"""
+def loadWeekTeamRows(task):
+	(filenames, cacheDirectory, cacheSize) = task
+	cache = None
+	if cacheDirectory:
+		cache = ParseCache(cacheDirectory, cacheSize)
+
+	timedResults = []
+	for filename in filenames:
+		teamRows = None
+		if cache:
+			teamRows = cache.get(filename)
+		if teamRows is not None:
+			timedResults.append((teamRows, None))
+			continue
+
+		( teamRows, timing ) = timeBoxscoreFile(filename)
+		if teamRows is not None and cache:
+			cache.put(filename, teamRows)
+		timedResults.append((teamRows, timing))
+
+	if cache:
+		return (timedResults, cache.hits, cache.misses)
+	return (timedResults, 0, 0)
+
+"""
+Analyzes a season from a stream of games, without keeping the games.
+Each game is folded into a SeasonAggregate as it comes in, which adds up the teams'
+points and records and the players' totals, and picks out the high scoring bench
+players and low scoring starters. Finding the players who scored above their average
+needs their averages over the whole season, so each player's lines are kept in the
+compact form (week, sequence, points, slot, team id, opposing team name) for a
+second pass once the games are done; a player's position is the same every week,
+so it's kept once per player. The games, their team score lines and their
+player score lines can all be let go of as soon as they've been added.
+"""
+class SeasonStream:
+	def __init__(self, year):
+		self.year = year
+		self.aggregate = SeasonAggregate()
+		self.playerLines = {}
+		self.playerPositions = {}
+		self.gameCount = 0
+
+	"""
+	Add a game to the season.
+	"""
+	def addGame(self, game):
+		self.aggregate.addGame(game)
+		self.gameCount += 1
+
+		[ awayTeamName, homeTeamName ] = game.teams.keys()
+		for (teamName, opposingTeamName) in [ (awayTeamName, homeTeamName), (homeTeamName, awayTeamName) ]:
+			for scoreLine in game.teams[teamName].players:
+				lines = self.playerLines.get(scoreLine.playerId)
+				if lines is None:
+					lines = []
+					self.playerLines[scoreLine.playerId] = lines
+					self.playerPositions[scoreLine.playerId] = scoreLine.position
+				lines.append((scoreLine.week, scoreLine.sequence, scoreLine.points, scoreLine.slot, scoreLine.teamId, opposingTeamName))
+
+	"""
+	Add every game from an iterable of games, such as streamGameScores.
+	"""
+	def addGames(self, games):
+		for game in games:
+			self.addGame(game)
+
+	"""
+	Build the Season the reports are written from. Like the map-reduce analysis, the
+	season has no games, and its players have their totals and averages but not their
+	score lines. The high scoring bench players and low scoring starters come from the
+	aggregate; then the players who scored above their average, and the player's row of
+	the opponent matrix, are found from each player's compact lines, which are let go of
+	as soon as the player's done, so a stream can only be built into a season once.
+	A points line that's already in a bench or starters list is shared rather than made
+	again, as Player.getPointsLine does.
+	"""
+	def buildSeason(self):
+		season = buildSeason(self.year, self.aggregate, OpposingLinesAggregate())
+		season.scoreLineCount = self.aggregate.lineCount
+
+		pointsLines = {}
+		for team in season.teams:
+			for line in list(team.highScoringBenchPlayers) + list(team.lowScoringStarters):
+				pointsLines[line.scoreLine.sequence] = line
+
+		for playerId in self.aggregate.playerIds:
+			player = season.getPlayerById(playerId)
+			playerLines = self.playerLines.pop(playerId)
+
+			# the first line above average in each week, as in Player.linesAboveAverageByWeek
+			aboveAverageByWeek = {}
+			for (week, sequence, points, slot, teamId, opposingTeamName) in playerLines:
+				if points > player.averagePoints and week not in aboveAverageByWeek:
+					line = pointsLines.get(sequence)
+					if line is None:
+						scoreLine = PlayerScoreLine(week, fields=(playerId, teamId, player.name, self.playerPositions[playerId], slot, points))
+						scoreLine.sequence = sequence
+						line = PlayerPointsLine(player, scoreLine)
+					aboveAverageByWeek[week] = line
+
+			# which counts against every team the player faced that week
+			for (week, sequence, points, slot, teamId, opposingTeamName) in playerLines:
+				season.opponentMatrix.addLine(playerId, player.name, opposingTeamName, points, player.averagePoints, sequence)
+				line = aboveAverageByWeek.get(week)
+				if line:
+					season.getTeamByName(opposingTeamName).addAboveAverageOpposingPlayerPointsLine(line)
+
+		return season
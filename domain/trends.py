@@ -0,0 +1,240 @@
+import sys
+import collections
+from domain.report import TextWriter
+
+"""
+How many of a player's most recent games their rolling average covers, by default.
+"""
+DEFAULT_TREND_WINDOW = 3
+
+"""
+A team's standing as of the end of a week: its actual and optimum records and points
+over the season so far, and its all-play record, which is what its record would have
+been if it had played every other team every week. Its expected wins are its all-play
+winning percentage times the games it's played, so its actual wins less its expected
+wins (counting ties as half) is how much its schedule has helped or hurt it so far.
+"""
+class TeamStanding(object):
+	__slots__ = ('week', 'name', 'games', 'actualWins', 'actualLosses', 'actualTies', 'optimumWins', 'optimumLosses', 'optimumTies',
+		'actualPointsFor', 'actualPointsAgainst', 'optimumPointsFor', 'optimumPointsAgainst',
+		'allPlayWins', 'allPlayLosses', 'allPlayTies')
+
+	def __init__(self, name):
+		self.week = None
+		self.name = name
+		self.games = 0
+
+		self.actualWins = 0
+		self.actualLosses = 0
+		self.actualTies = 0
+		self.optimumWins = 0
+		self.optimumLosses = 0
+		self.optimumTies = 0
+
+		self.actualPointsFor = 0
+		self.actualPointsAgainst = 0
+		self.optimumPointsFor = 0
+		self.optimumPointsAgainst = 0
+
+		self.allPlayWins = 0
+		self.allPlayLosses = 0
+		self.allPlayTies = 0
+
+	"""
+	Get a copy of this standing, to keep as it was at the end of a week.
+	"""
+	def copy(self):
+		standing = TeamStanding(self.name)
+		for field in TeamStanding.__slots__:
+			setattr(standing, field, getattr(self, field))
+		return standing
+
+	"""
+	Get the number of wins the all-play record would give over the games played.
+	"""
+	def getExpectedWins(self):
+		allPlayGames = self.allPlayWins + self.allPlayLosses + self.allPlayTies
+		if not allPlayGames:
+			return 0.0
+		return (self.allPlayWins + 0.5 * self.allPlayTies) * self.games / allPlayGames
+
+"""
+A player's score in a single game, with their average over their last few games and
+over the season so far, both including this one.
+"""
+class PlayerTrend(object):
+	__slots__ = ('week', 'playerId', 'name', 'points', 'rollingAverage', 'seasonAverage')
+
+	def __init__(self, week, playerId, name, points, rollingAverage, seasonAverage):
+		self.week = week
+		self.playerId = playerId
+		self.name = name
+		self.points = points
+		self.rollingAverage = rollingAverage
+		self.seasonAverage = seasonAverage
+
+"""
+A player's rolling window of their most recent points, kept as a running sum so
+each new game is added, and the oldest one dropped, in constant time.
+"""
+class RollingPoints:
+	def __init__(self, window):
+		self.window = window
+		self.points = collections.deque()
+		self.windowTotal = 0
+		self.seasonTotal = 0
+		self.seasonCount = 0
+
+	"""
+	Add a game's points, returning the rolling and season averages after it.
+	"""
+	def add(self, points):
+		self.points.append(points)
+		self.windowTotal += points
+		if len(self.points) > self.window:
+			self.windowTotal -= self.points.popleft()
+		self.seasonTotal += points
+		self.seasonCount += 1
+		return ((self.windowTotal * 1.0) / len(self.points), (self.seasonTotal * 1.0) / self.seasonCount)
+
+"""
+Follows a season week by week, in a single pass over its games: every team's standing
+as of the end of each week, and every player's rolling and season averages after
+each game. This is the same as running the team reports with --endWeek set to each
+week in turn, without parsing or analyzing the season again for every week.
+"""
+class SeasonTrends:
+	def __init__(self, season, window=DEFAULT_TREND_WINDOW):
+		self.window = max(window, 1)
+
+		# the standings at the end of each week, as (week, standings) pairs, in the order the teams first played
+		self.weeklyStandings = []
+
+		# every player's trend after each game, by week, as (week, trends) pairs
+		self.weeklyPlayerTrends = []
+
+		standings = {}
+		teamNames = []
+		rollingPoints = {}
+
+		games = sorted(season.games, key=gameWeek)
+		index = 0
+		while index < len(games):
+			week = games[index].week
+			weekPoints = []
+			playerTrends = []
+
+			while index < len(games) and games[index].week == week:
+				game = games[index]
+				index += 1
+
+				[ awayTeamName, homeTeamName ] = game.teams.keys()
+				for teamName in [ awayTeamName, homeTeamName ]:
+					if teamName not in standings:
+						teamNames.append(teamName)
+						standings[teamName] = TeamStanding(teamName)
+
+				for (teamName, opposingTeamName) in [ (awayTeamName, homeTeamName), (homeTeamName, awayTeamName) ]:
+					standing = standings[teamName]
+					teamScore = game.teams[teamName]
+					opposingTeamScore = game.teams[opposingTeamName]
+
+					standing.games += 1
+					standing.actualPointsFor += teamScore.actualPoints
+					standing.actualPointsAgainst += opposingTeamScore.actualPoints
+					standing.optimumPointsFor += teamScore.optimumPoints
+					standing.optimumPointsAgainst += opposingTeamScore.optimumPoints
+
+					if game.actualWinner == teamName:
+						standing.actualWins += 1
+					elif game.actualWinner == opposingTeamName:
+						standing.actualLosses += 1
+					else:
+						standing.actualTies += 1
+
+					if game.optimumWinner == teamName:
+						standing.optimumWins += 1
+					elif game.optimumWinner == opposingTeamName:
+						standing.optimumLosses += 1
+					else:
+						standing.optimumTies += 1
+
+					weekPoints.append((teamScore.actualPoints, teamName))
+
+					for playerLine in teamScore.players:
+						rolling = rollingPoints.get(playerLine.playerId)
+						if rolling is None:
+							rolling = RollingPoints(self.window)
+							rollingPoints[playerLine.playerId] = rolling
+						(rollingAverage, seasonAverage) = rolling.add(playerLine.points)
+						playerTrends.append(PlayerTrend(week, playerLine.playerId, playerLine.name, playerLine.points, rollingAverage, seasonAverage))
+
+			self.addAllPlayResults(standings, weekPoints)
+
+			weekStandings = []
+			for teamName in teamNames:
+				standing = standings[teamName].copy()
+				standing.week = week
+				weekStandings.append(standing)
+			self.weeklyStandings.append((week, weekStandings))
+			self.weeklyPlayerTrends.append((week, playerTrends))
+
+	"""
+	Add a week's all-play results: each team that played beats every team that scored
+	less than it that week, and loses to every team that scored more. The week's points
+	are sorted once, so each team's results come from its place in the order.
+	"""
+	def addAllPlayResults(self, standings, weekPoints):
+		weekPoints.sort()
+		start = 0
+		while start < len(weekPoints):
+			# the teams with the same points tie with each other
+			end = start
+			while end < len(weekPoints) and weekPoints[end][0] == weekPoints[start][0]:
+				end += 1
+			for (points, teamName) in weekPoints[start:end]:
+				standing = standings[teamName]
+				standing.allPlayWins += start
+				standing.allPlayLosses += len(weekPoints) - end
+				standing.allPlayTies += end - start - 1
+			start = end
+
+	"""
+	Print every team's standing at the end of each week.
+	"""
+	def printWeeklyStandingsSummary(self):
+		self.writeWeeklyStandingsSummary(TextWriter(sys.stdout))
+
+	def writeWeeklyStandingsSummary(self, writer):
+		fields = ('week', 'team', 'actualWins', 'actualLosses', 'actualTies', 'optimumWins', 'optimumLosses', 'optimumTies',
+			'actualPointsFor', 'actualPointsAgainst', 'optimumPointsFor', 'optimumPointsAgainst',
+			'allPlayWins', 'allPlayLosses', 'allPlayTies', 'expectedWins', 'winsAboveExpected')
+		for (week, standings) in self.weeklyStandings:
+			writer.writeText("Week %d", (week,))
+			for standing in standings:
+				expectedWins = standing.getExpectedWins()
+				writer.writeRecord(fields, (week, standing.name, standing.actualWins, standing.actualLosses, standing.actualTies,
+					standing.optimumWins, standing.optimumLosses, standing.optimumTies,
+					standing.actualPointsFor, standing.actualPointsAgainst, standing.optimumPointsFor, standing.optimumPointsAgainst,
+					standing.allPlayWins, standing.allPlayLosses, standing.allPlayTies, expectedWins, standing.actualWins + 0.5 * standing.actualTies - expectedWins),
+					"%(team)s: actual record: %(actualWins)d-%(actualLosses)d-%(actualTies)d; optimum record: %(optimumWins)d-%(optimumLosses)d-%(optimumTies)d; APF: %(actualPointsFor)d; OPF: %(optimumPointsFor)d; all-play: %(allPlayWins)d-%(allPlayLosses)d-%(allPlayTies)d; wins above expected: %(winsAboveExpected).2f")
+
+	"""
+	Print every player's points in each game, with their rolling and season averages.
+	"""
+	def printPlayerTrendsSummary(self):
+		self.writePlayerTrendsSummary(TextWriter(sys.stdout))
+
+	def writePlayerTrendsSummary(self, writer):
+		fields = ('week', 'playerId', 'player', 'points', 'window', 'rollingAverage', 'seasonAverage')
+		for (week, playerTrends) in self.weeklyPlayerTrends:
+			writer.writeText("Week %d", (week,))
+			for trend in playerTrends:
+				writer.writeRecord(fields, (week, trend.playerId, trend.name, trend.points, self.window, trend.rollingAverage, trend.seasonAverage),
+					"%(player)s: points: %(points)d; last %(window)d average: %(rollingAverage).2f; season average: %(seasonAverage).2f")
+
+"""
+Sort key for games, by week. The sort is stable, so the games in a week stay in the order they were added.
+"""
+def gameWeek(game):
+	return game.week
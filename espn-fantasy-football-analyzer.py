@@ -1,7 +1,33 @@
 import re
 import sys
 import os
-from domain.parse import GameScore, Season
+import cProfile
+from domain.parse import Season, getGameNumber
+from domain.ingest import loadGameScores
+from domain.lineup import Roster, DEFAULT_ROSTER
+from domain.marginal import analyzeMarginalValues, writePlayerContributionSummary, writeCostlyLineupDecisionsSummary
+from domain.state import loadSeason, saveSeason
+from domain.cache import ParseCache, DEFAULT_CACHE_DIRECTORY
+from domain.store import SeasonStore
+from domain.report import FORMATS, getReportWriter
+from domain.server import SeasonWatcher, serveSeason, DEFAULT_POLL_INTERVAL
+from domain.fetch import BoxscoreFetcher
+from domain.compact import compactBoxscoreFile
+from domain.profiling import Profiler, setActiveProfiler
+from domain.stream import GAME_REPORTS, SeasonStream, streamGameScores, streamBoxscores
+from domain.trends import SeasonTrends, DEFAULT_TREND_WINDOW
+from domain.regret import LineupIndex
+
+"""
+The commands that can be given instead of the default, which is to analyze a season and print its reports.
+"""
+COMMANDS = ['ingest', 'serve', 'fetch', 'compact']
+
+"""
+The reports --columnar can give, which are worked out from the parsed rows in NumPy
+arrays instead of from the season's objects.
+"""
+COLUMNAR_REPORTS = ['playerScoreSummary', 'highScoringBenchPlayersSummary', 'lowScoringStartersSummary']
 
 """
 Get a sorted list of all the weeks in the given year's directory.
@@ -21,104 +47,440 @@ def get_weeks(year, startWeek, endWeek):
 	return realWeeks
 
 """
-Get a sorted list of all the games in the given year/week directory.
+Get a sorted list of all the games in the given year/week directory, whether their files are compressed or not.
 """
 def get_games(year, week):
 	games = []
-	for game in os.listdir(os.path.join(str(year), str(week))):
-		if game[0] != '.':
-			games.append(int(game))
+	for gameFilename in os.listdir(os.path.join(str(year), str(week))):
+		game = getGameNumber(gameFilename)
+		if game is not None and game not in games:
+			games.append(game)
 	games.sort()
 	return games
 
 """
 Parse out the command line arguments, which must include a year and may include a starting week and/or an ending week.
 Also allow the user to define what they want to print, from among: gameScores, teamRecordSummary, teamPointsSummary, playerScoreSummary, teamAboveAverageOpposingPlayersSummary
+Options that don't take a value (like --clearCache) may be given without an equals sign.
+A command may be given as a plain argument; see COMMANDS.
 """
 def parse_args(args):
-	year = None
-	startWeek = None
-	endWeek = None
-	display = []
+	options = {
+		'command': None,
+		'year': None,
+		'startWeek': None,
+		'endWeek': None,
+		'display': [],
+		'cache': None,
+		'cacheSize': None,
+		'clearCache': False,
+		'rebuildCache': False,
+		'jobs': 1,
+		'state': None,
+		'roster': DEFAULT_ROSTER,
+		'simulations': 10000,
+		'seed': 0,
+		'store': None,
+		'format': 'text',
+		'output': None,
+		'port': 8080,
+		'pollInterval': DEFAULT_POLL_INTERVAL,
+		'baseUrl': None,
+		'games': 6,
+		'rate': None,
+		'retries': 3,
+		'profile': False,
+		'profileOutput': None,
+		'cProfile': None,
+		'stream': False,
+		'trendWindow': DEFAULT_TREND_WINDOW,
+		'benchPoints': None,
+		'starterPoints': None,
+		'columnar': False,
+	}
 
 	for arg in args:
-		if not re.search('=', arg):
+		if re.search('=', arg):
+			[ key, value ] = arg.split('=', 1)
+		elif arg.startswith('--'):
+			[ key, value ] = [ arg, None ]
+		else:
+			if arg in COMMANDS:
+				options['command'] = arg
 			continue
-		[ key, value ] = arg.split('=')
 
 		if key == '--year':
-			year = int(value)
+			options['year'] = int(value)
 		elif key == '--startWeek':
-			startWeek = int(value)
+			options['startWeek'] = int(value)
 		elif key == '--endWeek':
-			endWeek = int(value)
+			options['endWeek'] = int(value)
 		elif key == '--display':
-			display = value.split(',')
+			options['display'] = value.split(',')
+		elif key == '--cache':
+			options['cache'] = value or DEFAULT_CACHE_DIRECTORY
+		elif key == '--cacheSize':
+			options['cacheSize'] = int(value) * 1024 * 1024
+		elif key == '--clearCache':
+			options['clearCache'] = True
+		elif key == '--rebuildCache':
+			options['rebuildCache'] = True
+		elif key == '--jobs':
+			options['jobs'] = int(value)
+		elif key == '--state':
+			options['state'] = value
+		elif key == '--roster':
+			options['roster'] = Roster(value)
+		elif key == '--simulations':
+			options['simulations'] = int(value)
+		elif key == '--seed':
+			options['seed'] = int(value)
+		elif key == '--store':
+			options['store'] = value
+		elif key == '--format':
+			options['format'] = value
+		elif key == '--output':
+			options['output'] = value
+		elif key == '--port':
+			options['port'] = int(value)
+		elif key == '--pollInterval':
+			options['pollInterval'] = float(value)
+		elif key == '--baseUrl':
+			options['baseUrl'] = value
+		elif key == '--games':
+			options['games'] = int(value)
+		elif key == '--rate':
+			options['rate'] = float(value)
+		elif key == '--retries':
+			options['retries'] = int(value)
+		elif key == '--profile':
+			options['profile'] = True
+			options['profileOutput'] = value
+		elif key == '--cProfile':
+			options['cProfile'] = value
+		elif key == '--stream':
+			options['stream'] = True
+		elif key == '--trendWindow':
+			options['trendWindow'] = int(value)
+		elif key == '--benchPoints':
+			options['benchPoints'] = int(value)
+		elif key == '--starterPoints':
+			options['starterPoints'] = int(value)
+		elif key == '--columnar':
+			options['columnar'] = True
 	
-	if year is None:
+	if options['year'] is None:
 		raise Error("Year required")
+	if options['format'] not in FORMATS:
+		raise Error("Unknown format")
+	if options['command'] == 'ingest' and options['store'] is None:
+		raise Error("Store required to ingest")
+	if options['command'] == 'fetch' and (options['baseUrl'] is None or options['endWeek'] is None):
+		raise Error("Base URL and end week required to fetch")
+	if options['stream'] and (options['state'] or options['command'] or set(options['display']) & set(GAME_REPORTS) or options['benchPoints'] is not None or options['starterPoints'] is not None):
+		raise Error("Streamed seasons can't be saved, used by a command, or give reports that need the games")
+	if options['columnar'] and (options['stream'] or options['state'] or options['command'] or options['store'] or set(options['display']) - set(COLUMNAR_REPORTS)):
+		raise Error("Columnar analysis only reads boxscores, and only gives the columnar reports")
 
-	return (year, display, startWeek, endWeek)
+	return options
 
 if __name__ == '__main__':
 	try:
-		(year, display, startWeek, endWeek) = parse_args(sys.argv)
+		options = parse_args(sys.argv)
 	except:
-		print "Usage: fantasyfootballparser.py --year=<year> [--startWeek=<startWeek> --endWeek=<endWeek>]"
+		print "Usage: fantasyfootballparser.py [ingest|serve|fetch|compact] --year=<year> [--startWeek=<startWeek> --endWeek=<endWeek>] [--cache[=<directory>] --cacheSize=<MB> --clearCache --rebuildCache] [--jobs=<N>] [--state=<file>] [--roster=<slot>:<position>[+<position>...],...] [--simulations=<N> --seed=<N>] [--store=<file>] [--format=text|csv|json|ndjson] [--output=<file>] [--port=<N> --pollInterval=<seconds>] [--baseUrl=<url> --games=<N> --rate=<requests per second> --retries=<N>] [--profile[=<file>]] [--cProfile=<file>] [--stream] [--trendWindow=<N>] [--benchPoints=<N> --starterPoints=<N>] [--columnar]"
 		sys.exit(1)
 
-	# determine which weeks we're going to be analysing
-	weeks = get_weeks(year, startWeek, endWeek)
-	season = Season(year)
-	for week in weeks:
-		# get the games in this week
-		games = get_games(year, week)
+	year = options['year']
+	display = options['display']
+
+	# time each phase of the run; the timings are only collected from the parser if we're profiling
+	profiler = Profiler()
+	if options['profile']:
+		setActiveProfiler(profiler)
+	codeProfiler = None
+	if options['cProfile']:
+		codeProfiler = cProfile.Profile()
+		codeProfiler.enable()
 
-		# parse the game score from each file
+	# set up the parse cache, if we're using one
+	profiler.startPhase('set up')
+	cache = None
+	if options['cache'] or options['clearCache'] or options['rebuildCache']:
+		cache = ParseCache(options['cache'] or DEFAULT_CACHE_DIRECTORY, options['cacheSize'])
+		if options['clearCache'] or options['rebuildCache']:
+			cache.clear()
+		if options['clearCache'] and not options['rebuildCache']:
+			sys.exit(0)
+
+	# download the boxscores, instead of analyzing them
+	if options['command'] == 'fetch':
+		weekGames = []
+		for week in range(options['startWeek'] or 1, options['endWeek'] + 1):
+			for game in range(1, options['games'] + 1):
+				weekGames.append((week, game))
+		fetcher = BoxscoreFetcher(options['baseUrl'], options['jobs'], options['rate'], options['retries'])
+		fetcher.fetch(year, weekGames)
+		print "Fetched %d boxscores (%d bytes); %d not modified, %d missing, %d failed" % (fetcher.downloaded, fetcher.bytesDownloaded, fetcher.notModified, fetcher.missing, fetcher.failed)
+		sys.exit(fetcher.failed and 1 or 0)
+
+	# shrink the boxscores down to what the parser reads, and compress them
+	if options['command'] == 'compact':
+		compacted = 0
+		originalBytes = 0
+		compactBytes = 0
+		for week in get_weeks(year, options['startWeek'], options['endWeek']):
+			for game in get_games(year, week):
+				sizes = compactBoxscoreFile(year, week, game)
+				if sizes:
+					compacted += 1
+					originalBytes += sizes[0]
+					compactBytes += sizes[1]
+		print "Compacted %d boxscores from %d bytes to %d bytes" % (compacted, originalBytes, compactBytes)
+		sys.exit(0)
+
+	# keep the season loaded and serve its reports, instead of printing them once
+	if options['command'] == 'serve':
+		watcher = SeasonWatcher(year, options['startWeek'], options['endWeek'], cache, options['roster'])
+		serveSeason(watcher, options['port'], options['pollInterval'])
+		sys.exit(0)
+
+	# the season store, if there is one, is either where we're ingesting the boxscores to, or where we read the games from
+	store = None
+	if options['store']:
+		store = SeasonStore(options['store'])
+	readFromStore = store and options['command'] != 'ingest'
+
+	# pick up where we left off, if we've saved the season before
+	profiler.startPhase('load state')
+	season = None
+	if options['state'] and options['command'] != 'ingest':
+		season = loadSeason(options['state'], year)
+
+	# determine which weeks and games we're going to be analysing, skipping any games we've already done
+	profiler.startPhase('list games')
+	analyzedGames = {}
+	if season:
+		for weekGame in season.getWeekGames():
+			analyzedGames[weekGame] = True
+	weekGames = []
+	if readFromStore:
+		weeks = store.getWeeks(year, options['startWeek'], options['endWeek'])
+	else:
+		weeks = get_weeks(year, options['startWeek'], options['endWeek'])
+	for week in weeks:
+		if readFromStore:
+			games = store.getGames(year, week)
+		else:
+			games = get_games(year, week)
 		for game in games:
-			gameScore = GameScore(year, week, game)
+			if (week, game) not in analyzedGames:
+				weekGames.append((week, game))
+
+	# parse the game score from each file, or load them from the store
+	profiler.startPhase('parse')
+	lineStore = None
+	if options['columnar']:
+		# imported here since it needs NumPy; the rows go straight into columns, without building the season
+		from domain.columnar import loadPlayerLineStore
+		lineStore = loadPlayerLineStore(year, weekGames, cache, options['jobs'], options['roster'])
+	elif readFromStore:
+		loadGames = store.loadGameScores
+		loadArguments = (options['roster'],)
+	else:
+		loadGames = loadGameScores
+		loadArguments = (cache, options['jobs'], options['roster'])
+	if options['columnar']:
+		gameScores = None
+	elif options['stream'] and readFromStore:
+		# the games are loaded a week at a time as they're analyzed, and not kept
+		gameScores = streamGameScores(loadGames, year, weekGames, *loadArguments)
+	elif options['stream']:
+		# likewise, with a single pool of workers parsing the weeks ahead, if there's more than one job
+		gameScores = streamBoxscores(year, weekGames, *loadArguments)
+	else:
+		gameScores = loadGames(year, weekGames, *loadArguments)
+
+	if options['command'] == 'ingest':
+		store.addGames(year, gameScores)
+		store.close()
+		print "Ingested %d games from %d weeks into %s" % (len(gameScores), len(weeks), options['store'])
+		sys.exit(0)
+
+	# perform further analysis on the season; the columnar reports are worked out as they're written
+	if lineStore:
+		gameCount = lineStore.gameCount
+	elif options['stream']:
+		profiler.startPhase('stream games')
+		seasonStream = SeasonStream(year)
+		seasonStream.addGames(gameScores)
+		profiler.startPhase('analyze players')
+		season = seasonStream.buildSeason()
+		gameCount = seasonStream.gameCount
+	elif season:
+		profiler.startPhase('update')
+		season.update(gameScores)
+	else:
+		season = Season(year)
+		for gameScore in gameScores:
 			season.addGame(gameScore)
+		profiler.startPhase('analyze players')
+		season.analyzePlayers()
+		profiler.startPhase('analyze games')
+		season.analyzeGames()
+	if season and not options['stream']:
+		gameCount = len(season.games)
 
-	if "gameScores" in display:
-		print
-		# print the games, and winner info
-		for gameScore in season.games:
-			print "Week %d, game %d, winner; actual: %s, optimum: %s" % (gameScore.week, gameScore.game, gameScore.actualWinner, gameScore.optimumWinner)
+	# save the season before printing, since printing reorders the teams
+	if options['state']:
+		profiler.startPhase('save state')
+		saveSeason(season, options['state'])
 
-			for teamName in gameScore.teams:
-				print "Week %d, game %d, %s; actual: %d, optimum: %d" % (gameScore.week, gameScore.game, teamName, gameScore.teams[teamName].actualPoints, gameScore.teams[teamName].optimumPoints)
+	writer = getReportWriter(options['format'], options['output'])
 
-	# perform further analysis on the season
-	season.analyze()
+	if "gameScores" in display:
+		profiler.startPhase('report gameScores')
+		writer.startReport('gameScores', None)
+		season.writeGameScores(writer)
+		writer.endReport()
 
 	if "teamPointsSummary" in display:
-		print
-		print "Team Points Summary:"
-		season.printTeamPointsSummary()
+		profiler.startPhase('report teamPointsSummary')
+		writer.startReport('teamPointsSummary', "Team Points Summary:")
+		season.writeTeamPointsSummary(writer)
+		writer.endReport()
 
 	if "teamRecordSummary" in display:
-		print
-		print "Team Record Summary:"
-		season.printTeamRecordSummary()
+		profiler.startPhase('report teamRecordSummary')
+		writer.startReport('teamRecordSummary', "Team Record Summary:")
+		season.writeTeamRecordSummary(writer)
+		writer.endReport()
 
 	if "playerScoreSummary" in display:
-		print
-		print "Player Score Summary:"
-		season.printPlayerScoreSummary()
+		profiler.startPhase('report playerScoreSummary')
+		writer.startReport('playerScoreSummary', "Player Score Summary:")
+		if lineStore:
+			lineStore.writePlayerScoreSummary(writer)
+		else:
+			season.writePlayerScoreSummary(writer)
+		writer.endReport()
 
 	if "teamAboveAverageOpposingPlayersScoreSummary" in display:
-		print
-		print "Team Above Average Opposing Players Score Summary:"
-		season.printTeamAboveAverageOpposingPlayersSummary()
+		profiler.startPhase('report teamAboveAverageOpposingPlayersScoreSummary')
+		writer.startReport('teamAboveAverageOpposingPlayersScoreSummary', "Team Above Average Opposing Players Score Summary:")
+		season.writeTeamAboveAverageOpposingPlayersSummary(writer)
+		writer.endReport()
+
+	# other thresholds for the bench players and starters, and the regrets, come from the lineup index
+	lineupIndex = None
+	if not lineStore and (options['benchPoints'] is not None or options['starterPoints'] is not None or "lineupRegretSummary" in display):
+		profiler.startPhase('index lineups')
+		lineupIndex = LineupIndex(season)
 
 	if "highScoringBenchPlayersSummary" in display:
-		print
-		print "High Scoring Bench Players:"
-		season.printHighScoringBenchPlayersSummary()
+		profiler.startPhase('report highScoringBenchPlayersSummary')
+		writer.startReport('highScoringBenchPlayersSummary', "High Scoring Bench Players:")
+		if lineStore and options['benchPoints'] is not None:
+			lineStore.writeHighScoringBenchPlayersSummary(writer, options['benchPoints'])
+		elif lineStore:
+			lineStore.writeHighScoringBenchPlayersSummary(writer)
+		elif options['benchPoints'] is not None:
+			lineupIndex.writeHighScoringBenchPlayersSummary(writer, options['benchPoints'])
+		else:
+			season.writeHighScoringBenchPlayersSummary(writer)
+		writer.endReport()
 
 	if "lowScoringStartersSummary" in display:
-		print
-		print "Low Scoring Starters:"
-		season.printLowScoringStartersSummary()
+		profiler.startPhase('report lowScoringStartersSummary')
+		writer.startReport('lowScoringStartersSummary', "Low Scoring Starters:")
+		if lineStore and options['starterPoints'] is not None:
+			lineStore.writeLowScoringStartersSummary(writer, options['starterPoints'])
+		elif lineStore:
+			lineStore.writeLowScoringStartersSummary(writer)
+		elif options['starterPoints'] is not None:
+			lineupIndex.writeLowScoringStartersSummary(writer, options['starterPoints'])
+		else:
+			season.writeLowScoringStartersSummary(writer)
+		writer.endReport()
+
+	if "lineupRegretSummary" in display:
+		profiler.startPhase('report lineupRegretSummary')
+		writer.startReport('lineupRegretSummary', "Lineup Regret Summary:")
+		lineupIndex.writeLineupRegretSummary(writer)
+		writer.endReport()
+
+	if "playerOpponentSummary" in display:
+		profiler.startPhase('report playerOpponentSummary')
+		writer.startReport('playerOpponentSummary', "Player Opponent Summary:")
+		season.writePlayerOpponentSummary(writer)
+		writer.endReport()
+
+	if "playerContributionSummary" in display or "costlyLineupDecisionsSummary" in display:
+		profiler.startPhase('analyze marginal values')
+		marginalValues = analyzeMarginalValues(season)
+
+		if "playerContributionSummary" in display:
+			profiler.startPhase('report playerContributionSummary')
+			writer.startReport('playerContributionSummary', "Player Optimum Points Contribution Summary:")
+			writePlayerContributionSummary(writer, season, marginalValues)
+			writer.endReport()
+
+		if "costlyLineupDecisionsSummary" in display:
+			profiler.startPhase('report costlyLineupDecisionsSummary')
+			writer.startReport('costlyLineupDecisionsSummary', "Costly Lineup Decisions:")
+			writeCostlyLineupDecisionsSummary(writer, marginalValues)
+			writer.endReport()
+
+	if "weeklyStandingsSummary" in display or "playerTrendsSummary" in display:
+		profiler.startPhase('analyze trends')
+		seasonTrends = SeasonTrends(season, options['trendWindow'])
+
+		if "weeklyStandingsSummary" in display:
+			profiler.startPhase('report weeklyStandingsSummary')
+			writer.startReport('weeklyStandingsSummary', "Weekly Standings Summary:")
+			seasonTrends.writeWeeklyStandingsSummary(writer)
+			writer.endReport()
+
+		if "playerTrendsSummary" in display:
+			profiler.startPhase('report playerTrendsSummary')
+			writer.startReport('playerTrendsSummary', "Player Trends Summary:")
+			seasonTrends.writePlayerTrendsSummary(writer)
+			writer.endReport()
+
+	if "scheduleLuckSummary" in display:
+		# imported here since it needs NumPy, which nothing else does
+		from domain.luck import ScheduleLuck
+		profiler.startPhase('simulate schedules')
+		scheduleLuck = ScheduleLuck(season)
+		scheduleLuck.simulate(options['simulations'], options['seed'])
+		profiler.startPhase('report scheduleLuckSummary')
+		writer.startReport('scheduleLuckSummary', "Schedule Luck Summary:")
+		scheduleLuck.writeScheduleLuckSummary(writer)
+		writer.endReport()
+
+	writer.close()
+	profiler.endPhase()
 
+	if codeProfiler:
+		codeProfiler.disable()
+		codeProfiler.dump_stats(options['cProfile'])
 
+	if options['profile']:
+		profiler.count('gameScores', gameCount)
+		if lineStore:
+			profiler.count('teams', len(lineStore.teams))
+			profiler.count('players', len(lineStore.players))
+			profiler.count('playerScoreLines', lineStore.getLineCount())
+		else:
+			profiler.count('teams', len(season.teams))
+			profiler.count('players', len(season.players))
+			profiler.count('playerScoreLines', season.scoreLineCount)
+			profiler.count('pointsLinesCreated', season.pointsLinesCreated)
+			profiler.count('pointsLinesReused', season.pointsLinesReused)
+			profiler.count('pointsLinesSkipped', season.pointsLinesSkipped)
+		if cache:
+			profiler.count('cacheHits', cache.hits)
+			profiler.count('cacheMisses', cache.misses)
+		profiler.printSummary()
+		if options['profileOutput']:
+			profiler.saveJson(options['profileOutput'])